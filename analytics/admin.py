@@ -0,0 +1,3 @@
+from django.contrib import admin
+
+# Admin configuration for the analytics app
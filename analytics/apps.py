@@ -0,0 +1,20 @@
+from django.apps import AppConfig
+
+
+class AnalyticsConfig(AppConfig):
+    """
+    Application configuration for the analytics app.
+
+    The app maintains a daily rollup of habit completions and serves
+    completion statistics computed from it.
+    """
+
+    # The name of the application as referenced in INSTALLED_APPS
+    name = "analytics"
+
+    def ready(self):
+        """
+        Connect the signal handlers that keep the rollup in sync
+        with the completion history of the habits.
+        """
+        from . import signals  # noqa: F401
@@ -0,0 +1,144 @@
+"""
+Focus time reports computed from the focus rollup.
+
+A report splits a date range into daily, weekly (Monday to Sunday) or
+monthly buckets and sums the focus time of every habit per bucket.
+The rollup already holds one row per habit and day, so a report reads
+the user's rows in the range with one index range scan and adds them
+up per bucket; the cost depends on the number of days reported, not
+on the number of sessions behind them. (Bucketing in Python is also
+cheaper than date truncation in SQLite, which calls back into Python
+for every row.)
+
+`raw_focus_series` computes the same report from the sessions
+themselves (a range scan of the covering (user, started_at) index).
+It is the reference the rollup is checked against.
+"""
+
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+from pomodoro.models import PomodoroSession
+from .models import FocusRollup
+
+# Bucket sizes of a report
+PERIODS = ("day", "week", "month")
+
+
+def bucket_start(day, period):
+    """The first day of the bucket `day` falls into."""
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+
+def first_bucket(end, period, count):
+    """The first day of the last `count` buckets up to `end`."""
+    start = bucket_start(end, period)
+    if period == "week":
+        return start - timedelta(days=7 * (count - 1))
+    if period == "month":
+        months = start.year * 12 + start.month - 1 - (count - 1)
+        return date(months // 12, months % 12 + 1, 1)
+    return start - timedelta(days=count - 1)
+
+
+def bucket_starts(start, end, period):
+    """The first days of all buckets of [start, end], in order."""
+    starts = []
+    day = bucket_start(start, period)
+    while day <= end:
+        starts.append(day)
+        if period == "week":
+            day += timedelta(days=7)
+        elif period == "month":
+            day = date(day.year + day.month // 12, day.month % 12 + 1, 1)
+        else:
+            day += timedelta(days=1)
+    return starts
+
+
+@dataclass(slots=True)
+class FocusSeries:
+    """Focus time of one habit (None: no habit) per bucket."""
+
+    habit_id: int | None
+    # {bucket start: (seconds, sessions)}
+    buckets: dict = field(default_factory=dict)
+
+    @property
+    def seconds(self):
+        return sum(seconds for seconds, _ in self.buckets.values())
+
+    def as_dict(self, starts):
+        """JSON representation with a (possibly empty) entry per bucket."""
+        return {
+            "habit_id": self.habit_id,
+            "minutes": round(self.seconds / 60, 1),
+            "buckets": [
+                {
+                    "start": start.isoformat(),
+                    "minutes": round(self.buckets.get(start, (0, 0))[0] / 60, 1),
+                    "sessions": self.buckets.get(start, (0, 0))[1],
+                }
+                for start in starts
+            ],
+        }
+
+
+def _series(rows, period):
+    """
+    Add up (habit_id, day, seconds, sessions) rows per habit and bucket.
+    """
+    series = {}
+    for habit_id, day, seconds, sessions in rows:
+        buckets = series.setdefault(habit_id, FocusSeries(habit_id)).buckets
+        start = bucket_start(day, period)
+        total, count = buckets.get(start, (0, 0))
+        buckets[start] = (total + seconds, count + sessions)
+    # Habits first (by id), then the time without a habit
+    return sorted(series.values(), key=lambda s: (s.habit_id is None, s.habit_id or 0))
+
+
+def focus_series(user_id, start, end, period, habit_ids=None):
+    """
+    Focus time of a user in [start, end] per habit and bucket.
+
+    One query on the rollup. Returns a FocusSeries per habit with
+    focus time in the range; `habit_ids` limits the habits (None: all
+    habits and the time without one).
+    """
+    rows = FocusRollup.objects.filter(user_id=user_id, date__range=(start, end))
+    if habit_ids is not None:
+        rows = rows.filter(habit_id__in=habit_ids)
+    return _series(
+        rows.values_list("habit_id", "date", "seconds", "sessions"),
+        period,
+    )
+
+
+def raw_focus_series(user_id, start, end, period, habit_ids=None):
+    """
+    Like focus_series, but aggregated from the sessions themselves.
+    """
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    sessions = (
+        PomodoroSession.objects
+        .filter(user_id=user_id, status="completed")
+        .started_on(days)
+    )
+    if habit_ids is not None:
+        sessions = sessions.filter(habit_id__in=habit_ids)
+    return _series(
+        sessions
+        .annotate(day=TruncDate("started_at"))
+        .values_list("habit_id", "day")
+        .annotate(seconds=Sum("duration_seconds"), sessions=Count("id"))
+        .order_by(),
+        period,
+    )
@@ -0,0 +1,160 @@
+from datetime import date, timedelta
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from analytics.focus import focus_series, raw_focus_series
+from analytics.models import FocusRollup
+from habits.benchmark import rolled_back, table_size, timed
+from habits.models import Habit
+from pomodoro.models import PomodoroSession
+
+
+def python_scan(user_id, start, end):
+    """
+    Baseline: weekly focus seconds per habit by reading every session
+    of the user and diffing its start and end in Python.
+    """
+    weeks = {}
+    sessions = PomodoroSession.objects.filter(user_id=user_id).values_list(
+        "habit_id", "started_at", "ended_at", "status"
+    )
+    for habit_id, started_at, ended_at, status in sessions:
+        day = timezone.localdate(started_at)
+        if status != "completed" or not start <= day <= end:
+            continue
+        week = day - timedelta(days=day.weekday())
+        key = (habit_id, week)
+        weeks[key] = weeks.get(key, 0) + (ended_at - started_at).total_seconds()
+    return weeks
+
+
+class Command(BaseCommand):
+    """
+    Benchmark: focus reports from the rollup vs. the raw sessions.
+
+    Generates `--sessions` completed and stopped Pomodoro sessions for
+    `--users` users with a few habits each over `--days` days, rolls
+    them up, and reports for one user the time of a daily, weekly and
+    monthly report from the rollup, from the sessions through the
+    covering (user, started_at) index, and by diffing every session
+    in Python. Also reports the cost of the incremental update when a
+    session completes. All data is rolled back afterwards.
+
+    Usage:
+    python manage.py bench_focus_analytics --sessions 1000000 --users 100
+    """
+
+    help = "Measure rollup-based focus reports against session scans."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sessions", type=int, default=1_000_000)
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--habits", type=int, default=5)
+        parser.add_argument("--days", type=int, default=730)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        rng = random.Random(24)
+        end = date.today()
+        now = timezone.now()
+        repeat = options["repeat"]
+
+        with rolled_back():
+            users = get_user_model().objects.bulk_create(
+                get_user_model()(username=f"bench-focus-{i}")
+                for i in range(options["users"])
+            )
+            habits = {
+                user.id: [None] + [
+                    habit.id for habit in Habit.objects.bulk_create(
+                        Habit(name=f"Bench habit {i}", user=user)
+                        for i in range(options["habits"])
+                    )
+                ]
+                for user in users
+            }
+
+            started = time.perf_counter()
+            self.create_sessions(rng, habits, now, options["sessions"], options["days"])
+            insert_s = time.perf_counter() - started
+
+            started = time.perf_counter()
+            rows = FocusRollup.objects.rebuild()
+            rebuild_s = time.perf_counter() - started
+
+            user_id = users[0].id
+            reports = {
+                "day": end - timedelta(days=29),
+                "week": end - timedelta(weeks=52) + timedelta(days=1),
+                "month": end - timedelta(days=364),
+            }
+            results = []
+            for period, start in reports.items():
+                rollup_ms = timed(lambda: focus_series(user_id, start, end, period), repeat)
+                raw_ms = timed(lambda: raw_focus_series(user_id, start, end, period), repeat)
+                results.append((period, start, rollup_ms, raw_ms))
+            scan_ms = timed(lambda: python_scan(user_id, reports["week"], end), repeat)
+
+            update_ms = timed(lambda: self.complete_one(user_id, habits[user_id][1]), repeat)
+
+            session_bytes = table_size(PomodoroSession._meta.db_table)
+            rollup_bytes = table_size(FocusRollup._meta.db_table)
+
+        self.stdout.write(
+            f"sessions:        {options['sessions']} for {len(users)} users "
+            f"(inserted in {insert_s:.1f}s)"
+        )
+        self.stdout.write(f"rollup rows:     {rows} (rebuilt in {rebuild_s:.1f}s)")
+        if session_bytes and rollup_bytes:
+            self.stdout.write(
+                f"table sizes:     sessions {session_bytes / 2**20:.1f} MiB, "
+                f"rollup {rollup_bytes / 2**20:.1f} MiB (with indexes)"
+            )
+        for period, start, rollup_ms, raw_ms in results:
+            self.stdout.write(
+                f"{period:<5} report from {start}: rollup {rollup_ms:7.2f} ms, "
+                f"sessions {raw_ms:7.2f} ms ({raw_ms / rollup_ms:.1f}x)"
+            )
+        self.stdout.write(
+            f"python scan (week report): {scan_ms:7.2f} ms "
+            f"({scan_ms / results[1][2]:.1f}x the rollup)"
+        )
+        self.stdout.write(f"update:          {update_ms:7.2f} ms per completed session")
+
+    def create_sessions(self, rng, habits, now, count, days):
+        """Insert random finished sessions in batches."""
+        user_ids = list(habits)
+        batch = 50_000
+        for offset in range(0, count, batch):
+            sessions = []
+            for _ in range(min(batch, count - offset)):
+                user_id = rng.choice(user_ids)
+                started = now - timedelta(minutes=rng.randrange(days * 24 * 60))
+                completed = rng.random() < 0.8
+                duration = rng.choice([900, 1500, 1500, 3000])
+                elapsed = duration if completed else rng.randrange(duration)
+                sessions.append(PomodoroSession(
+                    user_id=user_id,
+                    habit_id=rng.choice(habits[user_id]),
+                    status="completed" if completed else "stopped",
+                    duration_seconds=duration,
+                    elapsed_seconds=elapsed,
+                    started_at=started,
+                    ended_at=started + timedelta(seconds=elapsed),
+                ))
+            PomodoroSession.objects.bulk_create(sessions, batch_size=5000)
+
+    def complete_one(self, user_id, habit_id):
+        """Complete one session through the model (signal handlers run)."""
+        started = timezone.now() - timedelta(hours=1)
+        PomodoroSession.objects.create(
+            user_id=user_id,
+            habit_id=habit_id,
+            status="completed",
+            started_at=started,
+            ended_at=started,
+        )
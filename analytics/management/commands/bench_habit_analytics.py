@@ -0,0 +1,120 @@
+from datetime import date, timedelta
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+from django.db.models.functions import ExtractWeekDay
+
+from analytics.models import DailyRollup
+from analytics.stats import habit_stats
+from habits.benchmark import rolled_back, timed
+from habits.models import Habit, HabitCheckIn
+from habits.users import get_demo_user
+
+
+def scan_stats(habit_ids, end, windows):
+    """
+    Baseline: the same window counts and weekday counts computed by
+    aggregating HabitCheckIn rows.
+    """
+    longest = max(windows)
+    start = end - timedelta(days=longest - 1)
+    checkins = HabitCheckIn.objects.filter(
+        habit_id__in=habit_ids,
+        date__range=(start, end),
+        completed=True,
+    )
+    counts = list(
+        checkins
+        .values("habit_id")
+        .annotate(**{
+            f"days_{days}": Count(
+                "id", filter=Q(date__gt=end - timedelta(days=days))
+            )
+            for days in windows
+        })
+    )
+    weekdays = list(
+        checkins
+        .annotate(weekday=ExtractWeekDay("date"))
+        .values("habit_id", "weekday")
+        .annotate(count=Count("id"))
+    )
+    return counts, weekdays
+
+
+class Command(BaseCommand):
+    """
+    Benchmark: completion statistics from the daily rollup vs. a scan.
+
+    Generates habits with several years of random check-ins, rolls
+    them up, and reports the time to compute window rates, best
+    weekday and trend for all habits from prefix counts against
+    aggregating the check-in rows. Also reports the cost of the
+    incremental rollup update for a recent and an old day.
+    All data is rolled back afterwards.
+
+    Usage:
+    python manage.py bench_habit_analytics --habits 1000 --years 5
+    """
+
+    help = "Measure rollup-based habit analytics against row scans."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--habits", type=int, default=1000)
+        parser.add_argument("--years", type=int, default=5)
+        parser.add_argument("--density", type=float, default=0.5)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        end = date.today()
+        history = 365 * options["years"]
+        windows = [30, 90, 365, history]
+        repeat = options["repeat"]
+
+        with rolled_back():
+            user = get_demo_user()
+            habits = Habit.objects.bulk_create(
+                Habit(name=f"Bench habit {i}", user=user)
+                for i in range(options["habits"])
+            )
+            habit_ids = [habit.id for habit in habits]
+            HabitCheckIn.objects.bulk_create(
+                (
+                    HabitCheckIn(habit_id=habit_id, date=end - timedelta(days=offset))
+                    for habit_id in habit_ids
+                    for offset in range(1, history)
+                    if rng.random() < options["density"]
+                ),
+                batch_size=5000,
+            )
+
+            started = time.perf_counter()
+            rows = DailyRollup.objects.rebuild(habit_ids=habit_ids)
+            rebuild_s = time.perf_counter() - started
+
+            rollup_ms = timed(lambda: habit_stats(habit_ids, end, windows), repeat)
+            scan_ms = timed(lambda: scan_stats(habit_ids, end, windows), repeat)
+
+            habit_id = habit_ids[0]
+            recent_ms = timed(lambda: self.toggle(habit_id, end), repeat)
+            old_ms = timed(
+                lambda: self.toggle(habit_id, end - timedelta(days=history - 1)),
+                repeat,
+            )
+
+        self.stdout.write(f"habits:          {len(habit_ids)} x {options['years']} years")
+        self.stdout.write(f"rollup rows:     {rows} (rebuilt in {rebuild_s:.1f}s)")
+        self.stdout.write(f"windows:         {windows}")
+        self.stdout.write(f"rollup stats:    {rollup_ms:8.1f} ms")
+        self.stdout.write(
+            f"check-in scan:   {scan_ms:8.1f} ms ({scan_ms / rollup_ms:.1f}x)"
+        )
+        self.stdout.write(f"update today:    {recent_ms:8.2f} ms per add + remove")
+        self.stdout.write(f"update old day:  {old_ms:8.2f} ms per add + remove")
+
+    def toggle(self, habit_id, day):
+        DailyRollup.objects.add_day(habit_id, day)
+        DailyRollup.objects.remove_day(habit_id, day)
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from analytics.models import FocusRollup
+
+
+class Command(BaseCommand):
+    """
+    Management command: rebuild the focus rollup from PomodoroSession.
+
+    Aggregates the focus time of all completed sessions per user,
+    habit and day and writes it with a single INSERT ... SELECT.
+    Existing rows in scope are replaced, so the command can also be
+    used to repair drift.
+
+    Usage:
+    python manage.py rebuild_focus_rollups
+    python manage.py rebuild_focus_rollups 3 7
+    """
+
+    help = "Rebuild the focus time rollup from the PomodoroSession table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "user_ids",
+            nargs="*",
+            type=int,
+            help="Only rebuild these users (default: all users).",
+        )
+
+    def handle(self, *args, user_ids=None, **options):
+        started = time.perf_counter()
+
+        written = FocusRollup.objects.rebuild(user_ids=user_ids or None)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {written} focus rollup rows in {elapsed:.2f}s."
+        ))
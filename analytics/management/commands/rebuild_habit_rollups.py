@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from analytics.models import DailyRollup
+
+
+class Command(BaseCommand):
+    """
+    Management command: rebuild the daily rollup from HabitCheckIn.
+
+    Recomputes the running counters of all completed check-ins in
+    the database and writes them with a single INSERT ... SELECT.
+    Existing rows in scope are replaced, so the command can also be
+    used to repair drift.
+
+    Usage:
+    python manage.py rebuild_habit_rollups
+    python manage.py rebuild_habit_rollups 3 7
+    """
+
+    help = "Rebuild the daily habit rollup from the HabitCheckIn table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "habit_ids",
+            nargs="*",
+            type=int,
+            help="Only rebuild these habits (default: all habits).",
+        )
+
+    def handle(self, *args, habit_ids=None, **options):
+        started = time.perf_counter()
+
+        written = DailyRollup.objects.rebuild(habit_ids=habit_ids or None)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {written} rollup rows in {elapsed:.2f}s."
+        ))
@@ -0,0 +1,111 @@
+# Generated by Django 6.0 on 2026-10-18 19:10
+#
+# This migration introduces the DailyRollup model, a materialized
+# rollup of completed habit days with running counters.
+# Existing histories are rolled up here; afterwards the
+# check-in signals keep the rollup up to date.
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Mirrors analytics.models at the time of writing
+WEEKDAY_FIELDS = (
+    "mondays", "tuesdays", "wednesdays", "thursdays",
+    "fridays", "saturdays", "sundays",
+)
+
+# Rollup rows inserted per query
+BATCH_SIZE = 2000
+
+
+def fill_rollups(apps, schema_editor):
+    """
+    Roll up all completed check-ins with running counters per habit.
+    """
+    HabitCheckIn = apps.get_model("habits", "HabitCheckIn")
+    DailyRollup = apps.get_model("analytics", "DailyRollup")
+
+    checkins = (
+        HabitCheckIn.objects
+        .filter(completed=True)
+        .order_by("habit_id", "date")
+        .values_list("habit_id", "date")
+    )
+    rows = []
+    counters = {}
+    current = None
+    for habit_id, day in checkins.iterator(chunk_size=BATCH_SIZE):
+        if habit_id != current:
+            current = habit_id
+            counters = dict.fromkeys(("total",) + WEEKDAY_FIELDS, 0)
+        counters["total"] += 1
+        counters[WEEKDAY_FIELDS[day.weekday()]] += 1
+        rows.append(DailyRollup(habit_id=habit_id, date=day, **counters))
+
+        if len(rows) >= BATCH_SIZE:
+            DailyRollup.objects.bulk_create(rows)
+            rows.clear()
+    DailyRollup.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+    """
+    Initial migration for the analytics app.
+
+    Creates the DailyRollup table that completion statistics are
+    computed from, and fills it from the existing check-ins.
+    """
+
+    initial = True
+
+    dependencies = [
+        ("habits", "0005_habit_user"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyRollup",
+            fields=[
+                # Primary key automatically created by Django
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+
+                # The completed day
+                ("date", models.DateField()),
+
+                # Completed days up to and including the day
+                ("total", models.PositiveIntegerField()),
+
+                # The same count split by weekday
+                ("mondays", models.PositiveIntegerField(default=0)),
+                ("tuesdays", models.PositiveIntegerField(default=0)),
+                ("wednesdays", models.PositiveIntegerField(default=0)),
+                ("thursdays", models.PositiveIntegerField(default=0)),
+                ("fridays", models.PositiveIntegerField(default=0)),
+                ("saturdays", models.PositiveIntegerField(default=0)),
+                ("sundays", models.PositiveIntegerField(default=0)),
+
+                # Habit the row belongs to
+                (
+                    "habit",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="rollups",
+                        to="habits.habit",
+                    ),
+                ),
+            ],
+            options={
+                # One row per habit and completed day
+                "unique_together": {("habit", "date")},
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
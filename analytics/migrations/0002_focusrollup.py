@@ -0,0 +1,124 @@
+# Generated by Django 5.2 on 2026-10-19 00:10
+#
+# This migration introduces the FocusRollup model, a materialized
+# rollup of focus time per user, habit and day.
+# Existing sessions are rolled up here; afterwards the session
+# signals keep the rollup up to date.
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def fill_rollups(apps, schema_editor):
+    """
+    Roll up all completed sessions with a single INSERT ... SELECT
+    (like FocusRollup.objects.rebuild).
+    """
+    FocusRollup = apps.get_model("analytics", "FocusRollup")
+    PomodoroSession = apps.get_model("pomodoro", "PomodoroSession")
+
+    select = (
+        PomodoroSession.objects
+        .filter(status="completed")
+        .annotate(date=TruncDate("started_at"))
+        .values("user_id", "habit_id", "date")
+        .annotate(seconds=Sum("duration_seconds"), sessions=Count("id"))
+        .order_by()
+    )
+    sql, params = select.query.sql_with_params()
+
+    quote = schema_editor.connection.ops.quote_name
+    columns = ", ".join(
+        quote(name) for name in ("user_id", "habit_id", "date", "seconds", "sessions")
+    )
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote(FocusRollup._meta.db_table)} ({columns}) "
+            f"SELECT {columns} FROM ({sql}) rollup",
+            params,
+        )
+
+
+class Migration(migrations.Migration):
+    """
+    Migration to add the focus time rollup and fill it from the
+    completed sessions.
+    """
+
+    dependencies = [
+        ("analytics", "0001_initial"),
+        ("habits", "0010_dailysummary"),
+        ("pomodoro", "0005_pomodoro_user_started_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FocusRollup",
+            fields=[
+                # Primary key automatically created by Django
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+
+                # Local day the sessions started on
+                ("date", models.DateField()),
+
+                # Focus time and number of completed sessions
+                ("seconds", models.PositiveIntegerField(default=0)),
+                ("sessions", models.PositiveIntegerField(default=0)),
+
+                # Habit of the sessions (null: no habit)
+                (
+                    "habit",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="focus_rollups",
+                        to="habits.habit",
+                    ),
+                ),
+
+                # Owner of the sessions
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="focus_rollups",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["user", "date"], name="focusrollup_user_date_idx"),
+                ],
+                "constraints": [
+                    # One row per user, day and habit, and one per
+                    # user and day for sessions without a habit
+                    models.UniqueConstraint(
+                        condition=models.Q(("habit__isnull", False)),
+                        fields=("user", "date", "habit"),
+                        name="focusrollup_unique_habit_day",
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(("habit__isnull", True)),
+                        fields=("user", "date"),
+                        name="focusrollup_unique_day",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
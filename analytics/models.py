@@ -0,0 +1,336 @@
+from django.conf import settings
+from django.db import connections, models, transaction
+from django.db.models import Count, F, Q, Sum, Window
+from django.db.models.functions import ExtractIsoWeekDay, TruncDate
+
+from habits.models import Habit, HabitCheckIn
+from pomodoro.models import PomodoroSession
+
+# Per-weekday prefix counters, indexed by date.weekday()
+WEEKDAY_FIELDS = (
+    "mondays",
+    "tuesdays",
+    "wednesdays",
+    "thursdays",
+    "fridays",
+    "saturdays",
+    "sundays",
+)
+
+# All running counters of a rollup row
+COUNTER_FIELDS = ("total",) + WEEKDAY_FIELDS
+
+
+class DailyRollupManager(models.Manager):
+    """
+    Incremental maintenance of the daily rollup.
+
+    Every row carries running (prefix) counters, so completing or
+    clearing a day inserts or deletes one row and shifts the counters
+    of the later rows of the same habit with a single UPDATE.
+    """
+
+    def add_day(self, habit_id, day):
+        """
+        Record a completed day.
+
+        The new row continues the counters of the closest earlier
+        row; all later rows count one more completion.
+        """
+        weekday = WEEKDAY_FIELDS[day.weekday()]
+
+        with transaction.atomic():
+            previous = (
+                self.select_for_update()
+                .filter(habit_id=habit_id, date__lte=day)
+                .order_by("-date")
+                .first()
+            )
+            if previous is not None and previous.date == day:
+                return
+
+            counters = {
+                field: getattr(previous, field, 0)
+                for field in COUNTER_FIELDS
+            }
+            counters["total"] += 1
+            counters[weekday] += 1
+
+            self.filter(habit_id=habit_id, date__gt=day).update(
+                total=F("total") + 1,
+                **{weekday: F(weekday) + 1},
+            )
+            self.create(habit_id=habit_id, date=day, **counters)
+
+    def remove_day(self, habit_id, day):
+        """
+        Remove a day that is no longer completed.
+
+        All later rows count one completion less.
+        """
+        weekday = WEEKDAY_FIELDS[day.weekday()]
+
+        with transaction.atomic():
+            deleted, _ = self.filter(habit_id=habit_id, date=day).delete()
+            if not deleted:
+                return
+
+            self.filter(habit_id=habit_id, date__gt=day).update(
+                total=F("total") - 1,
+                **{weekday: F(weekday) - 1},
+            )
+
+    def rebuild(self, habit_ids=None):
+        """
+        Rebuild the rollup of all (or the given) habits from HabitCheckIn.
+
+        The running counters are computed by the database with window
+        functions and written with a single INSERT ... SELECT, so the
+        rebuild costs the same number of queries for any history size.
+        Existing rows in scope are replaced. Returns the number of rows
+        written.
+        """
+        checkins = HabitCheckIn.objects.filter(completed=True)
+        rollups = self.all()
+        if habit_ids is not None:
+            checkins = checkins.filter(habit_id__in=habit_ids)
+            rollups = rollups.filter(habit_id__in=habit_ids)
+
+        def running(aggregate):
+            # Counts over all earlier days of the same habit
+            return Window(
+                aggregate,
+                partition_by=[F("habit_id")],
+                order_by=F("date").asc(),
+            )
+
+        select = (
+            checkins
+            .annotate(
+                iso_weekday=ExtractIsoWeekDay("date"),
+                total=running(Count("id")),
+                **{
+                    field: running(Count("id", filter=Q(iso_weekday=weekday)))
+                    for weekday, field in enumerate(WEEKDAY_FIELDS, start=1)
+                },
+            )
+            .values("habit_id", "date", *COUNTER_FIELDS)
+        )
+        sql, params = select.query.sql_with_params()
+
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        columns = ", ".join(quote(name) for name in ("habit_id", "date", *COUNTER_FIELDS))
+
+        with transaction.atomic(using=self.db), connection.cursor() as cursor:
+            rollups.delete()
+            cursor.execute(
+                f"INSERT INTO {quote(self.model._meta.db_table)} ({columns}) "
+                f"SELECT {columns} FROM ({sql}) rollup",
+                params,
+            )
+            return cursor.rowcount
+
+
+class DailyRollup(models.Model):
+    """
+    Materialized daily rollup of habit completions.
+
+    One row per habit and completed day. Besides the day itself, a
+    row stores how many days of the habit were completed up to and
+    including it, in total and per weekday. The number of completions
+    in any window is the difference of two such prefix counts, so
+    statistics cost the same for a week as for five years.
+
+    Days without a row were not completed. HabitCheckIn stays the
+    source of truth; the table is kept in sync by signal handlers and
+    can be rebuilt with the `rebuild_habit_rollups` command.
+    """
+
+    # The habit this row belongs to
+    habit = models.ForeignKey(
+        Habit,
+        on_delete=models.CASCADE,
+        related_name="rollups",
+    )
+
+    # The completed day
+    date = models.DateField()
+
+    # Completed days up to and including `date`
+    total = models.PositiveIntegerField()
+
+    # The same count split by weekday
+    mondays = models.PositiveIntegerField(default=0)
+    tuesdays = models.PositiveIntegerField(default=0)
+    wednesdays = models.PositiveIntegerField(default=0)
+    thursdays = models.PositiveIntegerField(default=0)
+    fridays = models.PositiveIntegerField(default=0)
+    saturdays = models.PositiveIntegerField(default=0)
+    sundays = models.PositiveIntegerField(default=0)
+
+    objects = DailyRollupManager()
+
+    class Meta:
+        # The unique index also serves the "latest row before a day" seek
+        unique_together = ("habit", "date")
+
+    def __str__(self):
+        return f"{self.habit_id} / {self.date}: {self.total}"
+
+
+class FocusRollupManager(models.Manager):
+    """
+    Incremental maintenance of the focus time rollup.
+
+    A completed session adds its duration to one row; recounting
+    replaces the rows of some users and days by aggregates of the
+    sessions, read from the covering (user, started_at) index of
+    PomodoroSession.
+    """
+
+    def add(self, user_id, habit_id, day, seconds, sessions=1):
+        """
+        Add focus time to the row of a user, habit (or None) and day.
+
+        Rows without sessions left are removed.
+        """
+        rows = self.filter(user_id=user_id, habit_id=habit_id, date=day)
+        with transaction.atomic():
+            if not rows.exists():
+                self.bulk_create(
+                    [self.model(user_id=user_id, habit_id=habit_id, date=day)],
+                    # The row may have been created in the meantime
+                    ignore_conflicts=True,
+                )
+            rows.update(
+                seconds=F("seconds") + seconds,
+                sessions=F("sessions") + sessions,
+            )
+            rows.filter(sessions__lte=0).delete()
+
+    def source(self):
+        """
+        The rollup rows computed from the completed sessions: a values
+        queryset of user_id, habit_id, date, seconds and sessions.
+        """
+        return (
+            PomodoroSession.objects
+            .filter(status="completed")
+            .annotate(date=TruncDate("started_at"))
+            .values("user_id", "habit_id", "date")
+            .annotate(seconds=Sum("duration_seconds"), sessions=Count("id"))
+            .order_by()
+        )
+
+    def recount(self, user_ids, days):
+        """
+        Recompute the rows of users on several days from the sessions.
+
+        Used after bulk writes (expired sessions) and habit deletions.
+        Runs a fixed number of queries: one delete, one aggregate and
+        one insert.
+        """
+        user_ids = set(user_ids)
+        days = set(days)
+        if not user_ids or not days:
+            return
+
+        rows = self.source().filter(user_id__in=user_ids).started_on(days)
+        with transaction.atomic():
+            self.filter(user_id__in=user_ids, date__in=days).delete()
+            self.bulk_create(self.model(**row) for row in rows)
+
+    def rebuild(self, user_ids=None):
+        """
+        Rebuild the rollup of all (or the given) users from the sessions.
+
+        The rows are aggregated by the database and written with a
+        single INSERT ... SELECT. Existing rows in scope are replaced.
+        Returns the number of rows written.
+        """
+        select = self.source()
+        rollups = self.all()
+        if user_ids is not None:
+            select = select.filter(user_id__in=user_ids)
+            rollups = rollups.filter(user_id__in=user_ids)
+        sql, params = select.query.sql_with_params()
+
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        columns = ", ".join(
+            quote(name) for name in ("user_id", "habit_id", "date", "seconds", "sessions")
+        )
+
+        with transaction.atomic(using=self.db), connection.cursor() as cursor:
+            rollups.delete()
+            cursor.execute(
+                f"INSERT INTO {quote(self.model._meta.db_table)} ({columns}) "
+                f"SELECT {columns} FROM ({sql}) rollup",
+                params,
+            )
+            return cursor.rowcount
+
+
+class FocusRollup(models.Model):
+    """
+    Materialized focus time per user, habit and day.
+
+    One row per user, day and habit (or no habit) with completed
+    Pomodoro sessions. Like the daily summary, a completed session
+    counts its full duration on the local day it started on. Focus
+    reports read a handful of these rows instead of every session.
+
+    PomodoroSession stays the source of truth; the table is kept in
+    sync by signal handlers and can be rebuilt with the
+    `rebuild_focus_rollups` command.
+    """
+
+    # Lookups by user are served by the (user, date) index
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="focus_rollups",
+        db_index=False,
+    )
+
+    # Null for sessions that were not linked to a habit
+    habit = models.ForeignKey(
+        Habit,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name="focus_rollups",
+    )
+
+    # Local day the sessions started on
+    date = models.DateField()
+
+    # Focus time and number of completed sessions of the day
+    seconds = models.PositiveIntegerField(default=0)
+    sessions = models.PositiveIntegerField(default=0)
+
+    objects = FocusRollupManager()
+
+    class Meta:
+        indexes = [
+            # Reports: the rows of a user in a date range
+            models.Index(fields=["user", "date"], name="focusrollup_user_date_idx"),
+        ]
+        constraints = [
+            # NULLs are distinct in a unique index, so the rows without
+            # a habit need a constraint of their own
+            models.UniqueConstraint(
+                fields=["user", "date", "habit"],
+                condition=Q(habit__isnull=False),
+                name="focusrollup_unique_habit_day",
+            ),
+            models.UniqueConstraint(
+                fields=["user", "date"],
+                condition=Q(habit__isnull=True),
+                name="focusrollup_unique_day",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} / {self.habit_id} / {self.date}: {self.seconds}s"
@@ -0,0 +1,111 @@
+"""
+Signal handlers for the analytics app.
+
+Keep the daily rollup in sync with the habit's completion history
+(see habits.signals), and the focus rollup with the completed
+Pomodoro sessions.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from habits.models import Habit
+from habits.signals import cascades_from, day_cleared, day_completed, history_changed
+from pomodoro.models import PomodoroSession
+from pomodoro.signals import sessions_completed
+from .models import DailyRollup, FocusRollup
+
+
+@receiver(day_completed)
+def add_rollup_day(sender, habit_id, day, **kwargs):
+    """Insert the day and shift the counters after it."""
+    DailyRollup.objects.add_day(habit_id, day)
+
+
+@receiver(day_cleared)
+def remove_rollup_day(sender, habit_id, day, **kwargs):
+    """Remove the day and shift the counters after it."""
+    DailyRollup.objects.remove_day(habit_id, day)
+
+
+@receiver(history_changed)
+def rebuild_rollups(sender, habit_ids, **kwargs):
+    """Rebuild the rollup of habits changed by a bulk write."""
+    DailyRollup.objects.rebuild(habit_ids=habit_ids)
+
+
+def _focus(session):
+    """
+    The (user_id, habit_id, day, seconds) a session adds to the focus
+    rollup, if any.
+    """
+    if session.status != "completed":
+        return None
+    day = timezone.localdate(session.started_at)
+    return session.user_id, session.habit_id, day, session.duration_seconds
+
+
+@receiver(pre_save, sender=PomodoroSession)
+def remember_previous_focus(sender, instance, raw=False, **kwargs):
+    """Remember what a session added before it is changed."""
+    instance._previous_focus = None
+    if raw or instance.pk is None:
+        return
+    previous = sender._base_manager.filter(pk=instance.pk).first()
+    if previous is not None:
+        instance._previous_focus = _focus(previous)
+
+
+@receiver(post_save, sender=PomodoroSession)
+def update_focus(sender, instance, raw=False, **kwargs):
+    """Move a changed session's focus time in the rollup."""
+    if raw:
+        return
+    previous = getattr(instance, "_previous_focus", None)
+    current = _focus(instance)
+    if previous == current:
+        return
+    if previous is not None:
+        FocusRollup.objects.add(*previous[:3], -previous[3], sessions=-1)
+    if current is not None:
+        FocusRollup.objects.add(*current)
+
+
+@receiver(post_delete, sender=PomodoroSession)
+def remove_focus(sender, instance, origin=None, **kwargs):
+    """A deleted session no longer counts."""
+    # The rollup rows of a deleted user go away with the user
+    if cascades_from(origin, get_user_model()):
+        return
+    focus = _focus(instance)
+    if focus is not None:
+        FocusRollup.objects.add(*focus[:3], -focus[3], sessions=-1)
+
+
+@receiver(sessions_completed)
+def recount_completed_focus(sender, user_ids, days, **kwargs):
+    """The expiry sweeper completes sessions without model signals."""
+    FocusRollup.objects.recount(user_ids, days)
+
+
+@receiver(pre_delete, sender=Habit)
+def remember_focus_days(sender, instance, origin=None, **kwargs):
+    """
+    A deleted habit's sessions are kept without a habit, but its
+    rollup rows go away with it.
+    """
+    instance._focus_days = None
+    if not cascades_from(origin, get_user_model()):
+        instance._focus_days = list(
+            FocusRollup.objects.filter(habit=instance).values_list("date", flat=True)
+        )
+
+
+@receiver(post_delete, sender=Habit)
+def recount_habit_focus(sender, instance, **kwargs):
+    """Count the sessions of a deleted habit as sessions without one."""
+    days = getattr(instance, "_focus_days", None)
+    if days:
+        FocusRollup.objects.recount([instance.user_id], days)
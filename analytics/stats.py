@@ -0,0 +1,220 @@
+"""
+Completion statistics computed from the daily rollup.
+
+Every statistic over a window [start, end] is derived from the prefix
+counters of two rollup rows: the latest row on or before `end` and the
+latest row before `start`. Looking up such a row is a single index
+seek, so the cost per habit does not depend on the window length or
+on the length of the history.
+
+Rates only count the weekdays on the habit's schedule (see
+habits.schedule): the weekday counters of the rollup give the
+completions on scheduled days, and the number of scheduled days of a
+window is plain arithmetic.
+"""
+
+import calendar
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db.models import OuterRef, Subquery
+
+from habits.models import Habit
+from habits.schedule import weekdays
+from .models import COUNTER_FIELDS, DailyRollup
+
+# Counters before the first completion of a habit
+NO_COUNTERS = (0,) * len(COUNTER_FIELDS)
+
+
+def prefix_counters(habit_ids, days):
+    """
+    Return {habit_id: [counters at day for day in days]}.
+
+    The counters at a day are those of the latest rollup row on or
+    before it (zeros if there is none), as tuples in COUNTER_FIELDS
+    order. Uses two queries regardless of the number of habits and
+    days: one to locate the rows, one to load them.
+    """
+    return {
+        habit_id: counters
+        for habit_id, (_, counters) in schedules_and_counters(habit_ids, days).items()
+    }
+
+
+def schedules_and_counters(habit_ids, days):
+    """
+    Like prefix_counters, but returns {habit_id: (schedule, counters)}.
+
+    The schedule comes with the query that locates the rollup rows,
+    so it costs no extra query.
+    """
+    annotations = {
+        f"row_{i}": Subquery(
+            DailyRollup.objects
+            .filter(habit=OuterRef("pk"), date__lte=day)
+            .order_by("-date")
+            .values("pk")[:1]
+        )
+        for i, day in enumerate(days)
+    }
+    located = (
+        Habit.objects
+        .filter(id__in=habit_ids)
+        .annotate(**annotations)
+        .values_list("id", "schedule", *annotations)
+    )
+    row_ids = {}
+    schedules = {}
+    for habit_id, schedule, *pks in located:
+        row_ids[habit_id] = pks
+        schedules[habit_id] = schedule
+
+    wanted = {pk for pks in row_ids.values() for pk in pks if pk is not None}
+    counters = {
+        pk: tuple(values)
+        for pk, *values in (
+            DailyRollup.objects
+            .filter(pk__in=wanted)
+            .values_list("pk", *COUNTER_FIELDS)
+        )
+    }
+
+    return {
+        habit_id: (
+            schedules[habit_id],
+            [counters.get(pk, NO_COUNTERS) for pk in pks],
+        )
+        for habit_id, pks in row_ids.items()
+    }
+
+
+def weekday_occurrences(start, end):
+    """Number of times each weekday (Monday = 0) occurs in [start, end]."""
+    days = (end - start).days + 1
+    weeks, rest = divmod(days, 7)
+    counts = [weeks] * 7
+    for offset in range(rest):
+        counts[(start.weekday() + offset) % 7] += 1
+    return counts
+
+
+def _rate(completed, days):
+    return round(completed / days, 4) if days else 0.0
+
+
+def _scheduled(at_end, at_start, due_weekdays):
+    """Completions between two prefix counters on the given weekdays."""
+    return sum(at_end[weekday + 1] - at_start[weekday + 1] for weekday in due_weekdays)
+
+
+@dataclass
+class HabitStats:
+    """
+    Completion statistics of one habit.
+
+    `windows` maps a window length in days to the number of
+    completed days in it. `scheduled` maps it to a pair
+    (completed scheduled days, scheduled days), the base of the
+    completion rate; completions on other days do not raise it.
+    `best_weekday` (0 = Monday, among the scheduled weekdays) and
+    `trend` refer to the longest window; the trend is the completion
+    rate of its second half minus the rate of its first half.
+    """
+
+    habit_id: int
+    windows: dict
+    best_weekday: int | None
+    trend: float
+    scheduled: dict
+
+    def as_dict(self):
+        return {
+            "habit_id": self.habit_id,
+            "windows": {
+                str(days): {
+                    "completed": completed,
+                    "days": days,
+                    "scheduled_days": self.scheduled[days][1],
+                    "rate": _rate(*self.scheduled[days]),
+                }
+                for days, completed in self.windows.items()
+            },
+            "best_weekday": (
+                calendar.day_name[self.best_weekday]
+                if self.best_weekday is not None
+                else None
+            ),
+            "trend": self.trend,
+        }
+
+
+def habit_stats(habit_ids, end, windows):
+    """
+    Completion statistics for many habits and windows ending on `end`.
+
+    Returns one HabitStats per existing habit, ordered by habit id.
+    """
+    windows = sorted(set(windows))
+    longest = windows[-1]
+    one_day = timedelta(days=1)
+
+    # Prefix counters are needed at the end, the day before every
+    # window and the last day of the first half of the longest window
+    first_half = longest // 2
+    start = end - timedelta(days=longest - 1)
+    middle = start + timedelta(days=first_half) - one_day
+    boundaries = [end, middle] + [
+        end - timedelta(days=days) for days in windows
+    ]
+
+    prefixes = schedules_and_counters(habit_ids, boundaries)
+
+    # Weekday occurrences of every window and of both halves of the
+    # longest one; shared by all habits
+    window_occurrences = {
+        days: weekday_occurrences(end - timedelta(days=days - 1), end)
+        for days in windows
+    }
+    occurrences = window_occurrences[longest]
+    early_occurrences = weekday_occurrences(start, middle)
+    late_occurrences = weekday_occurrences(middle + one_day, end)
+
+    results = []
+    for habit_id in sorted(prefixes):
+        schedule, (at_end, at_middle, *before) = prefixes[habit_id]
+        due = weekdays(schedule)
+
+        completed = {
+            days: at_end[0] - at_start[0]
+            for days, at_start in zip(windows, before)
+        }
+        scheduled = {
+            days: (
+                _scheduled(at_end, at_start, due),
+                sum(window_occurrences[days][weekday] for weekday in due),
+            )
+            for days, at_start in zip(windows, before)
+        }
+
+        # Weekday rates over the longest window
+        at_start = before[-1]
+        best_weekday = None
+        best_rate = 0.0
+        for weekday in due:
+            count = at_end[weekday + 1] - at_start[weekday + 1]
+            rate = count / occurrences[weekday] if occurrences[weekday] else 0.0
+            if rate > best_rate:
+                best_weekday, best_rate = weekday, rate
+
+        # Second half vs. first half of the longest window
+        early = _scheduled(at_middle, at_start, due)
+        late = _scheduled(at_end, at_middle, due)
+        early_days = sum(early_occurrences[weekday] for weekday in due)
+        late_days = sum(late_occurrences[weekday] for weekday in due)
+        early_rate = early / early_days if early_days else 0.0
+        late_rate = late / late_days if late_days else 0.0
+        trend = round(late_rate - early_rate, 4)
+
+        results.append(HabitStats(habit_id, completed, best_weekday, trend, scheduled))
+    return results
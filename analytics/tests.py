@@ -0,0 +1,482 @@
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.db.models import Sum
+from django.utils import timezone
+
+from habits.models import Habit, HabitCheckIn
+from habits.purge import purge_habit
+from habits.schedule import from_weekdays
+from habits.services import apply_checkins
+from habits.users import get_demo_user
+from pomodoro import services as pomodoro_services
+from pomodoro.models import PomodoroSession
+from .focus import focus_series, raw_focus_series
+from .models import COUNTER_FIELDS, WEEKDAY_FIELDS, DailyRollup, FocusRollup
+from .stats import habit_stats, weekday_occurrences
+
+# Test configuration for the analytics app.
+
+
+def naive_rollup(days):
+    """
+    Reference implementation: number the completed days in order.
+    """
+    rows = []
+    counters = dict.fromkeys(COUNTER_FIELDS, 0)
+    for day in sorted(days):
+        counters["total"] += 1
+        counters[WEEKDAY_FIELDS[day.weekday()]] += 1
+        rows.append((day, *counters.values()))
+    return rows
+
+
+class DailyRollupTests(TestCase):
+    """
+    Tests for the incremental maintenance of the daily rollup.
+    """
+
+    def setUp(self):
+        self.habit = Habit.objects.create(name="Read", user=get_demo_user())
+        self.today = date(2025, 6, 15)
+
+    def stored_rows(self):
+        return list(
+            DailyRollup.objects.filter(habit=self.habit)
+            .order_by("date")
+            .values_list("date", *COUNTER_FIELDS)
+        )
+
+    def test_random_operations_match_reference(self):
+        """
+        Property: after any sequence of check-in writes, the rollup
+        equals a full recomputation.
+        """
+        rng = random.Random(3)
+        days = set()
+
+        for _ in range(200):
+            day = self.today - timedelta(days=rng.randrange(40))
+            if day in days:
+                HabitCheckIn.objects.filter(habit=self.habit, date=day).delete()
+                days.discard(day)
+            else:
+                HabitCheckIn.objects.create(habit=self.habit, date=day)
+                days.add(day)
+
+            self.assertEqual(self.stored_rows(), naive_rollup(days))
+
+    def test_rebuild_matches_incremental_rows(self):
+        rng = random.Random(5)
+        days = {self.today - timedelta(days=rng.randrange(400)) for _ in range(120)}
+        for day in days:
+            HabitCheckIn.objects.create(habit=self.habit, date=day)
+        incremental = self.stored_rows()
+
+        out = StringIO()
+        call_command("rebuild_habit_rollups", stdout=out)
+
+        self.assertIn(f"Wrote {len(days)} rollup rows", out.getvalue())
+        self.assertEqual(self.stored_rows(), incremental)
+
+    def test_bulk_writes_rebuild_rollup(self):
+        days = [self.today - timedelta(days=offset) for offset in (0, 1, 5)]
+        apply_checkins([
+            {"habit_id": self.habit.id, "date": day.isoformat()}
+            for day in days
+        ])
+
+        self.assertEqual(self.stored_rows(), naive_rollup(days))
+
+
+class HabitStatsTests(TestCase):
+    """
+    Tests for statistics computed from prefix counts.
+    """
+
+    def setUp(self):
+        self.habit = Habit.objects.create(name="Run", user=get_demo_user())
+        # A Sunday
+        self.end = date(2025, 6, 15)
+
+    def complete(self, habit, offsets):
+        HabitCheckIn.objects.bulk_create(
+            HabitCheckIn(habit=habit, date=self.end - timedelta(days=offset))
+            for offset in offsets
+        )
+        DailyRollup.objects.rebuild()
+
+    def test_window_counts_match_scan(self):
+        rng = random.Random(9)
+        offsets = {rng.randrange(800) for _ in range(300)}
+        self.complete(self.habit, offsets)
+        windows = [1, 7, 30, 365, 700]
+
+        (stats,) = habit_stats([self.habit.id], self.end, windows)
+
+        for days in windows:
+            expected = sum(1 for offset in offsets if offset < days)
+            self.assertEqual(stats.windows[days], expected)
+
+    def test_rates_only_count_scheduled_days(self):
+        # Mon, Wed, Fri
+        self.habit.schedule = from_weekdays([0, 2, 4])
+        self.habit.save()
+        rng = random.Random(5)
+        offsets = {rng.randrange(120) for _ in range(70)}
+        self.complete(self.habit, offsets)
+        windows = [7, 30, 90]
+
+        (stats,) = habit_stats([self.habit.id], self.end, windows)
+
+        for days in windows:
+            window = [self.end - timedelta(days=offset) for offset in range(days)]
+            due = [day for day in window if day.weekday() in (0, 2, 4)]
+            done = sum(1 for day in due if (self.end - day).days in offsets)
+            self.assertEqual(stats.scheduled[days], (done, len(due)))
+            self.assertEqual(
+                stats.as_dict()["windows"][str(days)]["rate"],
+                round(done / len(due), 4),
+            )
+        self.assertIn(stats.best_weekday, (0, 2, 4))
+
+    def test_best_weekday_and_trend(self):
+        # Every Sunday of the last 4 weeks, plus every day of the last week
+        self.complete(self.habit, {0, 7, 14, 21} | set(range(7)))
+
+        (stats,) = habit_stats([self.habit.id], self.end, [28])
+
+        self.assertEqual(stats.best_weekday, 6)
+        # First half: 2 of 14 days, second half: 8 of 14 days
+        self.assertEqual(stats.trend, round(8 / 14 - 2 / 14, 4))
+        self.assertEqual(stats.as_dict()["best_weekday"], "Sunday")
+
+    def test_habit_without_history(self):
+        (stats,) = habit_stats([self.habit.id], self.end, [30])
+
+        self.assertEqual(stats.windows, {30: 0})
+        self.assertIsNone(stats.best_weekday)
+        self.assertEqual(stats.trend, 0.0)
+
+    def test_query_count_does_not_grow_with_habits(self):
+        habits = Habit.objects.bulk_create(
+            Habit(name=f"Habit {i}", user=get_demo_user()) for i in range(30)
+        )
+        for habit in habits:
+            self.complete(habit, range(0, 60, 3))
+        habit_ids = [habit.id for habit in habits]
+
+        with self.assertNumQueries(2):
+            results = habit_stats(habit_ids, self.end, [30, 90, 365])
+
+        self.assertEqual(len(results), 30)
+        self.assertTrue(all(stats.windows[30] == 10 for stats in results))
+
+    def test_weekday_occurrences(self):
+        start = date(2025, 6, 2)  # a Monday
+        self.assertEqual(
+            weekday_occurrences(start, start + timedelta(days=9)),
+            [2, 2, 2, 1, 1, 1, 1],
+        )
+
+
+class HabitAnalyticsViewTests(TestCase):
+    """
+    Tests for the analytics JSON endpoint.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("ana", password="secret")
+        self.habit = Habit.objects.create(name="Yoga", user=self.user)
+        self.client.force_login(self.user)
+
+    def test_returns_stats_for_own_habits(self):
+        other = Habit.objects.create(name="Foreign", user=get_demo_user())
+        end = date(2025, 6, 15)
+        for habit in (self.habit, other):
+            for offset in range(10):
+                HabitCheckIn.objects.create(habit=habit, date=end - timedelta(days=offset))
+
+        response = self.client.get(
+            reverse("habit_analytics"),
+            {"windows": "7,30", "end": end.isoformat()},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["end"], "2025-06-15")
+        self.assertEqual(len(data["habits"]), 1)
+        habit = data["habits"][0]
+        self.assertEqual(habit["name"], "Yoga")
+        self.assertEqual(
+            habit["windows"]["7"],
+            {"completed": 7, "days": 7, "scheduled_days": 7, "rate": 1.0},
+        )
+        self.assertEqual(habit["windows"]["30"]["completed"], 10)
+
+    def test_habit_filter_and_validation(self):
+        response = self.client.get(
+            reverse("habit_analytics"), {"habit": [self.habit.id, 999]}
+        )
+        self.assertEqual(
+            [habit["habit_id"] for habit in response.json()["habits"]],
+            [self.habit.id],
+        )
+
+        for params in ({"windows": "abc"}, {"windows": "0"}, {"end": "soon"}, {"habit": "x"}):
+            response = self.client.get(reverse("habit_analytics"), params)
+            self.assertEqual(response.status_code, 400)
+
+
+def naive_focus(sessions):
+    """
+    Reference implementation: add up the completed sessions one by one.
+    """
+    rows = {}
+    for session in sessions:
+        if session.status != "completed":
+            continue
+        key = (session.user_id, session.habit_id, timezone.localdate(session.started_at))
+        seconds, count = rows.get(key, (0, 0))
+        rows[key] = (seconds + session.duration_seconds, count + 1)
+    return sorted(
+        (user_id, habit_id or 0, day, seconds, count)
+        for (user_id, habit_id, day), (seconds, count) in rows.items()
+    )
+
+
+@override_settings(TIME_ZONE="Europe/Zurich")
+class FocusRollupTests(TestCase):
+    """
+    Tests for the incremental maintenance of the focus rollup.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username="focus")
+        self.habits = [
+            Habit.objects.create(name=name, user=self.user) for name in ("Read", "Code")
+        ]
+        self.now = timezone.now()
+
+    def stored_rows(self):
+        return sorted(
+            (user_id, habit_id or 0, day, seconds, count)
+            for user_id, habit_id, day, seconds, count in
+            FocusRollup.objects.values_list("user_id", "habit_id", "date", "seconds", "sessions")
+        )
+
+    def live_rows(self):
+        return naive_focus(PomodoroSession.objects.all())
+
+    def test_random_operations_match_reference(self):
+        """
+        Property: after any sequence of session writes, the rollup
+        equals a full recomputation.
+        """
+        rng = random.Random(11)
+
+        for _ in range(120):
+            action = rng.randrange(5)
+            sessions = list(PomodoroSession.objects.order_by("id"))
+            if action == 0 or not sessions:
+                # A session around midnight in the local time zone
+                started = self.now - timedelta(hours=rng.randrange(72), minutes=rng.randrange(60))
+                PomodoroSession.objects.create(
+                    user=self.user,
+                    habit=rng.choice(self.habits + [None]),
+                    status=rng.choice(["completed", "stopped"]),
+                    duration_seconds=rng.choice([300, 1500]),
+                    started_at=started,
+                    ended_at=started,
+                )
+            elif action == 1:
+                session = rng.choice(sessions)
+                session.habit = rng.choice(self.habits + [None])
+                session.save()
+            elif action == 2:
+                rng.choice(sessions).delete()
+            elif action == 3:
+                started = self.now - timedelta(hours=rng.randrange(1, 48))
+                pomodoro_services.start_session(self.user, now=started)
+                pomodoro_services.complete_expired(self.now)
+            else:
+                session = rng.choice(sessions)
+                session.status = rng.choice(["completed", "stopped"])
+                session.save()
+
+            self.assertEqual(self.stored_rows(), self.live_rows())
+
+    def test_deleted_habit_time_counts_without_habit(self):
+        read, code = self.habits
+        for habit in (read, code, None):
+            PomodoroSession.objects.create(
+                user=self.user, habit=habit, status="completed", started_at=self.now
+            )
+
+        read.delete()
+
+        self.assertEqual(self.stored_rows(), self.live_rows())
+        self.assertEqual(
+            FocusRollup.objects.get(habit=None).seconds, 2 * 1500
+        )
+
+    def test_purged_habit_time_counts_without_habit(self):
+        read, code = self.habits
+        for habit in (read, read, code, None):
+            PomodoroSession.objects.create(
+                user=self.user, habit=habit, status="completed", started_at=self.now
+            )
+
+        read.soft_delete()
+        purge_habit(read.id, batch_size=1)
+
+        self.assertEqual(self.stored_rows(), self.live_rows())
+        self.assertEqual(
+            FocusRollup.objects.get(habit=None).seconds, 3 * 1500
+        )
+
+    def test_deleting_a_user_leaves_no_rows_behind(self):
+        PomodoroSession.objects.create(
+            user=self.user, habit=self.habits[0], status="completed", started_at=self.now
+        )
+        self.user.delete()
+
+        self.assertFalse(FocusRollup.objects.exists())
+
+    def test_rebuild_matches_incremental_rows(self):
+        rng = random.Random(4)
+        for _ in range(50):
+            PomodoroSession.objects.create(
+                user=self.user,
+                habit=rng.choice(self.habits + [None]),
+                status="completed",
+                started_at=self.now - timedelta(hours=rng.randrange(24 * 30)),
+            )
+        incremental = self.stored_rows()
+
+        out = StringIO()
+        call_command("rebuild_focus_rollups", stdout=out)
+
+        self.assertIn(f"Wrote {len(incremental)} focus rollup rows", out.getvalue())
+        self.assertEqual(self.stored_rows(), incremental)
+
+
+class FocusSeriesTests(TestCase):
+    """
+    Tests for focus reports computed from the rollup.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username="focus")
+        self.habit = Habit.objects.create(name="Write", user=self.user)
+        # A Sunday
+        self.end = date(2025, 6, 15)
+
+    def session(self, offset, habit=None, user=None):
+        return PomodoroSession.objects.create(
+            user=user or self.user,
+            habit=habit,
+            status="completed",
+            started_at=timezone.make_aware(
+                datetime.combine(self.end - timedelta(days=offset), time(9))
+            ),
+        )
+
+    def test_rollup_matches_raw_sessions(self):
+        rng = random.Random(2)
+        for _ in range(150):
+            self.session(rng.randrange(120), habit=rng.choice([self.habit, None]))
+        start = self.end - timedelta(days=99)
+
+        for period in ("day", "week", "month"):
+            with self.assertNumQueries(1):
+                series = focus_series(self.user.id, start, self.end, period)
+            raw = raw_focus_series(self.user.id, start, self.end, period)
+            self.assertEqual(series, raw)
+            self.assertEqual([s.habit_id for s in series], [self.habit.id, None])
+
+    def test_weekly_buckets(self):
+        # Sunday and Monday are in different weeks
+        self.session(0, self.habit)
+        self.session(6, self.habit)
+        self.session(6, self.habit)
+        self.session(7, self.habit)
+
+        (series,) = focus_series(self.user.id, self.end - timedelta(days=13), self.end, "week")
+
+        self.assertEqual(
+            series.buckets,
+            {date(2025, 6, 2): (1500, 1), date(2025, 6, 9): (4500, 3)},
+        )
+
+    def test_raw_history_reads_the_covering_index(self):
+        queryset = (
+            PomodoroSession.objects
+            .filter(user=self.user, status="completed")
+            .started_on([self.end])
+            .values_list("habit_id")
+            .annotate(total=Sum("duration_seconds"))
+        )
+
+        self.assertIn("COVERING INDEX pomodoro_user_started_idx", queryset.explain())
+
+
+class FocusAnalyticsViewTests(TestCase):
+    """
+    Tests for the focus time JSON endpoint.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("ana", password="secret")
+        self.habit = Habit.objects.create(name="Yoga", user=self.user)
+        self.client.force_login(self.user)
+        self.end = date(2025, 6, 15)
+
+    def test_returns_focus_minutes_per_habit(self):
+        started = timezone.make_aware(datetime(2025, 6, 14, 9))
+        for habit in (self.habit, None):
+            PomodoroSession.objects.create(
+                user=self.user, habit=habit, status="completed", started_at=started
+            )
+        PomodoroSession.objects.create(
+            user=get_demo_user(), status="completed", started_at=started
+        )
+
+        response = self.client.get(
+            reverse("focus_analytics"), {"period": "week", "end": self.end.isoformat()}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data["start"], data["end"]), ("2025-04-21", "2025-06-15"))
+        self.assertEqual(
+            [(habit["name"], habit["minutes"]) for habit in data["habits"]],
+            [("Yoga", 25.0), (None, 25.0)],
+        )
+        buckets = data["habits"][0]["buckets"]
+        self.assertEqual(len(buckets), 8)
+        self.assertEqual(
+            buckets[-1], {"start": "2025-06-09", "minutes": 25.0, "sessions": 1}
+        )
+
+    def test_habit_filter_and_validation(self):
+        PomodoroSession.objects.create(
+            user=self.user, status="completed", started_at=timezone.now()
+        )
+        response = self.client.get(reverse("focus_analytics"), {"habit": self.habit.id})
+        self.assertEqual(response.json()["habits"], [])
+
+        for params in (
+            {"period": "year"},
+            {"end": "soon"},
+            {"start": "2025-06-16", "end": "2025-06-15"},
+            {"start": "2000-01-01", "end": "2025-06-15"},
+            {"habit": "x"},
+        ):
+            response = self.client.get(reverse("focus_analytics"), params)
+            self.assertEqual(response.status_code, 400)
@@ -0,0 +1,7 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path("habits/", views.habit_analytics, name="habit_analytics"),
+    path("focus/", views.focus_analytics, name="focus_analytics"),
+]
@@ -0,0 +1,157 @@
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from datetime import date
+
+from habits.models import Habit
+from habits.users import get_current_user
+from .focus import PERIODS, bucket_starts, first_bucket, focus_series
+from .stats import habit_stats
+
+# Windows used when the request does not ask for specific ones
+DEFAULT_WINDOWS = (30, 90, 365)
+
+# Limits for a single request
+MAX_WINDOWS = 10
+MAX_WINDOW_DAYS = 10 * 366
+
+# Buckets of a focus report when the request gives no start
+DEFAULT_BUCKETS = {"day": 14, "week": 8, "month": 6}
+
+
+def _parse_windows(raw):
+    """Parse a comma separated list of window lengths in days."""
+    if not raw:
+        return list(DEFAULT_WINDOWS)
+
+    try:
+        windows = [int(part) for part in raw.split(",")]
+    except ValueError:
+        raise ValueError("windows must be a comma separated list of days")
+
+    if len(windows) > MAX_WINDOWS:
+        raise ValueError(f"at most {MAX_WINDOWS} windows per request")
+    if any(not 1 <= days <= MAX_WINDOW_DAYS for days in windows):
+        raise ValueError(f"windows must be between 1 and {MAX_WINDOW_DAYS} days")
+    return windows
+
+
+@require_GET
+def habit_analytics(request):
+    """
+    JSON endpoint: completion statistics of the current user's habits.
+
+    Query parameters (all optional):
+    - windows: window lengths in days, e.g. "30,90,365"
+    - end: last day of all windows (ISO date, default today)
+    - habit: habit id, may be repeated (default: all habits)
+
+    For every habit, returns the completion rate of each window, the
+    weekday with the highest completion rate and the trend of the
+    longest window. Rates only count the days on the habit's weekday
+    schedule. Statistics come from prefix counts of the daily
+    rollup, so the cost per habit does not depend on the window length.
+    """
+
+    try:
+        windows = _parse_windows(request.GET.get("windows"))
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    try:
+        end = date.fromisoformat(request.GET.get("end") or date.today().isoformat())
+    except ValueError:
+        return JsonResponse({"error": "end must be an ISO date (YYYY-MM-DD)"}, status=400)
+
+    try:
+        habit_ids = [int(value) for value in request.GET.getlist("habit")]
+    except ValueError:
+        return JsonResponse({"error": "habit must be an integer"}, status=400)
+
+    habits = Habit.objects.filter(user=get_current_user(request))
+    if habit_ids:
+        habits = habits.filter(id__in=habit_ids)
+    names = dict(habits.values_list("id", "name"))
+
+    results = []
+    for stats in habit_stats(list(names), end, windows):
+        results.append({"name": names[stats.habit_id], **stats.as_dict()})
+
+    return JsonResponse({
+        "end": end.isoformat(),
+        "habits": results,
+    })
+
+
+def _parse_date(raw, default, name):
+    """Parse an optional ISO date parameter."""
+    try:
+        return date.fromisoformat(raw) if raw else default
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO date (YYYY-MM-DD)")
+
+
+@require_GET
+def focus_analytics(request):
+    """
+    JSON endpoint: focus minutes of the current user per habit.
+
+    Query parameters (all optional):
+    - period: "day", "week" (default) or "month"
+    - end: last day of the report (ISO date, default today)
+    - start: first day (ISO date, default: 14 days, 8 weeks or 6
+      months back, whole buckets)
+    - habit: habit id, may be repeated (default: all habits and the
+      sessions without one)
+
+    For every habit with focus time, returns its total minutes and
+    the minutes and completed sessions of every bucket. Served from
+    the focus rollup, so the cost does not grow with the number of
+    sessions.
+    """
+    period = request.GET.get("period") or "week"
+    if period not in PERIODS:
+        return JsonResponse(
+            {"error": f"period must be one of {', '.join(PERIODS)}"}, status=400
+        )
+
+    try:
+        end = _parse_date(request.GET.get("end"), date.today(), "end")
+        start = _parse_date(
+            request.GET.get("start"),
+            first_bucket(end, period, DEFAULT_BUCKETS[period]),
+            "start",
+        )
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    if not 0 <= (end - start).days < MAX_WINDOW_DAYS:
+        return JsonResponse(
+            {"error": f"start must be at most {MAX_WINDOW_DAYS} days before end"},
+            status=400,
+        )
+
+    try:
+        habit_ids = [int(value) for value in request.GET.getlist("habit")]
+    except ValueError:
+        return JsonResponse({"error": "habit must be an integer"}, status=400)
+
+    user = get_current_user(request)
+    habits = Habit.objects.filter(user=user)
+    if habit_ids:
+        habits = habits.filter(id__in=habit_ids)
+    names = dict(habits.values_list("id", "name"))
+
+    starts = bucket_starts(start, end, period)
+    results = []
+    for series in focus_series(user.id, start, end, period, habit_ids or None):
+        # Skip the time of deleted habits
+        if series.habit_id is not None and series.habit_id not in names:
+            continue
+        results.append({"name": names.get(series.habit_id), **series.as_dict(starts)})
+
+    return JsonResponse({
+        "period": period,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "habits": results,
+    })
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +44,7 @@ INSTALLED_APPS = [
     'todos',     # neu hinzugefügt von David
     'books',     # neu hinzugefügt von Iri
     'pomodoro',  # neu hinzugefügt von Iri
+    'analytics',
 ]
 
 MIDDLEWARE = [
@@ -82,10 +84,74 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction starts, so
+            # concurrent writers wait (up to `timeout` seconds) instead
+            # of failing with "database is locked" on lock upgrade
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        'TEST': {
+            # File-backed test database, so concurrency tests exercise
+            # the same locking as production
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+#
+# Used for the versioned dashboard cache (see habits/cache.py) and,
+# under a separate alias, for idempotency keys (see habits/idempotency.py).
+# In-memory by default (development); set STREAKLY_CACHE=file to share
+# the caches between the worker processes of a single machine.
+
+# Idempotency keys: bounded number of entries
+IDEMPOTENCY_CACHE_OPTIONS = {
+    'OPTIONS': {'MAX_ENTRIES': 10000},
+}
+
+if os.environ.get("STREAKLY_CACHE") == "file":
+    CACHE_DIR = os.environ.get("STREAKLY_CACHE_DIR", str(BASE_DIR / ".cache"))
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_DIR,
+        },
+        'idempotency': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(CACHE_DIR, "idempotency"),
+            **IDEMPOTENCY_CACHE_OPTIONS,
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'idempotency': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'idempotency',
+            **IDEMPOTENCY_CACHE_OPTIONS,
+        },
+    }
+
+# Cache alias and lifetime (seconds) of cached dashboard sections
+DASHBOARD_CACHE_ALIAS = 'default'
+DASHBOARD_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Cache alias and lifetime (seconds) of remembered idempotency keys
+IDEMPOTENCY_CACHE_ALIAS = 'idempotency'
+IDEMPOTENCY_KEY_TIMEOUT = 10 * 60
+
+# Deleted habits are purged after the request in a background thread,
+# removing this many rows per transaction (see habits.purge)
+HABIT_PURGE_IN_BACKGROUND = True
+HABIT_PURGE_BATCH_SIZE = 500
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -8,4 +8,5 @@ urlpatterns = [
     path("todos/", include("todos.urls")),   # neu hinzugefügt von David
     path("books/", include("books.urls")),    # neu hinzugefügt von Iri
     path("pomodoro/", include("pomodoro.urls")), # neu hinzugefügt von Iri
+    path("analytics/", include("analytics.urls")),
 ]
\ No newline at end of file
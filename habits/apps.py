@@ -12,3 +12,11 @@ class HabitsConfig(AppConfig):
 
     # Name of the application as referenced in INSTALLED_APPS
     name = "habits"
+
+    def ready(self):
+        """
+        Connect the signal handlers that keep derived
+        check-in data (e.g. year bitmaps) in sync, and the
+        automatic check-ins of completed focus sessions.
+        """
+        from . import focus, signals  # noqa: F401
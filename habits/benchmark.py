@@ -0,0 +1,56 @@
+"""
+Small helpers shared by the benchmark management commands.
+
+Benchmarks generate large amounts of synthetic data. They run inside
+`rolled_back()`, so nothing they create is ever committed to the
+database they are pointed at.
+"""
+
+from contextlib import contextmanager
+import statistics
+import time
+
+from django.db import DatabaseError, connection, transaction
+
+
+@contextmanager
+def rolled_back():
+    """
+    Run a block inside a transaction that is always rolled back.
+    """
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def timed(func, repeat=20):
+    """
+    Call `func` `repeat` times and return the median duration in ms.
+    """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations)
+
+
+def table_size(table):
+    """
+    Size of a table including its indexes in bytes.
+
+    Uses SQLite's `dbstat` virtual table and returns None on
+    databases (or SQLite builds) that do not provide it.
+    """
+    if connection.vendor != "sqlite":
+        return None
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT SUM(pgsize) FROM dbstat WHERE name IN "
+                "(SELECT name FROM sqlite_master WHERE tbl_name = %s)",
+                [table],
+            )
+            return cursor.fetchone()[0]
+    except DatabaseError:
+        return None
@@ -0,0 +1,100 @@
+"""
+Bit helpers for year bitmaps.
+
+A year bitmap is an integer in which bit ``i`` stands for the
+``i``-th day of the year (bit 0 = January 1st). 366 bits are enough
+for leap years, so every bitmap fits into 46 bytes when stored.
+"""
+
+from datetime import date
+
+# Number of bytes needed to store 366 day bits
+YEAR_BYTES = 46
+
+
+def day_index(day):
+    """Zero-based index of a date within its year."""
+    return day.timetuple().tm_yday - 1
+
+
+def days_in_year(year):
+    """Number of days in the given year (365 or 366)."""
+    return (date(year + 1, 1, 1) - date(year, 1, 1)).days
+
+
+def from_bytes(data):
+    """Decode a stored bitmap into an integer."""
+    return int.from_bytes(bytes(data or b""), "little")
+
+
+def to_bytes(mask):
+    """Encode an integer bitmap for storage."""
+    return mask.to_bytes(YEAR_BYTES, "little")
+
+
+def range_mask(length):
+    """Bitmap with the lowest `length` bits set."""
+    return (1 << length) - 1 if length > 0 else 0
+
+
+def shift(mask, offset):
+    """Shift a bitmap left for positive offsets, right for negative ones."""
+    return mask << offset if offset >= 0 else mask >> -offset
+
+
+def longest_run(mask):
+    """
+    Length of the longest run of consecutive set bits.
+
+    Each iteration of ``mask &= mask >> 1`` shortens every run by one,
+    so the loop runs once per day of the longest run instead of once
+    per day of the range.
+    """
+    length = 0
+    while mask:
+        mask &= mask >> 1
+        length += 1
+    return length
+
+
+def trailing_run(mask, length):
+    """
+    Length of the run of set bits ending at bit ``length - 1``.
+
+    Used for "current streak" style questions, where the run has to
+    touch the end of the range.
+    """
+    inverted = ~mask & range_mask(length)
+    if not inverted:
+        return length
+    return length - inverted.bit_length()
+
+
+def iter_offsets(mask):
+    """Yield the positions of all set bits in ascending order."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def iter_runs(mask):
+    """
+    Yield (offset, length) for every run of consecutive set bits,
+    in ascending order.
+
+    Skips whole gaps and runs at once, so the loop runs once per run
+    instead of once per day.
+    """
+    offset = 0
+    while mask:
+        # Skip the gap before the next run
+        gap = (mask & -mask).bit_length() - 1
+        mask >>= gap
+        offset += gap
+
+        # Trailing ones of the shifted mask form the run
+        length = (mask ^ (mask + 1)).bit_length() - 1
+        yield offset, length
+        mask >>= length
+        offset += length
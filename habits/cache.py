@@ -0,0 +1,122 @@
+"""
+Versioned cache for the computed dashboard sections.
+
+The dashboard data only changes when one of its source models is
+written. Instead of deleting cached entries on every write, each data
+scope has a version number stored in the cache; writes bump the
+version (see habits.signals), which makes every entry built from the
+old version unreachable. Entries are additionally keyed by date, so
+the day rollover invalidates them as well.
+
+Habit and reading data is owned by users, so those scopes are
+versioned per user (see `user_scope`): a write by one user never
+invalidates the cached dashboard of another.
+"""
+
+from collections import Counter
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Data scopes the dashboard sections depend on
+HABITS = "habits"
+BOOKS = "books"
+
+# Process-local hit/miss counters
+stats = Counter()
+
+
+def user_scope(scope, user_id):
+    """The per-user variant of a data scope."""
+    return f"{scope}:{user_id}"
+
+
+def user_scopes(user_id):
+    """All scopes the dashboard of one user depends on."""
+    return [
+        user_scope(HABITS, user_id),
+        user_scope(BOOKS, user_id),
+        # Book titles are shared between all users
+        BOOKS,
+    ]
+
+
+def get_cache():
+    """The cache backend used for dashboard sections."""
+    return caches[getattr(settings, "DASHBOARD_CACHE_ALIAS", "default")]
+
+
+def _timeout():
+    return getattr(settings, "DASHBOARD_CACHE_TIMEOUT", 24 * 60 * 60)
+
+
+def _version_key(scope):
+    return f"dashboard:version:{scope}"
+
+
+def get_version(scope):
+    """
+    Current version of a scope.
+
+    Missing versions (first use, eviction, cache restart) start at the
+    current time in nanoseconds, so they never repeat an old version.
+    """
+    cache = get_cache()
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump(*scopes):
+    """
+    Invalidate all cached sections that depend on the given scopes.
+    """
+    cache = get_cache()
+    for scope in scopes:
+        try:
+            cache.incr(_version_key(scope))
+        except ValueError:
+            cache.add(_version_key(scope), time.time_ns(), timeout=None)
+
+
+def sections_key(today, scopes):
+    """Cache key for the dashboard sections of a day and set of scopes."""
+    names = ",".join(scopes)
+    versions = ":".join(str(get_version(scope)) for scope in scopes)
+    return f"dashboard:sections:{today.isoformat()}:{names}:{versions}"
+
+
+def get_or_build(today, scopes, build):
+    """
+    Return the cached sections for `today`, building them on a miss.
+
+    `build` is called without arguments and must return a picklable
+    dict (model instances are fine).
+    """
+    cache = get_cache()
+    key = sections_key(today, scopes)
+
+    sections = cache.get(key)
+    if sections is not None:
+        stats["hits"] += 1
+        return sections
+
+    stats["misses"] += 1
+    sections = build()
+    cache.set(key, sections, timeout=_timeout())
+    return sections
+
+
+def cache_stats():
+    """Hit/miss counters of the current process."""
+    hits, misses = stats["hits"], stats["misses"]
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / total if total else 0.0,
+    }
@@ -0,0 +1,138 @@
+from datetime import date, timedelta
+import calendar
+
+from . import bitmap
+from .models import HabitCheckIn, HabitYear
+
+
+class HabitCalendar:
+    """
+    Compact calendar data for many habits over a date range.
+
+    Every habit is represented by a single integer bitmask:
+    bit ``i`` is set when the habit was completed on ``start + i days``.
+    This keeps the structure small (one int per habit instead of a set
+    of dates) and makes membership and count checks cheap.
+    """
+
+    __slots__ = ("start", "end", "masks")
+
+    def __init__(self, start, end, masks):
+        # First and last day covered by the calendar (both inclusive)
+        self.start = start
+        self.end = end
+
+        # Mapping: habit_id -> day bitmask
+        self.masks = masks
+
+    @property
+    def length(self):
+        """Number of days covered by the calendar."""
+        return (self.end - self.start).days + 1
+
+    def mask(self, habit_id):
+        """Return the raw day bitmask of a habit (0 if nothing was completed)."""
+        return self.masks.get(habit_id, 0)
+
+    def is_completed(self, habit_id, day):
+        """Check whether a habit was completed on the given date."""
+        if not self.start <= day <= self.end:
+            return False
+        return bool(self.mask(habit_id) >> (day - self.start).days & 1)
+
+    def count(self, habit_id):
+        """Number of completed days of a habit within the range."""
+        return self.mask(habit_id).bit_count()
+
+    def days(self, habit_id):
+        """List of completed dates of a habit, in ascending order."""
+        mask = self.mask(habit_id)
+        result = []
+        offset = 0
+        while mask:
+            if mask & 1:
+                result.append(self.start + timedelta(days=offset))
+            mask >>= 1
+            offset += 1
+        return result
+
+    def runs(self, habit_id):
+        """
+        Run-length encoding of a habit's completed days.
+
+        Returns a list of [offset, length] pairs: ``length`` completed
+        days starting at ``start + offset days``.
+        """
+        return [
+            [offset, length]
+            for offset, length in bitmap.iter_runs(self.mask(habit_id))
+        ]
+
+    def __getitem__(self, habit_id):
+        """
+        Set of completed 1-based day indexes within the range.
+
+        For a calendar covering a single month this is exactly the
+        set of completed days of the month.
+        """
+        return {
+            (day - self.start).days + 1
+            for day in self.days(habit_id)
+        }
+
+    def __contains__(self, habit_id):
+        return habit_id in self.masks
+
+
+def build_calendar(habits, start, end):
+    """
+    Build a HabitCalendar for the given habits and date range.
+
+    All check-ins of all habits are fetched with a single query,
+    no matter how many habits are passed in. ``habits`` may be a
+    queryset (used as a subquery) or an iterable of habit IDs.
+    """
+    masks = {}
+
+    checkins = (
+        HabitCheckIn.objects
+        .filter(
+            habit__in=habits,
+            date__range=(start, end),
+            completed=True,
+        )
+        .order_by()
+        .values_list("habit_id", "date")
+    )
+
+    for habit_id, day in checkins:
+        masks[habit_id] = masks.get(habit_id, 0) | 1 << (day - start).days
+
+    return HabitCalendar(start, end, masks)
+
+
+def build_bitmap_calendar(habit_ids, start, end):
+    """
+    Build a HabitCalendar from the year bitmaps instead of check-ins.
+
+    Reads at most one HabitYear row per habit and year, so it is the
+    better choice for long ranges (multi-year heatmaps). ``habit_ids``
+    may be a queryset of ids or an iterable of habit IDs.
+    """
+    return HabitCalendar(
+        start,
+        end,
+        HabitYear.objects.range_masks(habit_ids, start, end),
+    )
+
+
+def build_month_calendar(habits, year, month):
+    """
+    Build a HabitCalendar covering one full calendar month.
+    """
+    days_in_month = calendar.monthrange(year, month)[1]
+    return build_calendar(
+        habits,
+        date(year, month, 1),
+        date(year, month, days_in_month),
+    )
@@ -0,0 +1,97 @@
+"""
+Automatic habit check-ins from completed focus sessions.
+
+A completed Pomodoro session linked to a habit of its user completes
+that habit on the local day the session started, if the session
+lasted at least POMODORO_CHECKIN_MIN_SECONDS (default: one full
+session of pomodoro.services.DEFAULT_DURATION).
+
+Sessions are processed in batches rather than one by one: a batch of
+pending sessions is grouped by habit and day and written through
+`apply_checkins`, i.e. one bulk insert and one streak rebuild for all
+habits of the batch, however many sessions completed them. Every
+completed session is marked as processed, whether it produced a
+check-in or not, so a check-in the user removes later is not
+restored.
+
+Sessions completed by the expiry sweeper are processed right away
+(see `check_in_completed_sessions`); the `apply_focus_checkins`
+command processes everything else that is pending, e.g. sessions
+completed through the admin.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+
+from pomodoro.models import PomodoroSession
+from pomodoro.services import DEFAULT_DURATION
+from pomodoro.signals import sessions_completed
+from .services import apply_checkins
+
+# Sessions processed per transaction
+DEFAULT_BATCH_SIZE = 500
+
+
+def minimum_seconds():
+    """Shortest session that checks its habit in."""
+    return getattr(settings, "POMODORO_CHECKIN_MIN_SECONDS", DEFAULT_DURATION)
+
+
+def _batch_size(batch_size):
+    return batch_size or getattr(settings, "POMODORO_CHECKIN_BATCH_SIZE", DEFAULT_BATCH_SIZE)
+
+
+def apply_focus_checkins(user_ids=None, minimum=None, batch_size=None):
+    """
+    Check in the habits of all (or the given users') pending sessions.
+
+    Returns (processed sessions, created check-ins).
+    """
+    minimum = minimum_seconds() if minimum is None else minimum
+    batch_size = _batch_size(batch_size)
+
+    pending = PomodoroSession.objects.pending_checkin()
+    if user_ids is not None:
+        pending = pending.filter(user_id__in=user_ids)
+
+    processed = created = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                pending
+                .select_for_update()
+                .order_by("id")
+                .values_list(
+                    "id", "user_id", "habit_id", "habit__user_id",
+                    "started_at", "duration_seconds",
+                )[:batch_size]
+            )
+            if not batch:
+                break
+
+            # One entry per habit and day
+            days = {
+                (habit_id, timezone.localdate(started_at))
+                for _, user_id, habit_id, owner_id, started_at, duration in batch
+                if habit_id is not None and owner_id == user_id and duration >= minimum
+            }
+            results = apply_checkins([
+                {"habit_id": habit_id, "date": day.isoformat()}
+                for habit_id, day in sorted(days)
+            ])
+
+            PomodoroSession.objects.filter(
+                id__in=[row[0] for row in batch]
+            ).update(checkin_processed=True)
+
+        processed += len(batch)
+        created += sum(result.status == "created" for result in results)
+    return processed, created
+
+
+@receiver(sessions_completed)
+def check_in_completed_sessions(sender, user_ids, **kwargs):
+    """Process the sessions the expiry sweeper just completed."""
+    apply_focus_checkins(user_ids=user_ids)
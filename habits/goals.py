@@ -0,0 +1,188 @@
+"""
+Rolling-window frequency goals ("3 times per 7 days").
+
+A habit with a goal should be completed `goal_count` times within the
+last `goal_days` days (7 or 30). Progress is not recounted from
+check-ins on every page view. Instead, every habit carries a sliding
+window over its recent days:
+
+- `recent_mask`: bit ``i`` is set when the habit was completed on
+  ``recent_anchor - i days``
+- `recent_anchor`: the day bit 0 stands for
+
+The check-in signals slide the window to the current anchor and flip a
+single bit. Reading the progress for a day slides the stored window in
+memory (one shift) and counts the bits, so the dashboard gets the
+progress of every habit from the habit rows it loads anyway.
+
+Windows are anchored MAX_AHEAD days after today, so check-ins dated up
+to a month ahead are tracked too. `python manage.py
+recompute_habit_goals` rebuilds the windows from HabitCheckIn.
+"""
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from django.db import transaction
+
+from . import bitmap
+from . import cache as dashboard_cache
+from .models import Habit, HabitCheckIn
+
+# Goal window lengths in days
+GOAL_WINDOWS = (7, 30)
+
+# Days kept in a window (fits a signed 64-bit column)
+RECENT_DAYS = 62
+
+# How far ahead of today a window is anchored; the rest of the bits
+# cover the longest goal window up to today
+MAX_AHEAD = RECENT_DAYS - max(GOAL_WINDOWS)
+
+
+@dataclass(slots=True)
+class GoalProgress:
+    """
+    Progress towards a frequency goal on one day.
+
+    `done` completions within the last `days` days (including the day
+    itself), out of `target`.
+    """
+
+    done: int
+    target: int
+    days: int
+
+    @property
+    def met(self):
+        return self.done >= self.target
+
+    def as_dict(self):
+        return {
+            "done": self.done,
+            "target": self.target,
+            "days": self.days,
+            "met": self.met,
+        }
+
+
+def anchor_for(today):
+    """The anchor of a window written on `today`."""
+    return today + timedelta(days=MAX_AHEAD)
+
+
+def slide(mask, anchor, to):
+    """Re-anchor a window at `to`; days falling out are dropped."""
+    if anchor is None:
+        return 0
+    return bitmap.shift(mask, (to - anchor).days) & bitmap.range_mask(RECENT_DAYS)
+
+
+def completed_in_window(mask, anchor, today, days):
+    """Number of completed days in [today - days + 1, today]."""
+    return (slide(mask, anchor, today) & bitmap.range_mask(days)).bit_count()
+
+
+def progress(habit, today):
+    """GoalProgress of a habit on `today`, or None without a goal."""
+    return progress_of(
+        habit.goal_count, habit.goal_days,
+        habit.recent_mask, habit.recent_anchor, today,
+    )
+
+
+def progress_of(goal_count, goal_days, mask, anchor, today):
+    """GoalProgress from the goal and window columns of a habit row."""
+    if goal_count is None:
+        return None
+    done = completed_in_window(mask, anchor, today, goal_days)
+    return GoalProgress(done, goal_count, goal_days)
+
+
+def record_day(habit_id, day, completed, today=None):
+    """
+    Set or clear one day in the window of a habit.
+
+    Locks the habit row, so concurrent writes do not lose bits. Days
+    outside the window (older than any goal window, or too far ahead)
+    only move the anchor.
+    """
+    anchor = anchor_for(today or date.today())
+    with transaction.atomic():
+        row = (
+            Habit.all_objects
+            .select_for_update()
+            .filter(id=habit_id)
+            .values_list("recent_mask", "recent_anchor")
+            .first()
+        )
+        if row is None:
+            return
+        mask = slide(*row, anchor)
+
+        offset = (anchor - day).days
+        if 0 <= offset < RECENT_DAYS:
+            bit = 1 << offset
+            mask = mask | bit if completed else mask & ~bit
+
+        Habit.all_objects.filter(id=habit_id).update(
+            recent_mask=mask,
+            recent_anchor=anchor,
+        )
+
+
+def recompute(habit_ids=None, today=None, batch_size=1000):
+    """
+    Rebuild the windows of all (or the given) habits from HabitCheckIn.
+
+    Habits are processed in batches of `batch_size`: one query locks
+    the habits of a batch, one reads their recent check-ins and one
+    bulk update writes the windows back.
+    Returns the number of habits whose window had drifted from the
+    check-ins (re-anchoring alone does not count).
+    """
+    anchor = anchor_for(today or date.today())
+    oldest = anchor - timedelta(days=RECENT_DAYS - 1)
+
+    habits = Habit.all_objects.order_by("id")
+    if habit_ids is not None:
+        habits = habits.filter(id__in=habit_ids)
+    habit_ids = list(habits.values_list("id", flat=True))
+
+    drifted = []
+    for start in range(0, len(habit_ids), batch_size):
+        batch = habit_ids[start:start + batch_size]
+
+        with transaction.atomic():
+            # Lock first, so no check-in write slips in between
+            habits = list(
+                Habit.all_objects
+                .select_for_update()
+                .filter(id__in=batch)
+                .only("id", "user_id", "recent_mask", "recent_anchor")
+            )
+
+            masks = dict.fromkeys(batch, 0)
+            checkins = (
+                HabitCheckIn.objects
+                .filter(habit_id__in=batch, completed=True, date__range=(oldest, anchor))
+                .values_list("habit_id", "date")
+            )
+            for habit_id, day in checkins:
+                masks[habit_id] |= 1 << (anchor - day).days
+
+            for habit in habits:
+                current = slide(habit.recent_mask, habit.recent_anchor, anchor)
+                if current != masks[habit.id]:
+                    drifted.append(habit)
+                habit.recent_mask = masks[habit.id]
+                habit.recent_anchor = anchor
+            Habit.all_objects.bulk_update(habits, ["recent_mask", "recent_anchor"])
+
+    # Bulk updates do not send signals, invalidate cached dashboards
+    user_ids = {habit.user_id for habit in drifted}
+    transaction.on_commit(lambda: dashboard_cache.bump(*(
+        dashboard_cache.user_scope(dashboard_cache.HABITS, user_id)
+        for user_id in user_ids
+    )))
+    return len(drifted)
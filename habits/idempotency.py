@@ -0,0 +1,141 @@
+"""
+Idempotency keys for write endpoints.
+
+Clients on flaky connections retry requests whose response got lost,
+and users double-submit forms. For endpoints that flip state, each
+repeat would undo the previous write. Such clients can send a unique
+key with the request (an `Idempotency-Key` header or an
+`idempotency_key` form field): the first request with a key is
+executed and its response is remembered; repeats of the same request
+with the same key get the remembered response without running the
+view again.
+
+Keys live in a dedicated cache alias, so the store is bounded (the
+cache's MAX_ENTRIES) and forgets keys after a TTL.
+"""
+
+from functools import wraps
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+
+from .users import get_current_user
+
+# Where clients can send the key
+KEY_HEADER = "Idempotency-Key"
+KEY_FIELD = "idempotency_key"
+
+# Longest accepted key
+MAX_KEY_LENGTH = 128
+
+# Response headers that are part of a remembered response
+REPLAYED_HEADERS = ("Content-Type", "Location")
+
+
+def get_store():
+    """The cache backend that remembers keys."""
+    return caches[getattr(settings, "IDEMPOTENCY_CACHE_ALIAS", "idempotency")]
+
+
+def _timeout():
+    return getattr(settings, "IDEMPOTENCY_KEY_TIMEOUT", 10 * 60)
+
+
+def _store_key(user_id, key):
+    # Keys are chosen by clients: scope them per user and hash them,
+    # so any string is a valid cache key
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f"idempotency:{user_id}:{digest}"
+
+
+def _fingerprint(request):
+    """What a repeat has to match to count as the same request."""
+    return f"{request.method} {request.path} completed={request.POST.get('completed', '')}"
+
+
+def _snapshot(response):
+    return {
+        "status": response.status_code,
+        "content": response.content,
+        "headers": {
+            name: response[name]
+            for name in REPLAYED_HEADERS
+            if response.has_header(name)
+        },
+    }
+
+
+def _replay(snapshot):
+    response = HttpResponse(snapshot["content"], status=snapshot["status"])
+    for name, value in snapshot["headers"].items():
+        response[name] = value
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(view):
+    """
+    View decorator: remember responses per idempotency key.
+
+    Requests without a key run as usual. With a key:
+    - the first request claims the key, runs the view and stores the
+      response (server errors release the key again)
+    - repeats get the stored response
+    - a repeat arriving while the first request still runs gets 409
+    - reusing a key for a different request gets 422
+    """
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(KEY_HEADER) or request.POST.get(KEY_FIELD)
+        if not key:
+            return view(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return JsonResponse(
+                {"error": f"idempotency key longer than {MAX_KEY_LENGTH} characters"},
+                status=400,
+            )
+
+        store = get_store()
+        store_key = _store_key(get_current_user(request).pk, key)
+        fingerprint = _fingerprint(request)
+
+        # add() is atomic: exactly one request claims a new key
+        claimed = store.add(
+            store_key,
+            {"fingerprint": fingerprint, "response": None},
+            timeout=_timeout(),
+        )
+        if not claimed:
+            entry = store.get(store_key)
+            if entry is not None and entry["fingerprint"] != fingerprint:
+                return JsonResponse(
+                    {"error": "idempotency key was used for a different request"},
+                    status=422,
+                )
+            if entry is None or entry["response"] is None:
+                return JsonResponse(
+                    {"error": "a request with this idempotency key is in progress"},
+                    status=409,
+                )
+            return _replay(entry["response"])
+
+        try:
+            response = view(request, *args, **kwargs)
+        except Exception:
+            store.delete(store_key)
+            raise
+
+        if response.status_code >= 500:
+            store.delete(store_key)
+        else:
+            store.set(
+                store_key,
+                {"fingerprint": fingerprint, "response": _snapshot(response)},
+                timeout=_timeout(),
+            )
+        return response
+
+    return wrapper
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from habits.focus import apply_focus_checkins
+
+
+class Command(BaseCommand):
+    """
+    Management command: check in habits from completed focus sessions.
+
+    Processes every completed Pomodoro session that was not processed
+    yet (e.g. sessions completed outside the expiry sweeper), grouped
+    into batches with one bulk insert and one streak update each. Safe
+    to run repeatedly (e.g. from cron).
+
+    Usage:
+    python manage.py apply_focus_checkins
+    python manage.py apply_focus_checkins --minimum 900 --batch-size 200
+    """
+
+    help = "Check in the habits of completed focus sessions in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--minimum",
+            type=int,
+            default=None,
+            help="Shortest session in seconds (default: POMODORO_CHECKIN_MIN_SECONDS).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Sessions processed per transaction (default: POMODORO_CHECKIN_BATCH_SIZE).",
+        )
+
+    def handle(self, *args, minimum=None, batch_size=None, **options):
+        started = time.perf_counter()
+
+        processed, created = apply_focus_checkins(minimum=minimum, batch_size=batch_size)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {processed} sessions, {created} new check-ins in {elapsed:.2f}s."
+        ))
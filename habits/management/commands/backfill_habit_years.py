@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from habits.models import HabitYear
+from habits.services import bump_history_versions
+
+
+class Command(BaseCommand):
+    """
+    Management command: rebuild the year bitmaps from HabitCheckIn.
+
+    Streams all completed check-ins ordered by habit and date,
+    folds them into one bitmap per habit and year and writes the
+    result with batched inserts. Existing bitmaps in scope are
+    replaced, so the command can also be used to repair drift. The
+    history versions of the habits are bumped, so cached heatmaps
+    are revalidated.
+
+    Usage:
+    python manage.py backfill_habit_years
+    python manage.py backfill_habit_years 3 7 --batch-size 500
+    """
+
+    help = "Rebuild HabitYear bitmaps from the HabitCheckIn table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "habit_ids",
+            nargs="*",
+            type=int,
+            help="Only rebuild these habits (default: all habits).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of bitmap rows written per insert.",
+        )
+
+    def handle(self, *args, habit_ids=None, batch_size=1000, **options):
+        written = HabitYear.objects.rebuild(
+            habit_ids=habit_ids or None,
+            batch_size=batch_size,
+        )
+        bump_history_versions(habit_ids or None)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {written} habit year bitmaps."
+        ))
@@ -0,0 +1,116 @@
+from datetime import date, timedelta
+import random
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from habits.benchmark import rolled_back, table_size, timed
+from habits.calendar_data import build_calendar
+from habits.models import Habit, HabitCheckIn, HabitYear
+from habits.users import get_demo_user
+
+
+class Command(BaseCommand):
+    """
+    Benchmark: row-per-day check-ins vs. year bitmaps.
+
+    Generates synthetic habit histories, backfills the year bitmaps
+    and compares storage size and range-query latency of both
+    representations. All data is rolled back afterwards.
+
+    Usage:
+    python manage.py bench_checkin_storage --habits 200 --years 5
+    """
+
+    help = "Compare HabitCheckIn rows against HabitYear bitmaps."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--habits", type=int, default=100)
+        parser.add_argument("--years", type=int, default=3)
+        parser.add_argument(
+            "--density",
+            type=float,
+            default=0.7,
+            help="Share of days with a check-in (0-1).",
+        )
+        parser.add_argument("--repeat", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        end = date(2025, 12, 31)
+        start = end - timedelta(days=365 * options["years"] - 1)
+
+        with rolled_back():
+            user = get_demo_user()
+            habits = Habit.objects.bulk_create(
+                Habit(name=f"Bench habit {i}", user=user)
+                for i in range(options["habits"])
+            )
+            days = [
+                start + timedelta(days=offset)
+                for offset in range((end - start).days + 1)
+            ]
+            HabitCheckIn.objects.bulk_create(
+                (
+                    HabitCheckIn(habit=habit, date=day)
+                    for habit in habits
+                    for day in days
+                    if rng.random() < options["density"]
+                ),
+                batch_size=5000,
+            )
+            call_command("backfill_habit_years", stdout=self.stdout)
+
+            rows = HabitCheckIn.objects.count()
+            bitmaps = HabitYear.objects.count()
+            self.stdout.write(f"check-in rows:   {rows}")
+            self.stdout.write(f"bitmap rows:     {bitmaps}")
+            self.report_size("habits_habitcheckin")
+            self.report_size("habits_habityear")
+
+            habit_ids = [habit.id for habit in habits]
+
+            def random_range():
+                first = start + timedelta(days=rng.randrange(len(days) - 90))
+                return first, first + timedelta(days=89)
+
+            # Single habit, 90-day window
+            def rows_single():
+                first, last = random_range()
+                HabitCheckIn.objects.filter(
+                    habit_id=rng.choice(habit_ids),
+                    date__range=(first, last),
+                    completed=True,
+                ).count()
+
+            def bitmap_single():
+                first, last = random_range()
+                HabitYear.objects.count_completed(
+                    rng.choice(habit_ids), first, last
+                )
+
+            # All habits, full history
+            def rows_all():
+                build_calendar(habit_ids, start, end)
+
+            def bitmap_all():
+                HabitYear.objects.range_masks(habit_ids, start, end)
+
+            repeat = options["repeat"]
+            self.report("90-day count, one habit", rows_single, bitmap_single, repeat)
+            self.report("full history, all habits", rows_all, bitmap_all, max(1, repeat // 10))
+
+    def report_size(self, table):
+        size = table_size(table)
+        label = f"{size / 1024:.0f} KiB" if size is not None else "n/a"
+        self.stdout.write(f"{table}: {label}")
+
+    def report(self, label, rows_func, bitmap_func, repeat):
+        rows_ms = timed(rows_func, repeat)
+        bitmap_ms = timed(bitmap_func, repeat)
+        self.stdout.write(
+            f"{label}: rows {rows_ms:.2f} ms, "
+            f"bitmaps {bitmap_ms:.2f} ms "
+            f"({rows_ms / bitmap_ms:.1f}x)"
+        )
@@ -0,0 +1,74 @@
+from datetime import date, timedelta
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from habits import cache as dashboard_cache
+from habits.benchmark import rolled_back, timed
+from habits.models import Habit, HabitCheckIn
+from habits.users import get_demo_user
+from habits.views import dashboard
+
+
+class Command(BaseCommand):
+    """
+    Benchmark: dashboard latency with a cold vs. a warm section cache.
+
+    Generates habits with a week of check-ins, then renders the
+    dashboard once per iteration, either after clearing the section
+    versions (cold) or straight from the cache (warm). All data is
+    rolled back and the cache versions are bumped afterwards.
+
+    Usage:
+    python manage.py bench_dashboard_cache --habits 500
+    """
+
+    help = "Measure cold vs. warm cache dashboard latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--habits", type=int, default=200)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        today = date.today()
+
+        # Anonymous requests render the demo user's dashboard
+        user = get_demo_user()
+        scopes = dashboard_cache.user_scopes(user.id)
+
+        def render():
+            request = factory.get("/")
+            request.user = AnonymousUser()
+            dashboard(request)
+
+        def cold():
+            dashboard_cache.bump(*scopes)
+            render()
+
+        with rolled_back():
+            habits = Habit.objects.bulk_create(
+                Habit(name=f"Bench habit {i}", user=user)
+                for i in range(options["habits"])
+            )
+            HabitCheckIn.objects.bulk_create(
+                HabitCheckIn(habit=habit, date=today - timedelta(days=offset))
+                for habit in habits
+                for offset in range(7)
+                if (habit.id + offset) % 3
+            )
+
+            repeat = options["repeat"]
+            dashboard_cache.stats.clear()
+            cold_ms = timed(cold, repeat)
+            render()
+            warm_ms = timed(render, repeat)
+
+        # Never leave sections built from rolled-back data reachable
+        dashboard_cache.bump(*scopes)
+
+        self.stdout.write(f"habits:     {options['habits']}")
+        self.stdout.write(f"cold cache: {cold_ms:.2f} ms")
+        self.stdout.write(f"warm cache: {warm_ms:.2f} ms ({cold_ms / warm_ms:.1f}x)")
+        self.stdout.write(f"counters:   {dashboard_cache.cache_stats()}")
@@ -0,0 +1,146 @@
+from datetime import date, timedelta
+import gc
+import pickle
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db.models import BooleanField, Exists, ExpressionWrapper, F, OuterRef, Q
+
+from books.models import Book, UserBook
+from habits import goals
+from habits.benchmark import rolled_back
+from habits.models import Habit, HabitCheckIn
+from habits.schedule import weekday_bit
+from habits.rows import book_rows, habit_rows
+from habits.users import get_demo_user
+from streaks.rebuild import rebuild_habits
+
+
+def habit_queryset(today, user):
+    """The annotated habit queryset of the dashboard."""
+    return (
+        Habit.objects
+        .filter(user=user)
+        .alias(today_bit=F("schedule").bitand(weekday_bit(today)))
+        .annotate(
+            due_today=ExpressionWrapper(Q(today_bit__gt=0), output_field=BooleanField()),
+            done_today=Exists(
+                HabitCheckIn.objects.filter(habit=OuterRef("pk"), date=today, completed=True)
+            ),
+        )
+        .order_by("created_at", "id")
+    )
+
+
+def split(habit_qs, load):
+    """The open, completed and resting habit lists, loaded by `load`."""
+    return {
+        "open_habits": load(habit_qs.filter(due_today=True, done_today=False)),
+        "completed_habits": load(habit_qs.filter(done_today=True)),
+        "resting_habits": load(habit_qs.filter(due_today=False, done_today=False)),
+    }
+
+
+def model_sections(today, user):
+    """
+    The habit lists and reading preview as they were built before the
+    dashboard used lightweight rows: full model instances with their
+    joined streak and book.
+    """
+    sections = split(habit_queryset(today, user).select_related("streak"), list)
+    for habits in sections.values():
+        for habit in habits:
+            habit.goal = goals.progress(habit, today)
+    sections["user_books"] = list(
+        UserBook.objects.filter(user=user).select_related("book").order_by("-saved_at")[:3]
+    )
+    return sections
+
+
+def row_sections(today, user):
+    """The same data as slotted rows (what build_dashboard_sections does)."""
+    sections = split(habit_queryset(today, user), lambda qs: habit_rows(qs, today))
+    sections["user_books"] = book_rows(
+        UserBook.objects.filter(user=user).order_by("-saved_at")[:3]
+    )
+    return sections
+
+
+def measure(build):
+    """
+    Build the sections once under tracemalloc.
+
+    Returns (peak bytes while building, bytes still held by the
+    result, pickled size in bytes).
+    """
+    gc.collect()
+    tracemalloc.start()
+    sections = build()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, retained, len(pickle.dumps(sections))
+
+
+class Command(BaseCommand):
+    """
+    Benchmark: memory of the dashboard sections, models vs. rows.
+
+    Generates habits with a week of check-ins and streaks plus saved
+    books with long descriptions, then builds the habit lists and the
+    reading preview once from full model instances (the former data
+    path) and once as slotted rows from `values_list` (the current
+    one, see habits.rows). Reports tracemalloc's peak and retained
+    allocations and the pickled (cached) size. All data is rolled
+    back afterwards.
+
+    Usage:
+    python manage.py bench_dashboard_memory --habits 10000
+    """
+
+    help = "Measure dashboard allocations with model instances vs. slotted rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--habits", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        today = date.today()
+
+        with rolled_back():
+            user = get_demo_user()
+            habits = Habit.objects.bulk_create(
+                Habit(name=f"Bench habit {i}", user=user, goal_count=i % 4 or None)
+                for i in range(options["habits"])
+            )
+            HabitCheckIn.objects.bulk_create(
+                (
+                    HabitCheckIn(habit=habit, date=today - timedelta(days=offset))
+                    for habit in habits
+                    for offset in range(7)
+                    if (habit.id + offset) % 3
+                ),
+                batch_size=5000,
+            )
+            # Streaks for every habit, as the check-in signals would write them
+            rebuild_habits([habit.id for habit in habits], today)
+
+            books = Book.objects.bulk_create(
+                Book(title=f"Bench book {i}", goal="focus", mood="calm",
+                     description="Lorem ipsum dolor sit amet. " * 200)
+                for i in range(3)
+            )
+            UserBook.objects.bulk_create(
+                UserBook(user=user, book=book, status="reading") for book in books
+            )
+
+            results = {
+                "model instances": measure(lambda: model_sections(today, user)),
+                "slotted rows": measure(lambda: row_sections(today, user)),
+            }
+
+        self.stdout.write(f"habits: {options['habits']}")
+        for name, (peak, retained, pickled) in results.items():
+            self.stdout.write(
+                f"{name:>16}: peak {peak / 2**20:7.1f} MiB, "
+                f"retained {retained / 2**20:7.1f} MiB, "
+                f"cached {pickled / 2**20:7.1f} MiB"
+            )
@@ -0,0 +1,107 @@
+from datetime import date, timedelta
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.template import Context, Template
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+
+from habits.benchmark import rolled_back, timed
+from habits.models import Habit, HabitCheckIn
+from habits.users import get_demo_user
+from habits.views import build_dashboard_sections
+
+# The weekly matrix as it was rendered before the rows were
+# precomputed: one template tag call per habit and day
+LEGACY_MATRIX = Template("""{% load dict_extras %}
+{% for habit in habits %}<tr><td>{{ habit.name }}</td>
+{% for day in week_days %}{% get_weekly_status weekly_checkin_map habit.id day as status %}
+{% if day == today %}<td class="bg-light rounded">{% else %}<td>{% endif %}
+<input type="checkbox" {% if status %}checked{% endif %} disabled></td>
+{% endfor %}</tr>{% endfor %}
+""")
+
+# The same matrix rendered from precomputed rows
+ROWS_MATRIX = Template("""
+{% for row in weekly_rows %}<tr><td>{{ row.habit.name }}</td>
+{% for status in row.days %}
+{% if forloop.last %}<td class="bg-light rounded">{% else %}<td>{% endif %}
+<input type="checkbox" {% if status %}checked{% endif %} disabled></td>
+{% endfor %}</tr>{% endfor %}
+""")
+
+
+class Command(BaseCommand):
+    """
+    Benchmark: dashboard template render time for growing habit counts.
+
+    For every size, reports the weekly matrix rendered the legacy way
+    (one `get_weekly_status` tag per cell) against precomputed rows,
+    plus the render time of the full dashboard template. All data is
+    rolled back afterwards.
+
+    Usage:
+    python manage.py bench_dashboard_render --sizes 50 500 5000
+    """
+
+    help = "Measure dashboard render time for 50/500/5000 habits."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", type=int, nargs="+", default=[50, 500, 5000]
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        today = date.today()
+
+        for size in options["sizes"]:
+            with rolled_back():
+                user = get_demo_user()
+                habits = Habit.objects.bulk_create(
+                    Habit(name=f"Bench habit {i}", user=user) for i in range(size)
+                )
+                HabitCheckIn.objects.bulk_create(
+                    (
+                        HabitCheckIn(habit=habit, date=today - timedelta(days=offset))
+                        for habit in habits
+                        for offset in range(7)
+                        if (habit.id + offset) % 3
+                    ),
+                    batch_size=5000,
+                )
+
+                sections = build_dashboard_sections(today, user)
+                self.report(size, sections, today, options["repeat"])
+
+    def report(self, size, sections, today, repeat):
+        # Legacy lookup structure: (habit_id, date) -> True
+        legacy_map = {
+            (row.habit.id, day): True
+            for row in sections["weekly_rows"]
+            for day, status in zip(sections["week_days"], row.days)
+            if status
+        }
+        legacy = Context({
+            "habits": sections["habits"],
+            "week_days": sections["week_days"],
+            "weekly_checkin_map": legacy_map,
+            "today": today,
+        })
+        rows = Context(sections)
+        page = {**sections, "today": today, "active_pomodoro": None}
+        request = RequestFactory().get("/")
+        request.user = AnonymousUser()
+
+        legacy_ms = timed(lambda: LEGACY_MATRIX.render(legacy), repeat)
+        rows_ms = timed(lambda: ROWS_MATRIX.render(rows), repeat)
+        page_ms = timed(
+            lambda: render_to_string("habits/dashboard.html", page, request),
+            repeat,
+        )
+
+        self.stdout.write(
+            f"{size:>6} habits: matrix per-cell tag {legacy_ms:8.1f} ms, "
+            f"precomputed rows {rows_ms:8.1f} ms "
+            f"({legacy_ms / rows_ms:.1f}x), full page {page_ms:8.1f} ms"
+        )
@@ -0,0 +1,100 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from books.models import Book, UserBook
+from habits.benchmark import rolled_back, timed
+from habits.models import DailySummary, Habit, HabitCheckIn
+from habits.summary import reconcile, source_counts
+from habits.users import get_demo_user
+from pomodoro.models import PomodoroSession
+from todos.models import Todo
+
+
+class Command(BaseCommand):
+    """
+    Benchmark: dashboard header from the source tables vs. DailySummary.
+
+    Generates a history of check-ins, focus sessions, to-dos and saved
+    books for the demo user, then compares computing the header with
+    one aggregate query per source table against reading the
+    precomputed summary row. All data is rolled back afterwards.
+
+    Usage:
+    python manage.py bench_dashboard_summary --habits 200 --days 365
+    """
+
+    help = "Measure the dashboard header with live aggregates vs. the summary row."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--habits", type=int, default=50)
+        parser.add_argument("--days", type=int, default=365)
+        parser.add_argument("--repeat", type=int, default=50)
+
+    def handle(self, *args, **options):
+        today = date.today()
+        now = timezone.now()
+        user = get_demo_user()
+        days = options["days"]
+
+        def live():
+            source_counts(today, [user.id])
+
+        def stored():
+            DailySummary.objects.for_day(user.id, today)
+
+        with rolled_back():
+            habits = Habit.objects.bulk_create(
+                Habit(name=f"Bench habit {i}", user=user)
+                for i in range(options["habits"])
+            )
+            HabitCheckIn.objects.bulk_create(
+                HabitCheckIn(habit=habit, date=today - timedelta(days=offset))
+                for habit in habits
+                for offset in range(days)
+                if (habit.id + offset) % 3
+            )
+            PomodoroSession.objects.bulk_create(
+                PomodoroSession(
+                    user=user,
+                    status="completed",
+                    started_at=now - timedelta(days=offset, hours=hour),
+                )
+                for offset in range(days)
+                for hour in range(4)
+            )
+            Todo.objects.bulk_create(
+                Todo(title=f"Bench to-do {i}", user=user, is_done=i % 2 == 0)
+                for i in range(days)
+            )
+            books = Book.objects.bulk_create(
+                Book(title=f"Bench book {i}", goal="focus", mood="calm")
+                for i in range(20)
+            )
+            UserBook.objects.bulk_create(
+                UserBook(user=user, book=book, status="reading")
+                for book in books
+            )
+            # Bulk inserts bypass the signal handlers
+            reconcile(today, [user.id])
+
+            with CaptureQueriesContext(connection) as live_queries:
+                live()
+            with CaptureQueriesContext(connection) as stored_queries:
+                stored()
+
+            repeat = options["repeat"]
+            live_ms = timed(live, repeat)
+            stored_ms = timed(stored, repeat)
+
+        self.stdout.write(f"habits:        {options['habits']} x {days} days")
+        self.stdout.write(
+            f"live queries:  {len(live_queries)} queries, {live_ms:.2f} ms"
+        )
+        self.stdout.write(
+            f"summary row:   {len(stored_queries)} query, {stored_ms:.2f} ms "
+            f"({live_ms / stored_ms:.1f}x)"
+        )
@@ -0,0 +1,70 @@
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from habits.benchmark import rolled_back, timed
+from habits.models import Habit, HabitCheckIn
+from habits.views import build_dashboard_sections
+
+
+class Command(BaseCommand):
+    """
+    Benchmark: dashboard section build time for one user while the
+    number of other users (and their habits) grows.
+
+    Every user gets the same number of habits with a week of
+    check-ins. The sections are built uncached for the first user,
+    so the numbers show the cost of the tenant-scoped queries only.
+    All data is rolled back afterwards.
+
+    Usage:
+    python manage.py bench_dashboard_tenants --users 1 100 1000
+    """
+
+    help = "Measure per-user dashboard latency for growing user counts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users", type=int, nargs="+", default=[1, 100, 1000]
+        )
+        parser.add_argument("--habits", type=int, default=20)
+        parser.add_argument("--repeat", type=int, default=10)
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        today = date.today()
+
+        for user_count in options["users"]:
+            with rolled_back():
+                users = User.objects.bulk_create(
+                    User(username=f"bench-user-{i}") for i in range(user_count)
+                )
+                habits = Habit.objects.bulk_create(
+                    (
+                        Habit(name=f"Bench habit {i}", user=user)
+                        for user in users
+                        for i in range(options["habits"])
+                    ),
+                    batch_size=5000,
+                )
+                HabitCheckIn.objects.bulk_create(
+                    (
+                        HabitCheckIn(habit=habit, date=today - timedelta(days=offset))
+                        for habit in habits
+                        for offset in range(7)
+                        if (habit.id + offset) % 3
+                    ),
+                    batch_size=5000,
+                )
+
+                user = users[0]
+                build_ms = timed(
+                    lambda: build_dashboard_sections(today, user),
+                    options["repeat"],
+                )
+
+            self.stdout.write(
+                f"{user_count:>6} users ({len(habits):>7} habits): "
+                f"sections for one user {build_ms:8.2f} ms"
+            )
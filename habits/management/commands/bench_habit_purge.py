@@ -0,0 +1,90 @@
+from datetime import date, timedelta
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from analytics.models import DailyRollup
+from habits.benchmark import rolled_back
+from habits.models import Habit, HabitCheckIn, HabitYear
+from habits.purge import purge_batches
+from habits.users import get_demo_user
+from pomodoro.models import PomodoroSession
+from streaks.rebuild import rebuild_habits
+
+
+class Command(BaseCommand):
+    """
+    Benchmark: write-lock hold time of deleting a habit.
+
+    Creates a habit with a long daily history (plus derived rows and
+    pomodoro sessions) and measures how long a writing transaction
+    stays open, once for the synchronous cascade `habit.delete()` and
+    once for the batched purge job. On SQLite the write lock is held
+    for the whole transaction, so this is the time other writers are
+    blocked. All data is rolled back afterwards.
+
+    Usage:
+    python manage.py bench_habit_purge --years 10 --batch-size 500
+    """
+
+    help = "Measure the write-lock hold time of cascade delete vs. batched purge."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--years", type=int, default=10)
+        parser.add_argument("--sessions", type=int, default=2000)
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            habit = self.create_habit(options)
+            started = time.perf_counter()
+            with transaction.atomic():
+                habit.delete()
+            cascade_ms = (time.perf_counter() - started) * 1000
+
+        with rolled_back():
+            habit = self.create_habit(options)
+            habit.soft_delete()
+
+            durations = []
+            rows = 0
+            steps = purge_batches(habit.id, options["batch_size"])
+            while True:
+                started = time.perf_counter()
+                try:
+                    _, affected = next(steps)
+                except StopIteration:
+                    break
+                durations.append((time.perf_counter() - started) * 1000)
+                rows += affected
+
+        self.stdout.write(f"history:        {options['years']} years, {rows} rows")
+        self.stdout.write(f"cascade delete: {cascade_ms:8.1f} ms in one transaction")
+        self.stdout.write(
+            f"batched purge:  {max(durations):8.1f} ms longest transaction, "
+            f"{len(durations)} transactions, {sum(durations):.1f} ms total"
+        )
+
+    def create_habit(self, options):
+        user = get_demo_user()
+        today = date.today()
+        habit = Habit.objects.create(name="Bench habit", user=user)
+
+        HabitCheckIn.objects.bulk_create(
+            (
+                HabitCheckIn(habit=habit, date=today - timedelta(days=offset))
+                for offset in range(365 * options["years"])
+                if offset % 7
+            ),
+            batch_size=5000,
+        )
+        HabitYear.objects.rebuild(habit_ids=[habit.id])
+        DailyRollup.objects.rebuild(habit_ids=[habit.id])
+        rebuild_habits([habit.id], today)
+
+        PomodoroSession.objects.bulk_create(
+            PomodoroSession(user=user, habit=habit, status="completed")
+            for _ in range(options["sessions"])
+        )
+        return habit
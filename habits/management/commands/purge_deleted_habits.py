@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from habits.purge import purge_pending
+
+
+class Command(BaseCommand):
+    """
+    Management command: drain the queue of deleted habits.
+
+    Removes the data of every soft-deleted habit in small batches,
+    each in its own short transaction, and finally the habit rows
+    themselves. Safe to run while the application is serving requests
+    and safe to run repeatedly (e.g. from cron).
+
+    Usage:
+    python manage.py purge_deleted_habits
+    python manage.py purge_deleted_habits --batch-size 200 --limit 10
+    """
+
+    help = "Purge the data of deleted habits in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Rows removed per transaction (default: HABIT_PURGE_BATCH_SIZE).",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=None,
+            help="Purge at most this many habits.",
+        )
+
+    def handle(self, *args, batch_size=None, limit=None, **options):
+        started = time.perf_counter()
+
+        purged = purge_pending(batch_size=batch_size, limit=limit)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Purged {purged} deleted habits in {elapsed:.2f}s."
+        ))
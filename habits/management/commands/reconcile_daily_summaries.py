@@ -0,0 +1,55 @@
+from datetime import date
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from habits.summary import reconcile
+
+
+class Command(BaseCommand):
+    """
+    Management command: recompute daily summaries from the source tables.
+
+    The per-user summary rows of the dashboard header are maintained
+    incrementally by signal handlers. Writes that bypass signals
+    (queryset updates, raw SQL) make them drift; this command
+    recomputes one day from HabitCheckIn, PomodoroSession, Todo and
+    UserBook and reports how many users had drifted.
+
+    Open to-dos and books being read describe the current state, so
+    they are only reconciled for today.
+
+    Usage:
+    python manage.py reconcile_daily_summaries
+    python manage.py reconcile_daily_summaries 3 7 --date 2026-10-01
+    """
+
+    help = "Recompute the per-user daily summaries of a day."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "user_ids",
+            nargs="*",
+            type=int,
+            help="Only reconcile these users (default: all users with data).",
+        )
+        parser.add_argument(
+            "--date",
+            help="Day to reconcile as YYYY-MM-DD (default: today).",
+        )
+
+    def handle(self, *args, user_ids=None, **options):
+        try:
+            day = date.fromisoformat(options["date"]) if options["date"] else date.today()
+        except ValueError:
+            raise CommandError("--date must be an ISO date (YYYY-MM-DD)")
+
+        started = time.perf_counter()
+
+        drifted = reconcile(day, user_ids=user_ids or None)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciled daily summaries of {day} in {elapsed:.2f}s, "
+            f"{drifted} users had drifted."
+        ))
@@ -0,0 +1,86 @@
+from datetime import date
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from habits.rollover import roll_over
+
+
+class Command(BaseCommand):
+    """
+    Management command: prepare the new day for all active users.
+
+    Meant to be scheduled right after midnight (e.g. cron
+    `1 0 * * *`). Resets streaks that broke with the day change,
+    creates the day's summary rows and builds every active user's
+    dashboard sections into the cache, so the first page loads of
+    the morning are served from prepared state.
+
+    Worker processes can only warm a cache shared between processes
+    (STREAKLY_CACHE=file); with the in-memory cache use --workers 1
+    from a long-running process or skip the warming.
+
+    Usage:
+    python manage.py roll_over_day
+    python manage.py roll_over_day --workers 8 --partition-size 500
+    python manage.py roll_over_day 3 7 --date 2026-10-19
+    """
+
+    help = "Prepare the derived dashboard state of a new day for active users."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "user_ids",
+            nargs="*",
+            type=int,
+            help="Only prepare these users (default: all active users).",
+        )
+        parser.add_argument(
+            "--date",
+            help="Day to prepare as YYYY-MM-DD (default: today).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of worker processes (default: number of CPUs).",
+        )
+        parser.add_argument(
+            "--partition-size",
+            type=int,
+            default=200,
+            help="Number of users handled per worker task.",
+        )
+
+    def handle(self, *args, user_ids=None, workers=None, partition_size=200, **options):
+        try:
+            day = date.fromisoformat(options["date"]) if options["date"] else date.today()
+        except ValueError:
+            raise CommandError("--date must be an ISO date (YYYY-MM-DD)")
+
+        backend = settings.CACHES[getattr(settings, "DASHBOARD_CACHE_ALIAS", "default")]
+        if workers != 1 and backend["BACKEND"].endswith("LocMemCache"):
+            self.stderr.write(self.style.WARNING(
+                "The dashboard cache is process-local: sections warmed by "
+                "worker processes are lost."
+            ))
+
+        started = time.perf_counter()
+
+        report = roll_over(
+            day=day,
+            user_ids=user_ids or None,
+            workers=workers,
+            partition_size=partition_size,
+        )
+
+        elapsed = time.perf_counter() - started
+        users = report["users"]
+        rate = users / elapsed if elapsed else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f"Prepared {day} for {users} users in {elapsed:.2f}s "
+            f"({rate:.0f} users/s): {report['streaks_broken']} streaks broken, "
+            f"{report['summaries_created']} summary rows created, "
+            f"{report['sections_warmed']} dashboards warmed."
+        ))
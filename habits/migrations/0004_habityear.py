@@ -0,0 +1,99 @@
+# Generated by Django 6.0 on 2026-10-18 17:07
+#
+# This migration introduces the HabitYear model.
+# It stores one 366-bit day bitmap per habit and year
+# as a compact companion to the HabitCheckIn rows.
+# Existing check-ins are converted here; afterwards the
+# check-in signals keep the bitmaps up to date.
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Mirrors habits.bitmap at the time of writing
+YEAR_BYTES = 46
+
+# Bitmap rows inserted per query
+BATCH_SIZE = 1000
+
+
+def fill_years(apps, schema_editor):
+    """
+    Fold all completed check-ins into one bitmap per habit and year.
+    """
+    HabitCheckIn = apps.get_model("habits", "HabitCheckIn")
+    HabitYear = apps.get_model("habits", "HabitYear")
+
+    masks = {}
+    checkins = (
+        HabitCheckIn.objects
+        .filter(completed=True)
+        .values_list("habit_id", "date")
+    )
+    for habit_id, day in checkins.iterator(chunk_size=BATCH_SIZE):
+        key = (habit_id, day.year)
+        masks[key] = masks.get(key, 0) | 1 << (day.timetuple().tm_yday - 1)
+
+    HabitYear.objects.bulk_create(
+        (
+            HabitYear(habit_id=habit_id, year=year, days=mask.to_bytes(YEAR_BYTES, "little"))
+            for (habit_id, year), mask in masks.items()
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+    """
+    Migration to create the HabitYear model and fill it from the
+    existing check-ins.
+    """
+
+    dependencies = [
+        ("habits", "0003_alter_habit_created_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HabitYear",
+            fields=[
+                # Primary key automatically generated by Django
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+
+                # Calendar year covered by the bitmap
+                ("year", models.PositiveSmallIntegerField()),
+
+                # 46 byte little-endian day bitmap (bit 0 = January 1st)
+                (
+                    "days",
+                    models.BinaryField(
+                        default=bytes(46),
+                        max_length=46,
+                    ),
+                ),
+
+                # Habit the bitmap belongs to
+                (
+                    "habit",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="years",
+                        to="habits.habit",
+                    ),
+                ),
+            ],
+
+            # One bitmap per habit and year
+            options={
+                "unique_together": {("habit", "year")},
+            },
+        ),
+        migrations.RunPython(fill_years, migrations.RunPython.noop),
+    ]
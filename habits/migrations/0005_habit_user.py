@@ -0,0 +1,76 @@
+# Generated by Django 6.0 on 2026-10-18 18:02
+#
+# This migration makes habits user-owned.
+# Existing habits are assigned to the shared "demo" user,
+# which the application uses in no-login mode.
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def assign_demo_user(apps, schema_editor):
+    """
+    Assign every existing habit to the demo user
+    (created on the fly if it does not exist yet).
+    """
+    Habit = apps.get_model("habits", "Habit")
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+
+    if not Habit.objects.filter(user__isnull=True).exists():
+        return
+
+    demo_user, _ = User.objects.get_or_create(username="demo")
+    Habit.objects.filter(user__isnull=True).update(user=demo_user)
+
+
+class Migration(migrations.Migration):
+    """
+    Migration to add the owner of a habit.
+
+    The field is added as nullable first, filled with the demo user
+    and then made required. A composite index leading on the user
+    serves the per-user dashboard listing.
+    """
+
+    dependencies = [
+        ("habits", "0004_habityear"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Step 1: nullable owner column
+        migrations.AddField(
+            model_name="habit",
+            name="user",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="habits",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+
+        # Step 2: existing habits belong to the demo user
+        migrations.RunPython(assign_demo_user, migrations.RunPython.noop),
+
+        # Step 3: every habit must have an owner from now on
+        migrations.AlterField(
+            model_name="habit",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="habits",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+
+        # Dashboard listing: one user's habits in creation order
+        migrations.AddIndex(
+            model_name="habit",
+            index=models.Index(
+                fields=["user", "created_at"],
+                name="habit_user_created_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-18 19:40
+#
+# This migration adds a version counter for the completion
+# history of a habit.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Migration to add Habit.history_version.
+
+    The counter is bumped by the check-in signal handlers and
+    serves as the validator for conditional heatmap requests.
+    """
+
+    dependencies = [
+        ("habits", "0005_habit_user"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="habit",
+            name="history_version",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
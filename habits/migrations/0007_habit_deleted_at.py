@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-18 20:05
+#
+# This migration adds soft deletion to habits.
+# Deleted habits stay in the table until the purge job
+# (`python manage.py purge_deleted_habits`) has removed their data.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Migration to add Habit.deleted_at.
+
+    A partial index covers only deleted habits, so the purge queue
+    can be read without scanning all habits.
+    """
+
+    dependencies = [
+        ("habits", "0006_habit_history_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="habit",
+            name="deleted_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="habit",
+            index=models.Index(
+                condition=models.Q(deleted_at__isnull=False),
+                fields=["deleted_at"],
+                name="habit_pending_purge_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-18 21:10
+#
+# This migration adds weekday schedules to habits.
+# Existing habits keep being due every day.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Migration to add Habit.schedule.
+
+    The schedule is a 7-bit weekday mask; a check constraint keeps
+    it within 1..127 so no habit ends up without any due day.
+    """
+
+    dependencies = [
+        ("habits", "0007_habit_deleted_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="habit",
+            name="schedule",
+            field=models.PositiveSmallIntegerField(default=127),
+        ),
+        migrations.AddConstraint(
+            model_name="habit",
+            constraint=models.CheckConstraint(
+                condition=models.Q(("schedule__gte", 1), ("schedule__lte", 127)),
+                name="habit_schedule_valid",
+            ),
+        ),
+    ]
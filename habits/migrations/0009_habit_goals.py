@@ -0,0 +1,89 @@
+# Generated by Django 6.0 on 2026-10-18 21:40
+#
+# This migration adds rolling-window frequency goals to habits.
+# The sliding windows of existing habits are filled from their
+# recent check-ins; afterwards the check-in signals keep them
+# up to date (see habits.goals).
+
+from datetime import date, timedelta
+
+from django.db import migrations, models
+
+# Mirrors habits.goals at the time of writing
+RECENT_DAYS = 62
+MAX_AHEAD = 32
+
+
+def fill_windows(apps, schema_editor):
+    """
+    Build the recent-days window of every habit from HabitCheckIn.
+    """
+    Habit = apps.get_model("habits", "Habit")
+    HabitCheckIn = apps.get_model("habits", "HabitCheckIn")
+
+    anchor = date.today() + timedelta(days=MAX_AHEAD)
+    oldest = anchor - timedelta(days=RECENT_DAYS - 1)
+
+    masks = {}
+    checkins = (
+        HabitCheckIn.objects
+        .filter(completed=True, date__range=(oldest, anchor))
+        .values_list("habit_id", "date")
+    )
+    for habit_id, day in checkins.iterator():
+        masks[habit_id] = masks.get(habit_id, 0) | 1 << (anchor - day).days
+
+    Habit.objects.update(recent_anchor=anchor)
+    for habit_id, mask in masks.items():
+        Habit.objects.filter(id=habit_id).update(recent_mask=mask)
+
+
+class Migration(migrations.Migration):
+    """
+    Migration to add Habit.goal_count, Habit.goal_days and the sliding
+    window fields Habit.recent_mask and Habit.recent_anchor.
+    """
+
+    dependencies = [
+        ("habits", "0008_habit_schedule"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="habit",
+            name="goal_count",
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="habit",
+            name="goal_days",
+            field=models.PositiveSmallIntegerField(
+                choices=[(7, "7 days"), (30, "30 days")], default=7
+            ),
+        ),
+        migrations.AddField(
+            model_name="habit",
+            name="recent_mask",
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="habit",
+            name="recent_anchor",
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name="habit",
+            constraint=models.CheckConstraint(
+                condition=models.Q(
+                    ("goal_count__isnull", True),
+                    models.Q(
+                        ("goal_count__gte", 1),
+                        ("goal_count__lte", models.F("goal_days")),
+                    ),
+                    _connector="OR",
+                ),
+                name="habit_goal_valid",
+            ),
+        ),
+        migrations.RunPython(fill_windows, migrations.RunPython.noop),
+    ]
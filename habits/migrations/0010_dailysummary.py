@@ -0,0 +1,117 @@
+# Generated by Django 6.0 on 2026-10-18 22:15
+#
+# This migration creates the per-user daily summary behind the
+# dashboard header. Today's rows are filled from the source tables;
+# from then on signal handlers keep them up to date (see
+# habits.summary). Older days can be filled with
+# `python manage.py reconcile_daily_summaries --date YYYY-MM-DD`.
+
+from datetime import date
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+import django.db.models.deletion
+
+
+def fill_today(apps, schema_editor):
+    """
+    Create today's summary row of every user with any activity.
+    """
+    DailySummary = apps.get_model("habits", "DailySummary")
+    HabitCheckIn = apps.get_model("habits", "HabitCheckIn")
+    PomodoroSession = apps.get_model("pomodoro", "PomodoroSession")
+    Todo = apps.get_model("todos", "Todo")
+    UserBook = apps.get_model("books", "UserBook")
+
+    today = date.today()
+    rows = {}
+
+    def collect(field, values):
+        for user_id, value in values:
+            rows.setdefault(user_id, {})[field] = value or 0
+
+    collect("habits_completed", (
+        HabitCheckIn.objects
+        .filter(date=today, completed=True, habit__deleted_at__isnull=True)
+        .values_list("habit__user_id")
+        .annotate(Count("id"))
+    ))
+    collect("focus_seconds", (
+        PomodoroSession.objects
+        .filter(status="completed", started_at__date=today)
+        .values_list("user_id")
+        .annotate(Sum("duration_seconds"))
+    ))
+    collect("open_todos", (
+        Todo.objects
+        .filter(is_done=False)
+        .values_list("user_id")
+        .annotate(Count("id"))
+    ))
+    collect("books_reading", (
+        UserBook.objects
+        .filter(status="reading")
+        .values_list("user_id")
+        .annotate(Count("id"))
+    ))
+
+    DailySummary.objects.bulk_create(
+        DailySummary(user_id=user_id, date=today, **values)
+        for user_id, values in rows.items()
+    )
+
+
+class Migration(migrations.Migration):
+    """
+    Migration to create the DailySummary table.
+
+    The unique (user, date) constraint doubles as the index of the
+    dashboard's "latest row on or before today" lookup.
+    """
+
+    dependencies = [
+        ("habits", "0009_habit_goals"),
+        ("books", "0003_userbook_updated_at"),
+        ("pomodoro", "0002_remove_pomodorosession_duration_minutes_and_more"),
+        ("todos", "0002_todo_user"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailySummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("habits_completed", models.IntegerField(default=0)),
+                ("focus_seconds", models.IntegerField(default=0)),
+                ("open_todos", models.IntegerField(default=0)),
+                ("books_reading", models.IntegerField(default=0)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_summaries",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "date"), name="dailysummary_unique_day"
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(fill_today, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,102 @@
-from django.db import models
+from django.db import models, transaction
 from datetime import date
 from django.utils import timezone
 from django.conf import settings
 
+from . import bitmap
+from .schedule import EVERY_DAY, label
+
+
+class ActiveHabitManager(models.Manager):
+    """
+    Default manager: hides habits that were deleted by their owner
+    but are still waiting for their data to be purged.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
 
 class Habit(models.Model):
+    # Owner of the habit; every habit query is scoped to one user
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="habits",
+    )
     name = models.CharField(max_length=100)
     created_at = models.DateTimeField(default=timezone.now)
 
+    # Incremented on every change of the completion history; used
+    # for ETags, so clients can revalidate without reading check-ins
+    history_version = models.PositiveIntegerField(default=0)
+
+    # Weekdays the habit is due on: bit 0 = Monday ... bit 6 = Sunday
+    # (see habits.schedule); streaks and rates only count these days
+    schedule = models.PositiveSmallIntegerField(default=EVERY_DAY)
+
+    # Frequency goal: `goal_count` completions within any rolling
+    # window of `goal_days` days (no goal if unset), see habits.goals
+    goal_count = models.PositiveSmallIntegerField(null=True, blank=True)
+    goal_days = models.PositiveSmallIntegerField(
+        choices=[(7, "7 days"), (30, "30 days")],
+        default=7,
+    )
+
+    # Sliding window of recently completed days, maintained by the
+    # check-in signals: bit i = completed on recent_anchor - i days
+    recent_mask = models.BigIntegerField(default=0)
+    recent_anchor = models.DateField(null=True, blank=True)
+
+    # Set when the habit is deleted; its data is removed later in
+    # small batches by the purge job (see habits.purge)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    # Only habits that are not deleted
+    objects = ActiveHabitManager()
+
+    # All habits, including those waiting to be purged
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            # Dashboard listing: one user's habits in creation order
+            models.Index(fields=["user", "created_at"], name="habit_user_created_idx"),
+            # Purge queue: only deleted habits are indexed
+            models.Index(
+                fields=["deleted_at"],
+                condition=models.Q(deleted_at__isnull=False),
+                name="habit_pending_purge_idx",
+            ),
+        ]
+        constraints = [
+            # At least one and at most all seven weekday bits
+            models.CheckConstraint(
+                condition=models.Q(schedule__gte=1, schedule__lte=EVERY_DAY),
+                name="habit_schedule_valid",
+            ),
+            # A goal needs at least one and at most one completion a day
+            models.CheckConstraint(
+                condition=(
+                    models.Q(goal_count__isnull=True)
+                    | models.Q(goal_count__gte=1, goal_count__lte=models.F("goal_days"))
+                ),
+                name="habit_goal_valid",
+            ),
+        ]
+
+    @property
+    def schedule_label(self):
+        """The due weekdays, e.g. "Every day" or "Mon, Wed, Fri"."""
+        return label(self.schedule)
+
+    def soft_delete(self):
+        """
+        Hide the habit immediately; its data is purged later.
+        """
+        self.deleted_at = timezone.now()
+        self.save(update_fields=["deleted_at"])
+
     def __str__(self):
         return self.name
 
@@ -19,3 +108,295 @@ class HabitCheckIn(models.Model):
 
     class Meta:
         unique_together = ("habit", "date")
+
+
+class HabitYearManager(models.Manager):
+    """
+    Range queries on year bitmaps.
+
+    All methods load at most one row per habit and year and combine
+    the bitmaps with bit operations, independent of how many days
+    were completed.
+    """
+
+    def range_masks(self, habit_ids, start, end):
+        """
+        Return {habit_id: mask} for the given date range.
+
+        Bit ``i`` of a mask stands for ``start + i days``, which is the
+        same layout as habits.calendar_data.HabitCalendar uses.
+        """
+        length = (end - start).days + 1
+        window = bitmap.range_mask(length)
+
+        masks = {}
+        rows = (
+            self.filter(
+                habit_id__in=habit_ids,
+                year__range=(start.year, end.year),
+            )
+            .values_list("habit_id", "year", "days")
+        )
+        for habit_id, year, days in rows:
+            offset = (date(year, 1, 1) - start).days
+            mask = bitmap.shift(bitmap.from_bytes(days), offset) & window
+            masks[habit_id] = masks.get(habit_id, 0) | mask
+        return masks
+
+    def range_mask(self, habit_id, start, end):
+        """Bitmap of a single habit for the given date range."""
+        return self.range_masks([habit_id], start, end).get(habit_id, 0)
+
+    def is_completed(self, habit_id, day):
+        """Check whether a habit was completed on a given day."""
+        return bool(self.range_mask(habit_id, day, day))
+
+    def count_completed(self, habit_id, start, end):
+        """Number of completed days within the range."""
+        return self.range_mask(habit_id, start, end).bit_count()
+
+    def longest_run(self, habit_id, start, end):
+        """Longest run of consecutive completed days within the range."""
+        return bitmap.longest_run(self.range_mask(habit_id, start, end))
+
+    def set_day(self, habit_id, day, completed=True):
+        """
+        Set or clear the bit of a single day.
+
+        Runs inside a transaction and locks the year row (on databases
+        that support it), so concurrent writes do not lose bits.
+        """
+        bit = 1 << bitmap.day_index(day)
+        with transaction.atomic():
+            rows = self.select_for_update()
+            if completed:
+                row, _ = rows.get_or_create(habit_id=habit_id, year=day.year)
+            else:
+                # Clearing a day never needs a new row
+                row = rows.filter(habit_id=habit_id, year=day.year).first()
+                if row is None:
+                    return
+            mask = bitmap.from_bytes(row.days)
+            mask = mask | bit if completed else mask & ~bit
+            row.days = bitmap.to_bytes(mask)
+            row.save(update_fields=["days"])
+
+    def rebuild(self, habit_ids=None, batch_size=1000):
+        """
+        Rebuild the bitmaps of all (or the given) habits from HabitCheckIn.
+
+        Streams all completed check-ins ordered by habit and date and
+        folds them into one bitmap per habit and year. Existing bitmaps
+        in scope are replaced. Returns the number of rows written.
+        """
+        checkins = HabitCheckIn.objects.filter(completed=True)
+        years = self.all()
+        if habit_ids is not None:
+            checkins = checkins.filter(habit_id__in=habit_ids)
+            years = years.filter(habit_id__in=habit_ids)
+
+        rows = (
+            checkins
+            .order_by("habit_id", "date")
+            .values_list("habit_id", "date")
+            .iterator(chunk_size=batch_size)
+        )
+
+        written = 0
+        batch = []
+
+        def make_row(key, mask):
+            habit_id, year = key
+            return self.model(
+                habit_id=habit_id,
+                year=year,
+                days=bitmap.to_bytes(mask),
+            )
+
+        def flush():
+            nonlocal written
+            self.bulk_create(batch)
+            written += len(batch)
+            batch.clear()
+
+        with transaction.atomic():
+            years.delete()
+
+            # Check-ins arrive sorted, so each (habit, year) bitmap is
+            # complete as soon as the key changes
+            key = None
+            mask = 0
+            for habit_id, day in rows:
+                if (habit_id, day.year) != key:
+                    if key is not None:
+                        batch.append(make_row(key, mask))
+                    key = (habit_id, day.year)
+                    mask = 0
+                mask |= 1 << bitmap.day_index(day)
+
+                if len(batch) >= batch_size:
+                    flush()
+
+            if key is not None:
+                batch.append(make_row(key, mask))
+            flush()
+
+        return written
+
+
+class HabitYear(models.Model):
+    """
+    Compact companion representation of HabitCheckIn.
+
+    Stores one row per habit and year. The `days` field holds a
+    366-bit bitmap in which every bit marks one completed day,
+    so a whole year of history is a single 46 byte value.
+    HabitCheckIn stays the source of truth; this table is kept
+    in sync by signal handlers and can be rebuilt with the
+    `backfill_habit_years` management command.
+    """
+
+    # The habit this bitmap belongs to
+    habit = models.ForeignKey(
+        Habit,
+        on_delete=models.CASCADE,
+        related_name="years",
+    )
+
+    # Calendar year covered by the bitmap
+    year = models.PositiveSmallIntegerField()
+
+    # Little-endian day bitmap (bit 0 = January 1st)
+    days = models.BinaryField(
+        max_length=bitmap.YEAR_BYTES,
+        default=bitmap.to_bytes(0),
+    )
+
+    objects = HabitYearManager()
+
+    class Meta:
+        unique_together = ("habit", "year")
+
+    @property
+    def mask(self):
+        """The stored bitmap as an integer."""
+        return bitmap.from_bytes(self.days)
+
+    def __str__(self):
+        return f"{self.habit_id} / {self.year}: {self.mask.bit_count()} days"
+
+
+class DailySummaryManager(models.Manager):
+    """
+    Incremental maintenance of the per-user daily summary.
+
+    Rows are created lazily, the first time something happens for a
+    user on a day. Counters (COUNTER_FIELDS) describe the day itself.
+    Gauges (GAUGE_FIELDS) describe a state at the end of the day, so a
+    new row starts with the gauges of the user's latest earlier row,
+    and a gauge change is applied to today's row and every later one.
+    """
+
+    def for_day(self, user_id, day):
+        """
+        The summary of a user on a day, read with a single index seek.
+
+        Falls back to the latest earlier row (its gauges still hold,
+        its counters do not) and to an empty summary.
+        """
+        row = (
+            self.filter(user_id=user_id, date__lte=day)
+            .order_by("-date")
+            .first()
+        )
+        if row is None:
+            return self.model(user_id=user_id, date=day)
+        if row.date != day:
+            return self.model(
+                user_id=user_id,
+                date=day,
+                **{field: getattr(row, field) for field in GAUGE_FIELDS},
+            )
+        return row
+
+    def ensure_row(self, user_id, day):
+        """Create the row of a user and day if it does not exist yet."""
+        if self.filter(user_id=user_id, date=day).exists():
+            return
+        carried = self.for_day(user_id, day)
+        self.get_or_create(
+            user_id=user_id,
+            date=day,
+            defaults={field: getattr(carried, field) for field in GAUGE_FIELDS},
+        )
+
+    def add(self, user_id, day, **deltas):
+        """
+        Add deltas to the counters of a user on a day.
+        """
+        with transaction.atomic():
+            self.ensure_row(user_id, day)
+            self.filter(user_id=user_id, date=day).update(**{
+                field: models.F(field) + delta
+                for field, delta in deltas.items()
+            })
+
+    def shift_gauges(self, user_id, today, **deltas):
+        """
+        Add deltas to the gauges of a user from today on.
+        """
+        with transaction.atomic():
+            self.ensure_row(user_id, today)
+            self.filter(user_id=user_id, date__gte=today).update(**{
+                field: models.F(field) + delta
+                for field, delta in deltas.items()
+            })
+
+
+# Per-day counters and end-of-day gauges of DailySummary
+COUNTER_FIELDS = ("habits_completed", "focus_seconds")
+GAUGE_FIELDS = ("open_todos", "books_reading")
+
+
+class DailySummary(models.Model):
+    """
+    What a user did on one day, for the dashboard header.
+
+    Denormalized from four apps (HabitCheckIn, PomodoroSession, Todo,
+    UserBook), so the header is one index lookup instead of four
+    aggregate queries. Kept up to date by signal handlers (see
+    habits.summary); `python manage.py reconcile_daily_summaries`
+    recomputes a day from the source tables.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="daily_summaries",
+    )
+    date = models.DateField()
+
+    # Counters of the day
+    habits_completed = models.IntegerField(default=0)
+    focus_seconds = models.IntegerField(default=0)
+
+    # State at the end of the day
+    open_todos = models.IntegerField(default=0)
+    books_reading = models.IntegerField(default=0)
+
+    objects = DailySummaryManager()
+
+    class Meta:
+        constraints = [
+            # Also the index of the (user, latest date) lookup
+            models.UniqueConstraint(
+                fields=["user", "date"], name="dailysummary_unique_day"
+            ),
+        ]
+
+    @property
+    def focus_minutes(self):
+        return self.focus_seconds // 60
+
+    def __str__(self):
+        return f"{self.user_id} / {self.date}"
@@ -0,0 +1,150 @@
+"""
+Deferred purge of deleted habits.
+
+Deleting a habit with a long history used to cascade through all of
+its check-ins and derived rows in a single transaction, which holds
+the SQLite write lock for the whole time and blocks every other
+writer. Habits are now soft-deleted (hidden at once) and their data
+is removed by this purge job in bounded batches, each in its own
+short transaction:
+
+- dependents with on_delete=CASCADE are deleted batch by batch
+- dependents with on_delete=SET_NULL are detached batch by batch
+- the (now empty) habit row itself goes last, together with the
+  dependents its delete handlers need (see KEPT_DEPENDENTS)
+
+The job runs in a background thread after the deleting request has
+committed, and `python manage.py purge_deleted_habits` drains
+whatever is still pending (e.g. after a restart).
+"""
+
+import threading
+
+from django.conf import settings
+from django.db import connections, models, transaction
+
+from .models import Habit
+from .signals import bulk_checkin_writes
+
+# Rows removed or detached per transaction
+DEFAULT_BATCH_SIZE = 500
+
+# Dependents left for the final delete of the habit row. The focus
+# rollup is read by the habit's delete handlers, which count the
+# focus time of its (detached) sessions as time without a habit
+# (see analytics.signals); it holds at most one row per day.
+KEPT_DEPENDENTS = {"analytics.FocusRollup"}
+
+
+def _batch_size(batch_size):
+    return batch_size or getattr(settings, "HABIT_PURGE_BATCH_SIZE", DEFAULT_BATCH_SIZE)
+
+
+def dependents():
+    """
+    The (model, field name, on_delete) of every relation to Habit.
+    """
+    return [
+        (relation.related_model, relation.field.name, relation.on_delete)
+        for relation in Habit._meta.related_objects
+        if relation.on_delete in (models.CASCADE, models.SET_NULL)
+        and relation.related_model._meta.label not in KEPT_DEPENDENTS
+    ]
+
+
+def purge_batches(habit_id, batch_size=None):
+    """
+    Purge a deleted habit step by step.
+
+    A generator: every step runs one short transaction and yields
+    (model label, rows affected). The last step deletes the habit.
+    """
+    batch_size = _batch_size(batch_size)
+
+    # Never touch the data of a habit that is still in use
+    if not Habit.all_objects.filter(id=habit_id, deleted_at__isnull=False).exists():
+        return
+
+    for model, field, on_delete in dependents():
+        rows = model._base_manager.filter(**{field: habit_id})
+        while True:
+            pks = list(rows.order_by("pk").values_list("pk", flat=True)[:batch_size])
+            if not pks:
+                break
+
+            # Check-in signals must not resync derived data of a habit
+            # that is going away (see habits.signals)
+            with transaction.atomic(), bulk_checkin_writes():
+                batch = model._base_manager.filter(pk__in=pks)
+                if on_delete is models.CASCADE:
+                    batch.delete()
+                else:
+                    batch.update(**{field: None})
+            yield model._meta.label, len(pks)
+
+    with transaction.atomic():
+        deleted, _ = Habit.all_objects.filter(
+            id=habit_id, deleted_at__isnull=False
+        ).delete()
+    yield Habit._meta.label, deleted
+
+
+def purge_habit(habit_id, batch_size=None):
+    """
+    Purge a deleted habit completely. Returns the number of rows
+    removed or detached.
+    """
+    return sum(rows for _, rows in purge_batches(habit_id, batch_size))
+
+
+def purge_pending(batch_size=None, limit=None):
+    """
+    Purge deleted habits, oldest deletion first.
+
+    Returns the number of habits purged.
+    """
+    pending = (
+        Habit.all_objects
+        .filter(deleted_at__isnull=False)
+        .order_by("deleted_at")
+        .values_list("id", flat=True)
+    )
+    if limit is not None:
+        pending = pending[:limit]
+
+    purged = 0
+    for habit_id in list(pending):
+        purge_habit(habit_id, batch_size)
+        purged += 1
+    return purged
+
+
+def _purge_in_background(habit_id):
+    try:
+        purge_habit(habit_id)
+    finally:
+        # Connections are per thread; do not leak this one
+        connections.close_all()
+
+
+def schedule_purge(habit_id):
+    """
+    Start purging a deleted habit once the current transaction has
+    committed.
+
+    Runs in a daemon thread unless HABIT_PURGE_IN_BACKGROUND is
+    disabled; habits that are not purged here are picked up by the
+    `purge_deleted_habits` command.
+    """
+    if not getattr(settings, "HABIT_PURGE_IN_BACKGROUND", True):
+        return
+
+    def start():
+        threading.Thread(
+            target=_purge_in_background,
+            args=(habit_id,),
+            name=f"purge-habit-{habit_id}",
+            daemon=True,
+        ).start()
+
+    transaction.on_commit(start)
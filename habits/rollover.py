@@ -0,0 +1,223 @@
+"""
+Day rollover: prepare the new day of every active user.
+
+At midnight `date.today()` changes and everything derived for
+"today" goes stale at once: cached dashboard sections are keyed by
+date, stored streak counts of habits missed yesterday are no longer
+alive, and nobody has a DailySummary row for the new day yet. The
+first dashboard view of every user then pays for all of it.
+
+`roll_over` does that work in advance, right after the day change:
+
+- streaks whose last completion is too old for the new day are reset
+  to 0 (one bulk update per batch)
+- every user gets a DailySummary row for the new day, carrying over
+  the gauges of their latest row
+- the dashboard sections for the new day are built into the cache
+
+Users are split into contiguous partitions by id and, like the streak
+rebuild engine (see streaks.rebuild), spread across a process pool
+(see habits.workers).
+Warming the cache from worker processes needs a cache shared between
+processes (STREAKLY_CACHE=file or a cache server).
+"""
+
+from collections import Counter
+from datetime import date, timedelta
+import os
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Max
+
+from streaks.models import Streak
+from . import cache as dashboard_cache
+from .models import GAUGE_FIELDS, DailySummary
+from .schedule import next_scheduled
+from .views import build_dashboard_sections
+from .workers import partitions, process_pool, roll_over_partition
+
+# Users count as active if they were seen within this many days
+ACTIVE_DAYS = 14
+
+
+def active_user_ids(day, active_days=ACTIVE_DAYS):
+    """
+    Ids of the users to prepare `day` for, sorted.
+
+    Active users have a summary row (i.e. did something) or logged in
+    within the last `active_days` days.
+    """
+    since = day - timedelta(days=active_days)
+    user_ids = set(
+        DailySummary.objects
+        .filter(date__gte=since, date__lt=day)
+        .values_list("user_id", flat=True)
+        .distinct()
+    )
+    user_ids.update(
+        get_user_model().objects
+        .filter(is_active=True, last_login__date__gte=since)
+        .values_list("id", flat=True)
+    )
+    return sorted(user_ids)
+
+
+def break_streaks(user_ids, day):
+    """
+    Reset the current streaks of the users that are no longer alive.
+
+    A streak is alive while the next scheduled day after its last
+    completion is not over. That day is at least one day later, so
+    only streaks last completed before yesterday need a closer look.
+    Returns the affected streaks' owners.
+    """
+    streaks = list(
+        Streak.objects
+        .filter(
+            habit__user_id__in=user_ids,
+            habit__deleted_at__isnull=True,
+            count__gt=0,
+            last_completed__lt=day - timedelta(days=1),
+        )
+        .select_related("habit")
+        .only("id", "count", "last_completed", "habit__schedule", "habit__user_id")
+    )
+    broken = [
+        streak for streak in streaks
+        if next_scheduled(streak.habit.schedule, streak.last_completed) < day
+    ]
+    for streak in broken:
+        streak.count = 0
+    Streak.objects.bulk_update(broken, ["count"])
+    return [streak.habit.user_id for streak in broken]
+
+
+def create_summaries(user_ids, day):
+    """
+    Create the users' DailySummary rows of `day`.
+
+    New rows carry over the gauges of each user's latest earlier row.
+    Returns the number of rows created.
+    """
+    existing = set(
+        DailySummary.objects
+        .filter(user_id__in=user_ids, date=day)
+        .values_list("user_id", flat=True)
+    )
+    missing = [user_id for user_id in user_ids if user_id not in existing]
+    if not missing:
+        return 0
+
+    latest = {
+        row["user_id"]: row["latest"]
+        for row in (
+            DailySummary.objects
+            .filter(user_id__in=missing, date__lt=day)
+            .values("user_id")
+            .annotate(latest=Max("date"))
+        )
+    }
+    carried = {}
+    if latest:
+        rows = DailySummary.objects.filter(
+            user_id__in=latest.keys(), date__in=set(latest.values())
+        ).values("user_id", "date", *GAUGE_FIELDS)
+        for row in rows:
+            if latest[row["user_id"]] == row["date"]:
+                carried[row["user_id"]] = row
+
+    created = DailySummary.objects.bulk_create(
+        [
+            DailySummary(
+                user_id=user_id,
+                date=day,
+                **{
+                    field: carried.get(user_id, {}).get(field, 0)
+                    for field in GAUGE_FIELDS
+                },
+            )
+            for user_id in missing
+        ],
+        # A user may have written the row in the meantime
+        ignore_conflicts=True,
+    )
+    return len(created)
+
+
+def warm_sections(users, day):
+    """
+    Build the users' dashboard sections of `day` into the cache.
+
+    Returns the number of sections built (already cached ones are
+    left as they are).
+    """
+    built = 0
+    for user in users:
+        misses = dashboard_cache.stats["misses"]
+        dashboard_cache.get_or_build(
+            day,
+            dashboard_cache.user_scopes(user.id),
+            lambda: build_dashboard_sections(day, user),
+        )
+        built += dashboard_cache.stats["misses"] - misses
+    return built
+
+
+def roll_over_users(user_ids, day):
+    """
+    Prepare `day` for the given users in the current process.
+
+    Returns a Counter of the work done.
+    """
+    user_ids = list(user_ids)
+
+    with transaction.atomic():
+        broken = break_streaks(user_ids, day)
+        created = create_summaries(user_ids, day)
+
+    # Bulk updates do not send signals, invalidate the stale sections
+    dashboard_cache.bump(*(
+        dashboard_cache.user_scope(dashboard_cache.HABITS, user_id)
+        for user_id in set(broken)
+    ))
+
+    users = get_user_model().objects.filter(id__in=user_ids).order_by("id")
+    warmed = warm_sections(users, day)
+
+    return Counter(
+        users=len(user_ids),
+        streaks_broken=len(broken),
+        summaries_created=created,
+        sections_warmed=warmed,
+    )
+
+
+def roll_over(day=None, user_ids=None, workers=None, partition_size=200):
+    """
+    Prepare `day` (default: today) for all active (or the given) users.
+
+    With `workers` > 1 the users are partitioned by id and the
+    partitions are processed by a pool of worker processes; with a
+    single worker everything runs in the current process.
+
+    Returns a Counter of the work done (users, streaks_broken,
+    summaries_created, sections_warmed).
+    """
+    day = day or date.today()
+    if user_ids is None:
+        user_ids = active_user_ids(day)
+    user_ids = sorted(user_ids)
+
+    workers = workers or os.cpu_count() or 1
+    chunks = list(partitions(user_ids, partition_size))
+
+    report = Counter()
+    if workers <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            report += roll_over_users(chunk, day)
+    else:
+        with process_pool(workers) as pool:
+            for counts in pool.map(roll_over_partition, chunks, [day] * len(chunks)):
+                report += counts
+    return report
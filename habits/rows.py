@@ -0,0 +1,117 @@
+"""
+Lightweight rows the dashboard sections are built from.
+
+The dashboard only prints a few columns of every habit and saved book.
+Loading full model instances for that costs a model object with its
+`_state`, every column (e.g. `Book.description`) and a related
+instance per joined table, for every row. The section builder instead
+fetches the needed columns with `values_list()` into the slotted
+dataclasses below, which are also much smaller to keep in the cache.
+
+The rows mirror the attribute names of the models they replace, so
+templates read `habit.name` or `habit.streak.count` either way.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+
+from . import goals
+from . import schedule as schedules
+
+
+@dataclass(slots=True)
+class StreakRow:
+    """The streak numbers of a habit."""
+
+    count: int
+    longest_streak: int
+
+
+@dataclass(slots=True)
+class HabitRow:
+    """A habit as shown on the dashboard."""
+
+    id: int
+    name: str
+    schedule: int
+    created_at: datetime
+    due_today: bool
+    done_today: bool
+    streak: StreakRow | None
+    goal: goals.GoalProgress | None
+
+    # Columns to fetch, in the order `from_values` expects them
+    FIELDS = (
+        "id",
+        "name",
+        "schedule",
+        "created_at",
+        "due_today",
+        "done_today",
+        "streak__count",
+        "streak__longest_streak",
+        "goal_count",
+        "goal_days",
+        "recent_mask",
+        "recent_anchor",
+    )
+
+    @classmethod
+    def from_values(cls, values, today):
+        """Build a row from one `values_list(*HabitRow.FIELDS)` tuple."""
+        (
+            habit_id, name, schedule, created_at, due_today, done_today,
+            count, longest_streak,
+            goal_count, goal_days, recent_mask, recent_anchor,
+        ) = values
+        return cls(
+            id=habit_id,
+            name=name,
+            schedule=schedule,
+            created_at=created_at,
+            due_today=due_today,
+            done_today=done_today,
+            # No joined streak row: the habit was never completed
+            streak=None if count is None else StreakRow(count, longest_streak),
+            goal=goals.progress_of(
+                goal_count, goal_days, recent_mask, recent_anchor, today
+            ),
+        )
+
+    @property
+    def schedule_label(self):
+        return schedules.label(self.schedule)
+
+
+@dataclass(slots=True)
+class BookRow:
+    """A saved book in the reading preview."""
+
+    book_id: int
+    title: str
+    progress: int
+    status: str
+
+    # Columns to fetch, in field order
+    FIELDS = ("book_id", "book__title", "progress", "status")
+
+
+@dataclass(slots=True)
+class WeeklyRow:
+    """One habit of the weekly matrix: completed flags, oldest day first."""
+
+    habit: HabitRow
+    days: list[bool]
+
+
+def habit_rows(queryset, today):
+    """Evaluate an annotated habit queryset into HabitRows."""
+    return [
+        HabitRow.from_values(values, today)
+        for values in queryset.values_list(*HabitRow.FIELDS)
+    ]
+
+
+def book_rows(queryset):
+    """Evaluate a UserBook queryset into BookRows."""
+    return [BookRow(*values) for values in queryset.values_list(*BookRow.FIELDS)]
@@ -0,0 +1,89 @@
+"""
+Weekday schedules of habits.
+
+A schedule is a 7-bit mask in which bit ``i`` stands for weekday ``i``
+(bit 0 = Monday, the numbering of ``date.weekday()``). A habit is due
+on the weekdays whose bit is set. Days outside the schedule neither
+count towards nor break a streak.
+"""
+
+from datetime import timedelta
+
+# Mask of a habit that is due every day (the default)
+EVERY_DAY = 0b1111111
+
+# Short weekday names, Monday first
+WEEKDAY_NAMES = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+
+def weekday_bit(day):
+    """The schedule bit of a date's weekday."""
+    return 1 << day.weekday()
+
+
+def is_scheduled(schedule, day):
+    """Check whether a habit with this schedule is due on a date."""
+    return bool(schedule & weekday_bit(day))
+
+
+def from_weekdays(weekdays):
+    """
+    Build a schedule from weekday numbers (0 = Monday).
+
+    Accepts ints or numeric strings (form values). Raises ValueError
+    for anything else.
+    """
+    schedule = 0
+    for weekday in weekdays:
+        weekday = int(weekday)
+        if not 0 <= weekday <= 6:
+            raise ValueError("weekdays must be between 0 (Monday) and 6 (Sunday)")
+        schedule |= 1 << weekday
+    return schedule
+
+
+def weekdays(schedule):
+    """The weekday numbers of a schedule, Monday first."""
+    return [weekday for weekday in range(7) if schedule >> weekday & 1]
+
+
+def label(schedule):
+    """Human-readable form, e.g. "Every day" or "Mon, Wed, Fri"."""
+    if schedule == EVERY_DAY:
+        return "Every day"
+    return ", ".join(WEEKDAY_NAMES[weekday] for weekday in weekdays(schedule))
+
+
+def next_scheduled(schedule, day):
+    """The first scheduled day after `day`."""
+    for offset in range(1, 8):
+        candidate = day + timedelta(days=offset)
+        if schedule & weekday_bit(candidate):
+            return candidate
+    raise ValueError("empty schedule")
+
+
+def previous_scheduled(schedule, day):
+    """The last scheduled day before `day`."""
+    for offset in range(1, 8):
+        candidate = day - timedelta(days=offset)
+        if schedule & weekday_bit(candidate):
+            return candidate
+    raise ValueError("empty schedule")
+
+
+def scheduled_days(schedule, start, end):
+    """
+    Number of scheduled days in [start, end] (both inclusive).
+
+    Full weeks are counted at once, so the cost does not depend on
+    the length of the range.
+    """
+    days = (end - start).days + 1
+    if days <= 0:
+        return 0
+    weeks, rest = divmod(days, 7)
+    count = weeks * schedule.bit_count()
+    for offset in range(rest):
+        count += schedule >> (start.weekday() + offset) % 7 & 1
+    return count
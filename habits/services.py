@@ -0,0 +1,271 @@
+"""
+Write services for habit check-ins.
+
+Views call into these functions instead of writing HabitCheckIn rows
+themselves, so every write path keeps the derived data (year bitmaps,
+streak runs) consistent in the same way.
+"""
+
+from dataclasses import dataclass
+from datetime import date
+
+from django.db import transaction
+from django.db.models import F
+
+from streaks.models import Streak
+from . import goals
+from .models import Habit, HabitCheckIn
+from .signals import bulk_checkin_writes, history_changed
+
+# Upper bound for the number of entries in one bulk request
+MAX_BULK_ENTRIES = 1000
+
+
+@dataclass
+class CheckInResult:
+    """
+    Outcome of one entry of a bulk check-in request.
+
+    `status` is one of:
+    - "created": a new check-in was stored
+    - "deleted": an existing check-in was removed
+    - "unchanged": the stored state already matched the request
+    - "superseded": a later entry for the same habit and day won
+    - "error": the entry was rejected (see `error`)
+    """
+
+    habit_id: int | None
+    date: date | None
+    completed: bool | None
+    status: str
+    error: str = ""
+
+    def as_dict(self):
+        return {
+            "habit_id": self.habit_id,
+            "date": self.date.isoformat() if self.date else None,
+            "completed": self.completed,
+            "status": self.status,
+            "error": self.error,
+        }
+
+
+@dataclass
+class CompletionResult:
+    """
+    Outcome of a single completion write.
+
+    `streak` holds the habit's streak numbers as seen right after the
+    write ({"count", "longest_streak"}), or None if it has none.
+    `goal` holds today's progress towards the habit's frequency goal
+    (see habits.goals.GoalProgress.as_dict), or None without a goal.
+    """
+
+    habit_id: int
+    date: date
+    completed: bool
+    changed: bool
+    streak: dict | None
+    goal: dict | None = None
+
+
+def record_completion(habit, day, completed=None):
+    """
+    Set (True/False) or toggle (None) the completion of a habit on a day.
+
+    The shared write path of all single check-in views. Everything
+    happens in one transaction that first locks the habit row, so
+    concurrent requests for the same habit (two tabs, a double click)
+    are serialized: the state is read and changed by one request at a
+    time, the unique (habit, date) row is never inserted twice and the
+    streak, which the check-in signals recompute from the run index
+    in the same transaction, cannot lose updates.
+
+    Raises Habit.DoesNotExist if the habit was deleted in the meantime.
+    """
+    with transaction.atomic():
+        locked = Habit.objects.select_for_update().filter(pk=habit.pk)
+        if not list(locked.values_list("pk", flat=True)):
+            raise Habit.DoesNotExist("habit was deleted")
+
+        checkin = HabitCheckIn.objects.filter(habit=habit, date=day).first()
+        current = checkin is not None and checkin.completed
+        wanted = not current if completed is None else completed
+
+        if wanted != current:
+            if not wanted:
+                # Undo completion for that day
+                checkin.delete()
+            elif checkin is not None:
+                # An explicitly uncompleted row becomes completed
+                checkin.completed = True
+                checkin.save(update_fields=["completed"])
+            else:
+                # Mark habit as completed on that day
+                HabitCheckIn.objects.create(habit=habit, date=day)
+
+        streak = (
+            Streak.objects
+            .filter(habit=habit)
+            .values("count", "longest_streak")
+            .first()
+        )
+
+        goal = None
+        if habit.goal_count is not None:
+            # The window was just updated by the check-in signals
+            habit.refresh_from_db(fields=["recent_mask", "recent_anchor"])
+            goal = goals.progress(habit, date.today()).as_dict()
+
+    return CompletionResult(habit.pk, day, wanted, wanted != current, streak, goal)
+
+
+def parse_entry(entry):
+    """
+    Validate one raw bulk entry.
+
+    Returns (habit_id, day, completed) or raises ValueError.
+    """
+    if not isinstance(entry, dict):
+        raise ValueError("entry must be an object")
+
+    habit_id = entry.get("habit_id")
+    if not isinstance(habit_id, int) or isinstance(habit_id, bool):
+        raise ValueError("habit_id must be an integer")
+
+    try:
+        day = date.fromisoformat(entry.get("date") or "")
+    except (TypeError, ValueError):
+        raise ValueError("date must be an ISO date (YYYY-MM-DD)")
+
+    completed = entry.get("completed", True)
+    if not isinstance(completed, bool):
+        raise ValueError("completed must be true or false")
+
+    return habit_id, day, completed
+
+
+def apply_checkins(entries, user=None):
+    """
+    Apply a batch of (habit_id, date, completed) entries.
+
+    All writes happen in one transaction: one query to read the
+    current state of the batch, one bulk insert, one bulk delete.
+    Derived data (bitmaps, runs, streaks) is then resynced once per
+    affected habit through `history_changed` instead of once per row.
+
+    With `user`, only habits owned by that user can be written;
+    entries for other habits fail as "unknown habit".
+
+    Returns one CheckInResult per entry, in request order.
+    """
+    results = []
+    wanted = {}
+
+    for entry in entries:
+        try:
+            habit_id, day, completed = parse_entry(entry)
+        except ValueError as exc:
+            results.append(CheckInResult(None, None, None, "error", str(exc)))
+            continue
+
+        result = CheckInResult(habit_id, day, completed, "unchanged")
+        results.append(result)
+
+        # The last entry for the same habit and day wins
+        previous = wanted.get((habit_id, day))
+        if previous is not None:
+            previous.status = "superseded"
+        wanted[(habit_id, day)] = result
+
+    if not wanted:
+        return results
+
+    with transaction.atomic():
+        affected = _write_batch(wanted, user)
+
+        # Resync derived data once per habit, in the same transaction
+        if affected:
+            days = sorted({
+                result.date
+                for result in wanted.values()
+                if result.status in ("created", "deleted")
+            })
+            history_changed.send(sender=HabitCheckIn, habit_ids=affected, days=days)
+
+    return results
+
+
+def _write_batch(wanted, user=None):
+    """
+    Write the wanted state of a batch and return the affected habit ids.
+    """
+    habit_ids = {habit_id for habit_id, _ in wanted}
+    days = {day for _, day in wanted}
+
+    habits = Habit.objects.filter(id__in=habit_ids)
+    if user is not None:
+        habits = habits.filter(user=user)
+
+    with bulk_checkin_writes():
+        known = set(habits.values_list("id", flat=True))
+
+        # Current state of all (habit, day) pairs in the batch
+        existing = {
+            (habit_id, day): (pk, completed)
+            for pk, habit_id, day, completed in (
+                HabitCheckIn.objects
+                .filter(habit_id__in=known, date__in=days)
+                .values_list("pk", "habit_id", "date", "completed")
+            )
+            if (habit_id, day) in wanted
+        }
+
+        to_create = []
+        to_complete = []
+        to_delete = []
+
+        for key, result in wanted.items():
+            habit_id, day = key
+            if habit_id not in known:
+                result.status = "error"
+                result.error = "unknown habit"
+                continue
+
+            current = existing.get(key)
+            if result.completed:
+                if current is None:
+                    to_create.append(HabitCheckIn(habit_id=habit_id, date=day))
+                    result.status = "created"
+                elif not current[1]:
+                    to_complete.append(current[0])
+                    result.status = "created"
+            elif current is not None and current[1]:
+                to_delete.append(current[0])
+                result.status = "deleted"
+
+        HabitCheckIn.objects.bulk_create(to_create, ignore_conflicts=True)
+        if to_complete:
+            HabitCheckIn.objects.filter(pk__in=to_complete).update(completed=True)
+        if to_delete:
+            HabitCheckIn.objects.filter(pk__in=to_delete).delete()
+
+    return sorted({
+        result.habit_id
+        for result in wanted.values()
+        if result.status in ("created", "deleted")
+    })
+
+
+def bump_history_versions(habit_ids=None):
+    """
+    Give all (or the given) habits a new history validator.
+
+    For rebuilds of the year bitmaps that bypass the check-in
+    signals: heatmaps are served from the bitmaps, so their cached
+    copies must be revalidated. Returns the number of habits bumped.
+    """
+    habits = Habit.all_objects.all()
+    if habit_ids is not None:
+        habits = habits.filter(id__in=habit_ids)
+    return habits.update(history_version=F("history_version") + 1)
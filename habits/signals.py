@@ -0,0 +1,441 @@
+"""
+Signals of the habits app.
+
+HabitCheckIn is the source of truth for the completion history of a
+habit. Several tables are derived from it (year bitmaps, streak runs),
+so every single-row write is translated into two simple events:
+
+- `day_completed(habit_id, day)`: the day is now completed
+- `day_cleared(habit_id, day)`: the day is no longer completed
+
+Derived data subscribes to these events, no matter whether the write
+came from a view, the admin or the shell.
+
+Bulk operations (bulk_create, queryset.update) do not send model
+signals. They run inside `bulk_checkin_writes()` and finish with a
+single `history_changed(habit_ids)` event, so derived data is
+resynced once per affected habit instead of once per row.
+
+Streak runs also depend on the habit's weekday schedule; changing it
+sends `schedule_changed(habit_ids)`.
+
+The per-user daily summary (see habits.summary) listens to the day
+events as well as to the writes of the other apps it summarizes.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F, QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from books.models import Book, UserBook
+from pomodoro.models import PomodoroSession
+from pomodoro.signals import sessions_completed
+from streaks.models import Streak
+from todos.models import Todo
+from . import cache as dashboard_cache
+from . import goals
+from . import summary
+from .models import DailySummary, Habit, HabitCheckIn, HabitYear
+
+# Sent with `habit_id` and `day` keyword arguments
+day_completed = Signal()
+day_cleared = Signal()
+
+# Sent with a `habit_ids` (and optionally `days`) keyword argument
+# after bulk writes
+history_changed = Signal()
+
+# Sent with a `habit_ids` keyword argument after schedule edits
+schedule_changed = Signal()
+
+# Set while a bulk write is in progress
+_bulk_write = ContextVar("habits_bulk_write", default=False)
+
+
+@contextmanager
+def bulk_checkin_writes():
+    """
+    Suppress the per-row day events for the duration of a bulk write.
+
+    The caller is responsible for sending `history_changed` for all
+    affected habits afterwards.
+    """
+    token = _bulk_write.set(True)
+    try:
+        yield
+    finally:
+        _bulk_write.reset(token)
+
+
+def cascades_from(origin, *models):
+    """
+    Whether a delete was started on an instance or queryset of `models`.
+
+    Rows derived from the deleted data go away in the same cascade,
+    so handlers must not write them again. `origin` is the instance
+    or queryset `delete()` was called on.
+    """
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model in models
+
+
+def _state(checkin):
+    """The (habit_id, date) pair a check-in marks as completed, if any."""
+    if not checkin.completed:
+        return None
+    return checkin.habit_id, checkin.date
+
+
+@receiver(pre_save, sender=HabitCheckIn)
+def remember_previous_state(sender, instance, raw=False, **kwargs):
+    """
+    Remember what an existing check-in looked like before an update,
+    so edits of the date or completion flag can be translated into
+    a clear event for the old day.
+    """
+    instance._previous_state = None
+    if raw or instance.pk is None or _bulk_write.get():
+        return
+    previous = (
+        HabitCheckIn.objects
+        .filter(pk=instance.pk)
+        .values_list("habit_id", "date", "completed")
+        .first()
+    )
+    if previous and previous[2]:
+        instance._previous_state = previous[:2]
+
+
+@receiver(post_save, sender=HabitCheckIn)
+def checkin_saved(sender, instance, raw=False, **kwargs):
+    """
+    Translate a created or changed check-in into day events.
+    """
+    # Skip fixture loading, the rebuild commands handle that case
+    if raw or _bulk_write.get():
+        return
+
+    previous = getattr(instance, "_previous_state", None)
+    current = _state(instance)
+    if previous == current:
+        return
+
+    if previous is not None:
+        habit_id, day = previous
+        day_cleared.send(sender=HabitCheckIn, habit_id=habit_id, day=day)
+    if current is not None:
+        habit_id, day = current
+        day_completed.send(sender=HabitCheckIn, habit_id=habit_id, day=day)
+
+
+@receiver(post_delete, sender=HabitCheckIn)
+def checkin_deleted(sender, instance, origin=None, **kwargs):
+    """
+    Translate a removed check-in into a clear event.
+    """
+    # The whole habit (or its owner) is being deleted, derived rows go with it
+    if cascades_from(origin, Habit, get_user_model()) or _bulk_write.get():
+        return
+    if instance.completed:
+        day_cleared.send(
+            sender=HabitCheckIn,
+            habit_id=instance.habit_id,
+            day=instance.date,
+        )
+
+
+@receiver(pre_save, sender=Habit)
+def remember_previous_schedule(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Remember the stored schedule of a habit before it is saved, so a
+    changed schedule can be detected afterwards.
+    """
+    instance._previous_schedule = None
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and "schedule" not in update_fields:
+        return
+    instance._previous_schedule = (
+        Habit.all_objects
+        .filter(pk=instance.pk)
+        .values_list("schedule", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=Habit)
+def habit_saved(sender, instance, raw=False, **kwargs):
+    """Translate a changed schedule into a schedule event."""
+    previous = getattr(instance, "_previous_schedule", None)
+    if raw or previous is None or previous == instance.schedule:
+        return
+    schedule_changed.send(sender=Habit, habit_ids=[instance.pk])
+
+
+@receiver(day_completed)
+def set_year_bit(sender, habit_id, day, **kwargs):
+    """Set the day in the year bitmap."""
+    HabitYear.objects.set_day(habit_id, day, True)
+
+
+@receiver(day_cleared)
+def clear_year_bit(sender, habit_id, day, **kwargs):
+    """Clear the day in the year bitmap."""
+    HabitYear.objects.set_day(habit_id, day, False)
+
+
+@receiver(history_changed)
+def rebuild_year_bitmaps(sender, habit_ids, **kwargs):
+    """Rebuild the year bitmaps of habits changed by a bulk write."""
+    HabitYear.objects.rebuild(habit_ids=habit_ids)
+
+
+@receiver(day_completed)
+def set_recent_day(sender, habit_id, day, **kwargs):
+    """Set the day in the goal window (see habits.goals)."""
+    goals.record_day(habit_id, day, True)
+
+
+@receiver(day_cleared)
+def clear_recent_day(sender, habit_id, day, **kwargs):
+    """Clear the day in the goal window."""
+    goals.record_day(habit_id, day, False)
+
+
+@receiver(history_changed)
+def recompute_recent_days(sender, habit_ids, **kwargs):
+    """Rebuild the goal windows of habits changed by a bulk write."""
+    goals.recompute(habit_ids)
+
+
+@receiver(day_completed)
+@receiver(day_cleared)
+def bump_history_version(sender, habit_id, **kwargs):
+    """Every change of the history gets a new validator (see Habit)."""
+    Habit.objects.filter(id=habit_id).update(
+        history_version=F("history_version") + 1
+    )
+
+
+@receiver(history_changed)
+def bump_history_versions(sender, habit_ids, **kwargs):
+    """Bulk writes change the history of several habits at once."""
+    Habit.objects.filter(id__in=habit_ids).update(
+        history_version=F("history_version") + 1
+    )
+
+
+# --------------------------------------------------
+# Daily summary
+# --------------------------------------------------
+
+def _completed_days(habit_id):
+    """The days a habit was completed on."""
+    return list(
+        HabitCheckIn.objects
+        .filter(habit_id=habit_id, completed=True)
+        .values_list("date", flat=True)
+    )
+
+
+@receiver(day_completed)
+@receiver(day_cleared)
+def count_completed_habit(sender, habit_id, day, signal, **kwargs):
+    """Count a (no longer) completed habit in the owner's summary."""
+    owner = (
+        Habit.all_objects
+        .filter(id=habit_id, deleted_at__isnull=True)
+        .values_list("user_id", flat=True)
+        .first()
+    )
+    # Deleted habits no longer count (see recount_deleted_habit)
+    if owner is None:
+        return
+    delta = 1 if signal is day_completed else -1
+    DailySummary.objects.add(owner, day, habits_completed=delta)
+
+
+@receiver(history_changed)
+def recount_completed_habits(sender, habit_ids, days=None, **kwargs):
+    """Bulk writes recount the affected days of the owners at once."""
+    owners = (
+        Habit.all_objects
+        .filter(id__in=habit_ids)
+        .values_list("user_id", flat=True)
+        .distinct()
+    )
+    summary.recount("habits_completed", owners, days or [date.today()])
+
+
+@receiver(pre_save, sender=Habit)
+def remember_previous_deletion(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Remember whether a habit was deleted before it is saved."""
+    instance._was_deleted = None
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and "deleted_at" not in update_fields:
+        return
+    previous = (
+        Habit.all_objects
+        .filter(pk=instance.pk)
+        .values_list("deleted_at", flat=True)
+    )
+    if previous:
+        instance._was_deleted = previous[0] is not None
+
+
+@receiver(post_save, sender=Habit)
+def recount_deleted_habit(sender, instance, raw=False, **kwargs):
+    """A (un)deleted habit stops (starts) counting on its completed days."""
+    was_deleted = getattr(instance, "_was_deleted", None)
+    if raw or was_deleted is None or was_deleted == (instance.deleted_at is not None):
+        return
+    summary.recount("habits_completed", [instance.user_id], _completed_days(instance.pk))
+
+
+@receiver(pre_delete, sender=Habit)
+def remember_completed_days(sender, instance, origin=None, **kwargs):
+    """A live habit being deleted takes its completions with it."""
+    instance._completed_days = None
+    if instance.deleted_at is None and not cascades_from(origin, get_user_model()):
+        instance._completed_days = _completed_days(instance.pk)
+
+
+@receiver(post_delete, sender=Habit)
+def recount_removed_habit(sender, instance, **kwargs):
+    """Recount the days a deleted habit was completed on."""
+    days = getattr(instance, "_completed_days", None)
+    if days:
+        summary.recount("habits_completed", [instance.user_id], days)
+
+
+@receiver(sessions_completed)
+def recount_focus_time(sender, user_ids, days, **kwargs):
+    """The expiry sweeper completes sessions without model signals."""
+    summary.recount("focus_seconds", user_ids, days)
+
+
+@receiver(pre_save, sender=PomodoroSession)
+@receiver(pre_save, sender=Todo)
+@receiver(pre_save, sender=UserBook)
+def remember_previous_contribution(sender, instance, raw=False, **kwargs):
+    """
+    Remember what a summarized row contributed before it is changed.
+    """
+    instance._previous_contribution = None
+    if raw or instance.pk is None:
+        return
+    previous = sender._base_manager.filter(pk=instance.pk).first()
+    if previous is not None:
+        instance._previous_contribution = summary.contribution(previous)
+
+
+@receiver(post_save, sender=PomodoroSession)
+@receiver(post_save, sender=Todo)
+@receiver(post_save, sender=UserBook)
+def update_contribution(sender, instance, raw=False, **kwargs):
+    """Apply the change of a row's contribution to the summary."""
+    if raw:
+        return
+    summary.apply_change(
+        getattr(instance, "_previous_contribution", None),
+        summary.contribution(instance),
+    )
+
+
+@receiver(post_delete, sender=PomodoroSession)
+@receiver(post_delete, sender=Todo)
+@receiver(post_delete, sender=UserBook)
+def remove_contribution(sender, instance, origin=None, **kwargs):
+    """A deleted row no longer contributes to the summary."""
+    # The summary rows of a deleted user go away with the user
+    if cascades_from(origin, get_user_model()):
+        return
+    summary.apply_contribution(summary.contribution(instance), -1)
+
+
+# --------------------------------------------------
+# Dashboard cache invalidation
+# --------------------------------------------------
+
+def _bump_after_commit(*scopes):
+    """
+    Bump cache versions once the current transaction has committed,
+    so no request can cache pre-commit data under the new version.
+    """
+    transaction.on_commit(lambda: dashboard_cache.bump(*scopes))
+
+
+def _habit_owner(instance):
+    """
+    The user id owning the habit of a check-in or streak.
+
+    Uses the cached habit when the caller already loaded it, so the
+    common write paths do not pay for an extra query.
+    """
+    field = type(instance).habit
+    if field.is_cached(instance):
+        return instance.habit.user_id
+    return (
+        Habit.objects
+        .filter(id=instance.habit_id)
+        .values_list("user_id", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=Habit)
+@receiver(post_delete, sender=Habit)
+def invalidate_habit_list(sender, instance, **kwargs):
+    """The habit lists of the owner changed."""
+    _bump_after_commit(dashboard_cache.user_scope(dashboard_cache.HABITS, instance.user_id))
+
+
+@receiver(post_save, sender=HabitCheckIn)
+@receiver(post_delete, sender=HabitCheckIn)
+@receiver(post_save, sender=Streak)
+@receiver(post_delete, sender=Streak)
+def invalidate_habit_sections(sender, instance, origin=None, **kwargs):
+    """The weekly matrix and streaks of the owner depend on these models."""
+    # Deleting the habit itself already invalidates the owner,
+    # bulk writes invalidate once through history_changed
+    if cascades_from(origin, Habit, get_user_model()) or _bulk_write.get():
+        return
+    user_id = _habit_owner(instance)
+    if user_id is not None:
+        _bump_after_commit(dashboard_cache.user_scope(dashboard_cache.HABITS, user_id))
+
+
+@receiver(history_changed)
+def invalidate_after_bulk_write(sender, habit_ids, **kwargs):
+    """Bulk check-in writes do not send model signals."""
+    user_ids = (
+        Habit.objects
+        .filter(id__in=habit_ids)
+        .values_list("user_id", flat=True)
+        .distinct()
+    )
+    _bump_after_commit(*(
+        dashboard_cache.user_scope(dashboard_cache.HABITS, user_id)
+        for user_id in user_ids
+    ))
+
+
+@receiver(post_save, sender=UserBook)
+@receiver(post_delete, sender=UserBook)
+def invalidate_reading_section(sender, instance, **kwargs):
+    """The reading preview of a user depends on their saved books."""
+    _bump_after_commit(dashboard_cache.user_scope(dashboard_cache.BOOKS, instance.user_id))
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_book_titles(sender, **kwargs):
+    """Book titles are shown in the reading preview of every user."""
+    _bump_after_commit(dashboard_cache.BOOKS)
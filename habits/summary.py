@@ -0,0 +1,265 @@
+"""
+Per-user daily summary behind the dashboard header.
+
+The header shows four numbers per user and day: habits completed,
+focus time, open to-dos and books being read. They come from four
+apps, so computing them live costs four aggregate queries on every
+dashboard view. Instead, DailySummary stores them per (user, day) and
+the dashboard reads a single row (see DailySummaryManager.for_day).
+
+The rows are maintained incrementally:
+
+- Habit check-ins: the day events of habits.signals add or remove one
+  completion; bulk writes recount the affected days (`recount`)
+- Pomodoro sessions, to-dos and saved books: every save or delete is
+  translated into the difference of its *contribution* before and
+  after the write (see CONTRIBUTIONS); sessions completed in bulk by
+  the expiry sweeper are recounted
+
+`reconcile(day)` recomputes a day from the source tables, to repair
+drift or fill days from before the summary existed
+(`python manage.py reconcile_daily_summaries`).
+"""
+
+from bisect import bisect_right
+from datetime import date
+
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from books.models import UserBook
+from pomodoro.models import PomodoroSession
+from todos.models import Todo
+from .models import COUNTER_FIELDS, GAUGE_FIELDS, DailySummary, HabitCheckIn
+
+SUMMARY_FIELDS = COUNTER_FIELDS + GAUGE_FIELDS
+
+
+# --------------------------------------------------
+# Contributions of single rows
+# --------------------------------------------------
+
+def pomodoro_contribution(session):
+    """A completed session adds its duration to the day it started on."""
+    if session.status != "completed":
+        return None
+    day = timezone.localdate(session.started_at)
+    return session.user_id, day, {"focus_seconds": session.duration_seconds}
+
+
+def todo_contribution(todo):
+    """An open to-do counts from today on."""
+    if todo.is_done:
+        return None
+    return todo.user_id, None, {"open_todos": 1}
+
+
+def userbook_contribution(userbook):
+    """A book being read counts from today on."""
+    if userbook.status != "reading":
+        return None
+    return userbook.user_id, None, {"books_reading": 1}
+
+
+# What one row of a source model adds to the summary: None, or
+# (user_id, day, {field: value}). A day of None marks gauges, which
+# describe the current state and are applied from today on.
+CONTRIBUTIONS = {
+    PomodoroSession: pomodoro_contribution,
+    Todo: todo_contribution,
+    UserBook: userbook_contribution,
+}
+
+
+def contribution(instance):
+    """The contribution of a row of one of the CONTRIBUTIONS models."""
+    return CONTRIBUTIONS[type(instance)](instance)
+
+
+def apply_contribution(value, sign=1, today=None):
+    """Add (sign=1) or remove (sign=-1) a contribution."""
+    if value is None:
+        return
+    user_id, day, fields = value
+    deltas = {field: sign * amount for field, amount in fields.items()}
+    if day is None:
+        DailySummary.objects.shift_gauges(user_id, today or date.today(), **deltas)
+    else:
+        DailySummary.objects.add(user_id, day, **deltas)
+
+
+def apply_change(previous, current, today=None):
+    """Replace the contribution a row had before a write by its new one."""
+    if previous == current:
+        return
+    apply_contribution(previous, -1, today)
+    apply_contribution(current, 1, today)
+
+
+# --------------------------------------------------
+# Recomputing from the source tables
+# --------------------------------------------------
+
+def _counter_source(field, days):
+    """
+    (queryset, user field, day field, aggregate) a counter is
+    computed from, for the given days.
+    """
+    if field == "habits_completed":
+        return (
+            HabitCheckIn.objects.filter(
+                date__in=days, completed=True, habit__deleted_at__isnull=True
+            ),
+            "habit__user_id", "date", Count("id"),
+        )
+    if field == "focus_seconds":
+        return (
+            PomodoroSession.objects.filter(status="completed").started_on(days),
+            "user_id", "started_at__date", Sum("duration_seconds"),
+        )
+    raise ValueError(f"unknown counter: {field}")
+
+
+def counter_counts(field, days, user_ids=None):
+    """
+    Compute a counter for several days from the source table.
+
+    One grouped query. Returns {(user_id, day): value}; pairs without
+    data are missing.
+    """
+    queryset, user_field, day_field, aggregate = _counter_source(field, days)
+    if user_ids is not None:
+        queryset = queryset.filter(**{f"{user_field}__in": user_ids})
+    return {
+        (user_id, day): value
+        for user_id, day, value in (
+            queryset
+            .values_list(user_field, day_field)
+            .annotate(value=aggregate)
+            .order_by()
+        )
+    }
+
+
+def _gauge_counts(field, user_ids=None):
+    """Compute a gauge from the current state: {user_id: value}."""
+    queryset = {
+        "open_todos": Todo.objects.filter(is_done=False),
+        "books_reading": UserBook.objects.filter(status="reading"),
+    }[field]
+    if user_ids is not None:
+        queryset = queryset.filter(user_id__in=user_ids)
+    return dict(
+        queryset
+        .values_list("user_id")
+        .annotate(value=Count("id"))
+        .order_by()
+    )
+
+
+def source_counts(day, user_ids=None, fields=SUMMARY_FIELDS):
+    """
+    Compute summary fields of a day from the source tables.
+
+    One grouped query per field. Gauges are computed from the current
+    state, so they are only meaningful for today.
+    Returns {field: {user_id: value}} (users without data are missing).
+    """
+    counts = {}
+    for field in fields:
+        if field in COUNTER_FIELDS:
+            counts[field] = {
+                user_id: value
+                for (user_id, _), value in counter_counts(field, [day], user_ids).items()
+            }
+        else:
+            counts[field] = _gauge_counts(field, user_ids)
+    return counts
+
+
+def reconcile(day, user_ids=None, today=None):
+    """
+    Recompute the summary rows of a day from the source tables.
+
+    Counters are always recomputed. Gauges only hold for the current
+    state, so they are reconciled only when `day` is today (and then
+    corrected on every later row as well).
+    Returns the number of users whose row had drifted.
+    """
+    today = today or date.today()
+    fields = SUMMARY_FIELDS if day == today else COUNTER_FIELDS
+    counts = source_counts(day, user_ids, fields)
+
+    if user_ids is None:
+        user_ids = set(
+            DailySummary.objects.filter(date=day).values_list("user_id", flat=True)
+        )
+        for values in counts.values():
+            user_ids.update(values)
+
+    drifted = 0
+    for user_id in sorted(user_ids):
+        wanted = {field: counts[field].get(user_id, 0) for field in fields}
+        row = DailySummary.objects.for_day(user_id, day)
+        stored = {field: getattr(row, field) for field in fields}
+        if stored == wanted:
+            continue
+        drifted += 1
+
+        deltas = {field: wanted[field] - stored[field] for field in fields}
+        counters = {f: d for f, d in deltas.items() if f in COUNTER_FIELDS and d}
+        gauges = {f: d for f, d in deltas.items() if f in GAUGE_FIELDS and d}
+        if counters:
+            DailySummary.objects.add(user_id, day, **counters)
+        if gauges:
+            DailySummary.objects.shift_gauges(user_id, day, **gauges)
+    return drifted
+
+
+def recount(field, user_ids, days):
+    """
+    Recount a counter of users on several days at once.
+
+    Used after bulk writes (check-ins, expired focus sessions) and
+    habit deletions. Runs a fixed number of queries: one count, one
+    read of the users' rows and one upsert. Rows created here carry
+    over the gauges of the user's latest earlier row.
+    """
+    user_ids = set(user_ids)
+    days = set(days)
+    if not user_ids or not days:
+        return
+
+    counts = counter_counts(field, days, user_ids)
+
+    # The rows up to the last day, to find the gauges to carry over
+    history = {}
+    for row in (
+        DailySummary.objects
+        .filter(user_id__in=user_ids, date__lte=max(days))
+        .order_by("user_id", "date")
+        .values("user_id", "date", *GAUGE_FIELDS)
+    ):
+        history.setdefault(row["user_id"], []).append(row)
+
+    rows = []
+    for user_id in sorted(user_ids):
+        earlier = history.get(user_id, [])
+        dates = [row["date"] for row in earlier]
+        for day in sorted(days):
+            index = bisect_right(dates, day)
+            carried = earlier[index - 1] if index else {}
+            rows.append(DailySummary(
+                user_id=user_id,
+                date=day,
+                **{field: counts.get((user_id, day), 0)},
+                **{gauge: carried.get(gauge, 0) for gauge in GAUGE_FIELDS},
+            ))
+
+    # Existing rows only get the new count, their gauges stay
+    DailySummary.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["user", "date"],
+        update_fields=[field],
+    )
@@ -1,3 +1,1509 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from io import StringIO
+import json
+import pickle
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from analytics.models import DailyRollup
+from books.models import Book, UserBook
+from pomodoro import services as pomodoro_services
+from pomodoro.models import PomodoroSession
+from streaks.models import HabitRun, Streak
+from todos.models import Todo
+
+from . import bitmap
+from . import focus
+from . import cache as dashboard_cache
+from . import goals
+from . import idempotency
+from . import rollover
+from . import schedule
+from . import summary
+from . import views as habits_views
+from .calendar_data import build_calendar, build_month_calendar
+from .models import DailySummary, Habit, HabitCheckIn, HabitYear
+from .purge import purge_batches, purge_habit
+from .services import apply_checkins, record_completion
+from .users import get_demo_user
+from .views import build_dashboard_sections
 
 # Test configuration for the habits app.
+
+
+def ids(rows):
+    """Helper: the ids of dashboard habit rows, in order."""
+    return [row.id for row in rows]
+
+
+def create_habits(count, checkin_days=(), user=None):
+    """
+    Helper: create `count` habits, each with a check-in on every given day.
+
+    The habits belong to the demo user unless another `user` is given.
+    """
+    user = user or get_demo_user()
+    habits = Habit.objects.bulk_create(
+        Habit(name=f"Habit {i}", user=user) for i in range(count)
+    )
+    HabitCheckIn.objects.bulk_create(
+        HabitCheckIn(habit=habit, date=day)
+        for habit in habits
+        for day in checkin_days
+    )
+    return habits
+
+
+class HabitCalendarTests(TestCase):
+    """
+    Tests for the bitmask-based calendar data provider.
+    """
+
+    def test_bitmask_marks_completed_days(self):
+        habit = Habit.objects.create(name="Read", user=get_demo_user())
+        other = Habit.objects.create(name="Run", user=get_demo_user())
+        for day in (1, 2, 5, 31):
+            HabitCheckIn.objects.create(habit=habit, date=date(2025, 1, day))
+        # Outside of the requested month
+        HabitCheckIn.objects.create(habit=habit, date=date(2025, 2, 1))
+
+        cal = build_month_calendar(Habit.objects.all(), 2025, 1)
+
+        self.assertEqual(cal.length, 31)
+        self.assertEqual(cal.mask(habit.id), 0b1 << 30 | 0b10011)
+        self.assertEqual(cal[habit.id], {1, 2, 5, 31})
+        self.assertEqual(cal.count(habit.id), 4)
+        self.assertTrue(cal.is_completed(habit.id, date(2025, 1, 5)))
+        self.assertFalse(cal.is_completed(habit.id, date(2025, 1, 6)))
+        self.assertFalse(cal.is_completed(habit.id, date(2025, 2, 1)))
+        self.assertEqual(cal.days(habit.id)[-1], date(2025, 1, 31))
+
+        # Habits without check-ins get an empty mask
+        self.assertEqual(cal.mask(other.id), 0)
+        self.assertEqual(cal[other.id], set())
+
+    def test_arbitrary_range_accepts_habit_ids(self):
+        habit = Habit.objects.create(name="Read", user=get_demo_user())
+        start = date(2024, 12, 30)
+        for offset in range(5):
+            HabitCheckIn.objects.create(
+                habit=habit, date=start + timedelta(days=offset)
+            )
+
+        cal = build_calendar([habit.id], start, date(2025, 1, 2))
+
+        self.assertEqual(cal.mask(habit.id), 0b1111)
+
+    def test_single_query_for_any_number_of_habits(self):
+        days = [date(2025, 3, d) for d in (1, 10, 20)]
+        create_habits(50, days)
+
+        with self.assertNumQueries(1):
+            cal = build_month_calendar(Habit.objects.all(), 2025, 3)
+
+        self.assertEqual(len(cal.masks), 50)
+
+
+class DashboardQueryTests(TestCase):
+    """
+    Query-count regression tests for the dashboard.
+    """
+
+    def get_dashboard(self):
+        """Render the dashboard without the section cache."""
+        dashboard_cache.get_cache().clear()
+        return self.client.get(reverse("dashboard"))
+
+    def checkin_queries(self, habit_count):
+        """
+        Render the dashboard with `habit_count` habits and return the
+        number of queries that touched the check-in table.
+        """
+        today = date.today()
+        create_habits(habit_count, [today, today - timedelta(days=1)])
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.get_dashboard()
+        self.assertEqual(response.status_code, 200)
+
+        return sum(
+            "habits_habitcheckin" in query["sql"]
+            for query in ctx.captured_queries
+        )
+
+    def test_checkin_queries_do_not_grow_with_habits(self):
+        few = self.checkin_queries(3)
+        HabitCheckIn.objects.all().delete()
+        Habit.objects.all().delete()
+        many = self.checkin_queries(60)
+
+        self.assertEqual(few, many)
+
+    def test_total_queries_do_not_grow_with_habits(self):
+        # Half of the habits have a streak, the other half has none
+        habits = create_habits(40, [date.today()])
+        Streak.objects.bulk_create(
+            Streak(habit=habit, count=3, longest_streak=5)
+            for habit in habits[::2]
+        )
+        with CaptureQueriesContext(connection) as ctx:
+            self.get_dashboard()
+        many = len(ctx.captured_queries)
+
+        Streak.objects.all().delete()
+        HabitCheckIn.objects.all().delete()
+        Habit.objects.all().delete()
+        create_habits(2, [date.today()])
+        with CaptureQueriesContext(connection) as ctx:
+            self.get_dashboard()
+        few = len(ctx.captured_queries)
+
+        self.assertEqual(few, many)
+
+    def test_streak_data_is_rendered(self):
+        habit = Habit.objects.create(name="Stretch", user=get_demo_user())
+        Streak.objects.create(habit=habit, count=4, longest_streak=9)
+        Habit.objects.create(name="No streak yet", user=get_demo_user())
+
+        response = self.get_dashboard()
+
+        self.assertContains(response, "4 day streak")
+        self.assertContains(response, "No streak yet")
+
+
+class HabitYearTests(TestCase):
+    """
+    Tests for the year bitmap companion table.
+    """
+
+    def setUp(self):
+        self.habit = Habit.objects.create(name="Meditate", user=get_demo_user())
+
+    def test_toggle_keeps_bitmap_in_sync(self):
+        today = date.today()
+        url = reverse("toggle_habit", args=[self.habit.id])
+
+        self.client.post(url)
+        self.assertTrue(HabitYear.objects.is_completed(self.habit.id, today))
+
+        self.client.post(url)
+        self.assertFalse(HabitYear.objects.is_completed(self.habit.id, today))
+
+    def test_complete_habit_writes_checkin_and_bitmap(self):
+        self.client.get(reverse("complete-habit", args=[self.habit.id]))
+
+        self.assertTrue(
+            HabitCheckIn.objects.filter(habit=self.habit, date=date.today()).exists()
+        )
+        self.assertTrue(
+            HabitYear.objects.is_completed(self.habit.id, date.today())
+        )
+
+    def test_range_queries_span_years(self):
+        days = [date(2024, 12, 29), date(2024, 12, 30), date(2024, 12, 31),
+                date(2025, 1, 1), date(2025, 1, 3), date(2025, 3, 1)]
+        for day in days:
+            HabitCheckIn.objects.create(habit=self.habit, date=day)
+
+        start, end = date(2024, 12, 30), date(2025, 1, 31)
+        years = HabitYear.objects
+
+        self.assertEqual(years.count_completed(self.habit.id, start, end), 4)
+        self.assertEqual(years.longest_run(self.habit.id, start, end), 3)
+        self.assertEqual(
+            years.longest_run(self.habit.id, date(2024, 1, 1), date(2025, 12, 31)),
+            4,
+        )
+        self.assertEqual(
+            years.range_masks([self.habit.id], start, end),
+            build_calendar([self.habit.id], start, end).masks,
+        )
+
+    def test_habit_delete_cascades(self):
+        HabitCheckIn.objects.create(habit=self.habit, date=date(2025, 5, 5))
+        self.habit.delete()
+        self.assertFalse(HabitYear.objects.exists())
+
+    def test_backfill_matches_checkins(self):
+        HabitCheckIn.objects.bulk_create(
+            HabitCheckIn(habit=self.habit, date=date(2023, 1, 1) + timedelta(days=i))
+            for i in range(0, 900, 3)
+        )
+        call_command("backfill_habit_years", stdout=StringIO())
+
+        self.assertEqual(HabitYear.objects.count(), 3)
+        self.assertEqual(
+            HabitYear.objects.count_completed(
+                self.habit.id, date(2023, 1, 1), date(2025, 12, 31)
+            ),
+            300,
+        )
+
+
+class BitmapTests(TestCase):
+    """
+    Tests for the pure bit helpers.
+    """
+
+    def test_runs(self):
+        self.assertEqual(bitmap.longest_run(0), 0)
+        self.assertEqual(bitmap.longest_run(0b1110111101), 4)
+        self.assertEqual(bitmap.trailing_run(0b1110111101, 10), 3)
+        self.assertEqual(bitmap.trailing_run(0b0110111101, 10), 0)
+        self.assertEqual(bitmap.trailing_run(0b111, 3), 3)
+        self.assertEqual(list(bitmap.iter_runs(0)), [])
+        self.assertEqual(
+            list(bitmap.iter_runs(0b1110111101)),
+            [(0, 1), (2, 4), (7, 3)],
+        )
+
+    def test_storage_roundtrip(self):
+        mask = 1 << 365 | 1
+        self.assertEqual(bitmap.from_bytes(bitmap.to_bytes(mask)), mask)
+        self.assertEqual(list(bitmap.iter_offsets(mask)), [0, 365])
+
+
+class ScheduleTests(TestCase):
+    """
+    Tests for the weekday schedule helpers.
+    """
+
+    def test_scheduled_days_match_scan(self):
+        rng = random.Random(2)
+        for _ in range(200):
+            schedule_mask = rng.randrange(1, schedule.EVERY_DAY + 1)
+            start = date(2025, 1, 1) + timedelta(days=rng.randrange(14))
+            end = start + timedelta(days=rng.randrange(-1, 40))
+            expected = sum(
+                1
+                for offset in range((end - start).days + 1)
+                if schedule.is_scheduled(schedule_mask, start + timedelta(days=offset))
+            )
+            self.assertEqual(schedule.scheduled_days(schedule_mask, start, end), expected)
+
+    def test_neighbours_and_labels(self):
+        mon_wed_fri = schedule.from_weekdays(["0", "2", "4"])
+        friday = date(2025, 6, 13)
+
+        self.assertEqual(mon_wed_fri, 0b10101)
+        self.assertEqual(schedule.next_scheduled(mon_wed_fri, friday), date(2025, 6, 16))
+        self.assertEqual(schedule.previous_scheduled(mon_wed_fri, friday), date(2025, 6, 11))
+        self.assertEqual(schedule.label(mon_wed_fri), "Mon, Wed, Fri")
+        self.assertEqual(schedule.label(schedule.EVERY_DAY), "Every day")
+        with self.assertRaises(ValueError):
+            schedule.from_weekdays([7])
+
+
+class BulkCheckInTests(TestCase):
+    """
+    Tests for the bulk check-in JSON endpoint.
+    """
+
+    def setUp(self):
+        self.habit = Habit.objects.create(name="Water", user=get_demo_user())
+        self.other = Habit.objects.create(name="Walk", user=get_demo_user())
+        self.url = reverse("bulk_checkins")
+
+    def post(self, entries):
+        return self.client.post(
+            self.url,
+            data=json.dumps({"checkins": entries}),
+            content_type="application/json",
+        )
+
+    def test_batch_is_applied_with_per_item_results(self):
+        today = date.today()
+        yesterday = today - timedelta(days=1)
+        HabitCheckIn.objects.create(habit=self.other, date=today)
+
+        response = self.post([
+            {"habit_id": self.habit.id, "date": yesterday.isoformat()},
+            {"habit_id": self.habit.id, "date": today.isoformat(), "completed": True},
+            {"habit_id": self.other.id, "date": today.isoformat(), "completed": False},
+            {"habit_id": self.other.id, "date": yesterday.isoformat(), "completed": False},
+            {"habit_id": 9999, "date": today.isoformat()},
+            {"habit_id": self.habit.id, "date": "not a date"},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        statuses = [item["status"] for item in response.json()["results"]]
+        self.assertEqual(
+            statuses,
+            ["created", "created", "deleted", "unchanged", "error", "error"],
+        )
+
+        self.assertEqual(HabitCheckIn.objects.filter(habit=self.habit).count(), 2)
+        self.assertFalse(HabitCheckIn.objects.filter(habit=self.other).exists())
+
+        # Derived data was resynced for the affected habits
+        streak = Streak.objects.get(habit=self.habit)
+        self.assertEqual((streak.count, streak.longest_streak), (2, 2))
+        self.assertEqual(Streak.objects.get(habit=self.other).count, 0)
+        self.assertEqual(
+            HabitYear.objects.count_completed(self.habit.id, yesterday, today), 2
+        )
+
+    def test_clearing_an_open_day_is_unchanged(self):
+        today = date.today()
+        HabitCheckIn.objects.create(habit=self.habit, date=today, completed=False)
+
+        response = self.post([
+            {"habit_id": self.habit.id, "date": today.isoformat(), "completed": False},
+        ])
+
+        self.assertEqual(response.json()["results"][0]["status"], "unchanged")
+        # Nothing was written, so nothing was resynced
+        self.habit.refresh_from_db()
+        self.assertEqual(self.habit.history_version, 0)
+
+    def test_query_count_does_not_grow_with_batch(self):
+        start = date.today() - timedelta(days=200)
+
+        def entries(count):
+            return [
+                {"habit_id": self.habit.id,
+                 "date": (start + timedelta(days=i)).isoformat()}
+                for i in range(count)
+            ]
+
+        with CaptureQueriesContext(connection) as small:
+            self.post(entries(5))
+        HabitCheckIn.objects.all().delete()
+        with CaptureQueriesContext(connection) as large:
+            self.post(entries(150))
+
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_rejects_malformed_payload(self):
+        response = self.client.post(
+            self.url, data="nope", content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(
+            self.url, data=json.dumps([1, 2]), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class ToggleJsonTests(TestCase):
+    """
+    Tests for the AJAX toggle endpoint.
+    """
+
+    def setUp(self):
+        self.habit = Habit.objects.create(name="Floss", user=get_demo_user())
+        self.url = reverse("toggle_habit_json", args=[self.habit.id])
+        dashboard_cache.get_cache().clear()
+
+    def test_returns_delta_for_both_directions(self):
+        today = date.today().isoformat()
+
+        data = self.client.post(self.url).json()
+        self.assertEqual(data["habit_id"], self.habit.id)
+        self.assertTrue(data["completed"])
+        self.assertEqual(data["streak"], {"count": 1, "longest_streak": 1})
+        self.assertEqual(data["week_cell"], {"date": today, "completed": True})
+
+        data = self.client.post(self.url).json()
+        self.assertFalse(data["completed"])
+        self.assertEqual(data["streak"], {"count": 0, "longest_streak": 0})
+        self.assertFalse(HabitCheckIn.objects.exists())
+
+    def test_requires_post_and_existing_habit(self):
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+        missing = reverse("toggle_habit_json", args=[9999])
+        self.assertEqual(self.client.post(missing).status_code, 404)
+
+    def test_habit_deleted_during_the_request_is_not_found(self):
+        # Simulate a delete between the lookup and the lock
+        lookup = habits_views.get_object_or_404
+
+        def lookup_then_delete(*args, **kwargs):
+            habit = lookup(*args, **kwargs)
+            Habit.objects.get(id=habit.id).soft_delete()
+            return habit
+
+        habits_views.get_object_or_404 = lookup_then_delete
+        try:
+            json_response = self.client.post(self.url)
+            Habit.all_objects.filter(id=self.habit.id).update(deleted_at=None)
+            response = self.client.post(reverse("toggle_habit", args=[self.habit.id]))
+        finally:
+            habits_views.get_object_or_404 = lookup
+
+        self.assertEqual(json_response.status_code, 404)
+        self.assertEqual(json_response.json(), {"error": "habit was deleted"})
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(HabitCheckIn.objects.exists())
+
+    def test_dashboard_renders_toggle_hooks(self):
+        response = self.client.get(reverse("dashboard"))
+        self.assertContains(response, f'data-json-url="{self.url}"')
+        self.assertContains(response, f'data-habit-card="{self.habit.id}"')
+
+
+class IdempotentToggleTests(TestCase):
+    """
+    Tests for idempotency keys and the set-state mode of the toggles.
+    """
+
+    def setUp(self):
+        self.habit = Habit.objects.create(name="Stretch", user=get_demo_user())
+        self.url = reverse("toggle_habit_json", args=[self.habit.id])
+        idempotency.get_store().clear()
+        dashboard_cache.get_cache().clear()
+
+    def post(self, url=None, key=None, **data):
+        headers = {"HTTP_IDEMPOTENCY_KEY": key} if key else {}
+        return self.client.post(url or self.url, data, **headers)
+
+    def test_repeated_key_returns_original_result(self):
+        first = self.post(key="click-1")
+        repeat = self.post(key="click-1")
+
+        self.assertEqual(repeat.json(), first.json())
+        self.assertEqual(repeat["Idempotent-Replayed"], "true")
+        self.assertTrue(HabitCheckIn.objects.filter(habit=self.habit).exists())
+        self.habit.refresh_from_db()
+        self.assertEqual(self.habit.history_version, 1)
+
+        # A new key is a new toggle
+        self.assertFalse(self.post(key="click-2").json()["completed"])
+
+    def test_key_reuse_and_concurrent_use_are_rejected(self):
+        self.post(key="click-1")
+        other = reverse("toggle_habit_json", args=[
+            Habit.objects.create(name="Other", user=get_demo_user()).id
+        ])
+        self.assertEqual(self.post(other, key="click-1").status_code, 422)
+        self.assertEqual(self.post(key="click-1", completed="false").status_code, 422)
+
+        store_key = idempotency._store_key(get_demo_user().pk, "click-2")
+        idempotency.get_store().add(store_key, {
+            "fingerprint": f"POST {self.url} completed=",
+            "response": None,
+        })
+        self.assertEqual(self.post(key="click-2").status_code, 409)
+
+    def test_form_field_key_replays_redirect(self):
+        url = reverse("toggle_habit", args=[self.habit.id])
+
+        first = self.post(url, idempotency_key="form-1")
+        repeat = self.post(url, idempotency_key="form-1")
+
+        self.assertEqual(repeat.status_code, 302)
+        self.assertEqual(repeat["Location"], first["Location"])
+        self.assertEqual(repeat["Idempotent-Replayed"], "true")
+        self.assertEqual(HabitCheckIn.objects.filter(habit=self.habit).count(), 1)
+
+    def test_complete_endpoint_accepts_key(self):
+        url = reverse("complete-habit", args=[self.habit.id])
+
+        first = self.post(url, key="done-1")
+        repeat = self.post(url, key="done-1")
+
+        self.assertEqual(repeat.content, first.content)
+        self.assertEqual(repeat["Idempotent-Replayed"], "true")
+
+    def test_set_state_mode(self):
+        data = self.post(completed="true").json()
+        self.assertEqual((data["completed"], data["changed"]), (True, True))
+
+        data = self.post(completed="true").json()
+        self.assertEqual((data["completed"], data["changed"]), (True, False))
+        self.habit.refresh_from_db()
+        self.assertEqual(self.habit.history_version, 1)
+
+        data = self.post(completed="false").json()
+        self.assertEqual((data["completed"], data["changed"]), (False, True))
+        self.assertFalse(HabitCheckIn.objects.exists())
+
+        self.assertEqual(self.post(completed="maybe").status_code, 400)
+
+    def test_dashboard_forms_request_explicit_state(self):
+        response = self.client.get(reverse("dashboard"))
+        self.assertContains(response, '<input type="hidden" name="completed" value="true">')
+
+
+# Status line of a habit card in the "Completed" column
+COMPLETED_STATUS = '<div class="small text-muted js-habit-status">Completed today</div>'
+
+
+class DashboardCacheTests(TestCase):
+    """
+    Tests for the versioned dashboard section cache.
+    """
+
+    def setUp(self):
+        dashboard_cache.get_cache().clear()
+        dashboard_cache.stats.clear()
+        self.habit = Habit.objects.create(name="Plank", user=get_demo_user())
+
+    def test_warm_cache_skips_section_queries(self):
+        with CaptureQueriesContext(connection) as cold:
+            self.client.get(reverse("dashboard"))
+        with CaptureQueriesContext(connection) as warm:
+            response = self.client.get(reverse("dashboard"))
+
+        self.assertContains(response, "Plank")
+        self.assertLess(len(warm.captured_queries), len(cold.captured_queries))
+        self.assertFalse(any(
+            "habits_habit" in query["sql"] for query in warm.captured_queries
+        ))
+        self.assertEqual(
+            dashboard_cache.cache_stats(),
+            {"hits": 1, "misses": 1, "hit_rate": 0.5},
+        )
+
+    def test_writes_invalidate_sections(self):
+        self.client.get(reverse("dashboard"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("toggle_habit", args=[self.habit.id]))
+        response = self.client.get(reverse("dashboard"))
+        self.assertContains(response, COMPLETED_STATUS)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Habit.objects.create(name="Sauna", user=get_demo_user())
+        response = self.client.get(reverse("dashboard"))
+        self.assertContains(response, "Sauna")
+
+        self.assertEqual(dashboard_cache.stats["hits"], 0)
+
+    def test_bulk_writes_invalidate_sections(self):
+        self.client.get(reverse("dashboard"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_checkins([
+                {"habit_id": self.habit.id, "date": date.today().isoformat()},
+            ])
+        response = self.client.get(reverse("dashboard"))
+
+        self.assertContains(response, COMPLETED_STATUS)
+
+
+class DashboardSectionTests(TestCase):
+    """
+    Tests for the precomputed dashboard sections.
+    """
+
+    def test_weekly_rows_and_partitions(self):
+        today = date(2025, 6, 15)
+        done = Habit.objects.create(name="Done", user=get_demo_user())
+        open_ = Habit.objects.create(name="Open", user=get_demo_user())
+        HabitCheckIn.objects.bulk_create([
+            HabitCheckIn(habit=done, date=today),
+            HabitCheckIn(habit=done, date=today - timedelta(days=2)),
+            HabitCheckIn(habit=open_, date=today - timedelta(days=6)),
+            # Outside of the week
+            HabitCheckIn(habit=open_, date=today - timedelta(days=7)),
+        ])
+
+        sections = build_dashboard_sections(today, get_demo_user())
+
+        self.assertEqual(sections["week_days"][-1], today)
+        rows = {row.habit.id: row.days for row in sections["weekly_rows"]}
+        self.assertEqual(rows[done.id], [False] * 4 + [True, False, True])
+        self.assertEqual(rows[open_.id], [True] + [False] * 6)
+        self.assertEqual(ids(sections["completed_habits"]), [done.id])
+        self.assertEqual(ids(sections["open_habits"]), [open_.id])
+        self.assertEqual(sections["completed_today"], {done.id})
+
+    def test_sections_are_built_from_columns(self):
+        today = date.today()
+        user = get_demo_user()
+        habit = Habit.objects.create(name="Read", user=user, goal_count=2)
+        HabitCheckIn.objects.create(habit=habit, date=today)
+        book = Book.objects.create(
+            title="Deep Work", goal="focus", mood="calm", description="x" * 1000
+        )
+        UserBook.objects.create(user=user, book=book, status="reading", progress=40)
+
+        with CaptureQueriesContext(connection) as ctx:
+            sections = build_dashboard_sections(today, user)
+
+        # Long text columns are never loaded
+        for query in ctx.captured_queries:
+            self.assertNotIn("description", query["sql"])
+
+        [row] = sections["completed_habits"]
+        self.assertEqual(row.name, "Read")
+        self.assertEqual((row.streak.count, row.streak.longest_streak), (1, 1))
+        self.assertEqual(row.goal.as_dict()["done"], 1)
+        self.assertFalse(hasattr(row, "__dict__"))
+        [book_row] = sections["user_books"]
+        self.assertEqual(
+            (book_row.book_id, book_row.title, book_row.progress),
+            (book.id, "Deep Work", 40),
+        )
+
+        # Rows survive the round trip through the cache
+        cached = pickle.loads(pickle.dumps(sections))
+        self.assertEqual(cached["habits"], sections["habits"])
+        self.assertEqual(cached["weekly_rows"], sections["weekly_rows"])
+
+
+class ScheduledDashboardTests(TestCase):
+    """
+    Tests for habits with a weekday schedule on the dashboard.
+    """
+
+    def setUp(self):
+        dashboard_cache.get_cache().clear()
+        # A Sunday
+        self.today = date(2025, 6, 15)
+        self.user = get_demo_user()
+
+    def test_split_filters_on_todays_weekday_bit(self):
+        daily = Habit.objects.create(name="Daily", user=self.user)
+        weekdays_only = Habit.objects.create(
+            name="Weekdays", user=self.user, schedule=0b0011111
+        )
+        sunday_bonus = Habit.objects.create(
+            name="Bonus", user=self.user, schedule=0b0000001
+        )
+        HabitCheckIn.objects.create(habit=sunday_bonus, date=self.today)
+
+        sections = build_dashboard_sections(self.today, self.user)
+
+        self.assertEqual(ids(sections["open_habits"]), [daily.id])
+        self.assertEqual(ids(sections["resting_habits"]), [weekdays_only.id])
+        self.assertEqual(ids(sections["completed_habits"]), [sunday_bonus.id])
+        self.assertEqual(
+            [row.habit.id for row in sections["weekly_rows"]],
+            [daily.id, weekdays_only.id, sunday_bonus.id],
+        )
+
+    def test_split_is_filtered_in_sql(self):
+        Habit.objects.create(name="Weekdays", user=self.user, schedule=0b0011111)
+
+        with CaptureQueriesContext(connection) as ctx:
+            build_dashboard_sections(self.today, self.user)
+
+        habit_queries = [
+            query["sql"] for query in ctx.captured_queries
+            if '"schedule" &' in query["sql"]
+        ]
+        self.assertEqual(len(habit_queries), 3)
+
+    def test_add_and_update_schedule(self):
+        self.client.post(reverse("add_habit"), {"name": "Gym", "weekdays": ["0", "2", "4"]})
+        self.client.post(reverse("add_habit"), {"name": "Walk"})
+        gym = Habit.objects.get(name="Gym")
+        self.assertEqual(gym.schedule, 0b10101)
+        self.assertEqual(gym.schedule_label, "Mon, Wed, Fri")
+        self.assertEqual(Habit.objects.get(name="Walk").schedule, schedule.EVERY_DAY)
+
+        url = reverse("update_schedule", args=[gym.id])
+        self.assertEqual(self.client.post(url, {"weekdays": ["5", "6"]}).status_code, 302)
+        gym.refresh_from_db()
+        self.assertEqual(gym.schedule, 0b1100000)
+
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.assertEqual(self.client.post(url, {"weekdays": ["9"]}).status_code, 400)
+
+    def test_json_toggle_reports_due_today(self):
+        habit = Habit.objects.create(
+            name="Not today",
+            user=self.user,
+            schedule=schedule.EVERY_DAY & ~schedule.weekday_bit(date.today()),
+        )
+
+        response = self.client.post(reverse("toggle_habit_json", args=[habit.id]))
+
+        self.assertFalse(response.json()["due_today"])
+
+    def test_resting_habits_can_be_deleted(self):
+        habit = Habit.objects.create(
+            name="Not today",
+            user=self.user,
+            schedule=schedule.EVERY_DAY & ~schedule.weekday_bit(date.today()),
+        )
+
+        response = self.client.get(reverse("dashboard"))
+
+        self.assertContains(response, reverse("delete_habit", args=[habit.id]))
+
+
+class GoalTests(TestCase):
+    """
+    Tests for rolling-window frequency goals.
+    """
+
+    def setUp(self):
+        dashboard_cache.get_cache().clear()
+        self.today = date.today()
+        self.habit = Habit.objects.create(
+            name="Gym", user=get_demo_user(), goal_count=3, goal_days=7
+        )
+
+    def progress(self, day, days):
+        self.habit.refresh_from_db()
+        return goals.completed_in_window(
+            self.habit.recent_mask, self.habit.recent_anchor, day, days
+        )
+
+    def test_incremental_window_matches_scan(self):
+        rng = random.Random(17)
+        days = set()
+
+        for _ in range(150):
+            day = self.today - timedelta(days=rng.randrange(-10, 45))
+            if rng.random() < 0.1:
+                # Bulk writes resync through history_changed
+                apply_checkins([{
+                    "habit_id": self.habit.id,
+                    "date": day.isoformat(),
+                    "completed": day not in days,
+                }])
+                days ^= {day}
+            elif day in days:
+                HabitCheckIn.objects.filter(habit=self.habit, date=day).delete()
+                days.discard(day)
+            else:
+                HabitCheckIn.objects.create(habit=self.habit, date=day)
+                days.add(day)
+
+            # Today, and later days as the window slides forward
+            for later in (0, 3, 9):
+                reference = self.today + timedelta(days=later)
+                for window in goals.GOAL_WINDOWS:
+                    expected = sum(
+                        1 for done in days
+                        if 0 <= (reference - done).days < window
+                    )
+                    self.assertEqual(self.progress(reference, window), expected)
+
+        self.assertEqual(goals.recompute(), 0)
+
+    def test_recompute_command_repairs_drift(self):
+        HabitCheckIn.objects.create(habit=self.habit, date=self.today)
+        Habit.objects.filter(id=self.habit.id).update(recent_mask=0)
+
+        out = StringIO()
+        call_command("recompute_habit_goals", stdout=out)
+
+        self.assertIn("1 habits had drifted", out.getvalue())
+        self.assertEqual(self.progress(self.today, 7), 1)
+
+    def test_dashboard_and_toggle_show_progress(self):
+        HabitCheckIn.objects.create(habit=self.habit, date=self.today - timedelta(days=1))
+
+        response = self.client.get(reverse("dashboard"))
+        self.assertContains(response, "1/3 in the last 7 days")
+
+        data = self.client.post(reverse("toggle_habit_json", args=[self.habit.id])).json()
+        self.assertEqual(data["goal"], {"done": 2, "target": 3, "days": 7, "met": False})
+
+    def test_goals_add_no_dashboard_queries(self):
+        def count_queries():
+            dashboard_cache.get_cache().clear()
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get(reverse("dashboard"))
+            return len(ctx.captured_queries)
+
+        without_goals = count_queries()
+        Habit.objects.bulk_create(
+            Habit(name=f"Goal {i}", user=get_demo_user(), goal_count=2, goal_days=30)
+            for i in range(30)
+        )
+        self.assertEqual(count_queries(), without_goals)
+
+    def test_add_and_update_goal(self):
+        self.client.post(reverse("add_habit"), {
+            "name": "Read", "goal_count": "10", "goal_days": "30",
+        })
+        habit = Habit.objects.get(name="Read")
+        self.assertEqual((habit.goal_count, habit.goal_days), (10, 30))
+
+        url = reverse("update_goal", args=[habit.id])
+        self.assertEqual(self.client.post(url, {"goal_count": "8", "goal_days": "7"}).status_code, 400)
+        self.assertEqual(self.client.post(url, {"goal_days": "7"}).status_code, 302)
+        habit.refresh_from_db()
+        self.assertIsNone(habit.goal_count)
+
+
+class DailySummaryTests(TestCase):
+    """
+    Tests for the per-user daily summary of the dashboard header.
+    """
+
+    def setUp(self):
+        dashboard_cache.get_cache().clear()
+        self.today = date.today()
+        self.user = get_demo_user()
+        self.habit = Habit.objects.create(name="Read", user=self.user)
+
+    def stored(self, day=None):
+        row = DailySummary.objects.for_day(self.user.id, day or self.today)
+        return {field: getattr(row, field) for field in summary.SUMMARY_FIELDS}
+
+    def live(self, day=None):
+        counts = summary.source_counts(day or self.today, [self.user.id])
+        return {field: counts[field].get(self.user.id, 0) for field in counts}
+
+    def test_signals_keep_summary_in_sync(self):
+        rng = random.Random(18)
+        book = Book.objects.create(title="Deep Work", goal="focus", mood="calm")
+        userbook = UserBook.objects.create(user=self.user, book=book)
+        other = Habit.objects.create(name="Walk", user=self.user)
+        now = timezone.now()
+
+        for _ in range(60):
+            action = rng.randrange(6)
+            if action == 0:
+                record_completion(rng.choice([self.habit, other]), self.today)
+            elif action == 1:
+                apply_checkins([{
+                    "habit_id": other.id,
+                    "date": self.today.isoformat(),
+                    "completed": rng.random() < 0.5,
+                }])
+            elif action == 2:
+                Todo.objects.create(title="Task", user=self.user)
+            elif action == 3:
+                todo = Todo.objects.filter(user=self.user).order_by("?").first()
+                if todo is not None:
+                    if rng.random() < 0.5:
+                        todo.delete()
+                    else:
+                        todo.is_done = not todo.is_done
+                        todo.save()
+            elif action == 4:
+                session = PomodoroSession.objects.create(
+                    user=self.user, started_at=now, duration_seconds=rng.choice([300, 1500])
+                )
+                session.status = rng.choice(["completed", "stopped"])
+                session.save()
+            else:
+                userbook.status = rng.choice(["want", "reading", "finished"])
+                userbook.save()
+
+            self.assertEqual(self.stored(), self.live())
+
+        self.assertEqual(summary.reconcile(self.today), 0)
+
+    def test_deleted_habits_stop_counting(self):
+        yesterday = self.today - timedelta(days=1)
+        for day in (yesterday, self.today):
+            HabitCheckIn.objects.create(habit=self.habit, date=day)
+        self.assertEqual(self.stored()["habits_completed"], 1)
+        self.assertEqual(self.stored(yesterday)["habits_completed"], 1)
+
+        self.habit.soft_delete()
+        self.assertEqual(self.stored()["habits_completed"], 0)
+        self.assertEqual(self.stored(yesterday)["habits_completed"], 0)
+
+        # Purging the deleted habit changes nothing
+        purge_habit(self.habit.id)
+        self.assertEqual(self.stored()["habits_completed"], 0)
+
+    def test_deleting_a_user_leaves_no_rows_behind(self):
+        user = get_user_model().objects.create(username="leaving")
+        habit = Habit.objects.create(name="Run", user=user)
+        HabitCheckIn.objects.create(habit=habit, date=self.today)
+        Todo.objects.create(title="Task", user=user)
+        PomodoroSession.objects.create(user=user, status="completed")
+
+        user_id = user.id
+        user.delete()
+        self.assertFalse(DailySummary.objects.filter(user_id=user_id).exists())
+
+    def test_gauges_carry_over_to_later_days(self):
+        yesterday = self.today - timedelta(days=1)
+        Todo.objects.create(title="Task", user=self.user)
+        DailySummary.objects.filter(user=self.user).update(date=yesterday)
+
+        # No row for today yet: the gauges still hold, the counters start over
+        HabitCheckIn.objects.create(habit=self.habit, date=yesterday)
+        self.assertEqual(self.stored(), {
+            "habits_completed": 0,
+            "focus_seconds": 0,
+            "open_todos": 1,
+            "books_reading": 0,
+        })
+
+    def test_reconcile_command_repairs_drift(self):
+        HabitCheckIn.objects.create(habit=self.habit, date=self.today)
+        Todo.objects.bulk_create([Todo(title="Imported", user=self.user)])
+
+        out = StringIO()
+        call_command("reconcile_daily_summaries", stdout=out)
+        self.assertIn("1 users had drifted", out.getvalue())
+        self.assertEqual(self.stored(), self.live())
+
+    def test_dashboard_reads_one_summary_row(self):
+        HabitCheckIn.objects.create(habit=self.habit, date=self.today)
+        Todo.objects.create(title="Task", user=self.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("dashboard"))
+        summary_queries = [
+            query for query in queries
+            if "habits_dailysummary" in query["sql"]
+        ]
+        self.assertEqual(len(summary_queries), 1)
+        self.assertContains(response, "1 habits done")
+        self.assertContains(response, "1 open to-dos")
+
+
+class RolloverTests(TestCase):
+    """
+    Tests for the day rollover job.
+    """
+
+    def setUp(self):
+        dashboard_cache.get_cache().clear()
+        self.today = date.today()
+        self.user = get_demo_user()
+
+    def test_new_day_is_prepared(self):
+        tomorrow = self.today + timedelta(days=1)
+        kept = Habit.objects.create(name="Read", user=self.user)
+        broken = Habit.objects.create(name="Walk", user=self.user)
+        for habit in (kept, broken):
+            HabitCheckIn.objects.create(habit=habit, date=self.today - timedelta(days=1))
+        HabitCheckIn.objects.create(habit=kept, date=self.today)
+        Todo.objects.create(title="Task", user=self.user)
+
+        out = StringIO()
+        call_command(
+            "roll_over_day", "--date", tomorrow.isoformat(), "--workers", "1",
+            stdout=out, stderr=StringIO(),
+        )
+        self.assertIn("for 1 users", out.getvalue())
+        self.assertIn("1 streaks broken", out.getvalue())
+
+        # Missed yesterday: broken for tomorrow, still alive otherwise
+        self.assertEqual(Streak.objects.get(habit=broken).count, 0)
+        self.assertEqual(Streak.objects.get(habit=kept).count, 2)
+
+        row = DailySummary.objects.get(user=self.user, date=tomorrow)
+        self.assertEqual(row.habits_completed, 0)
+        self.assertEqual(row.open_todos, 1)
+
+        # The dashboard of the new day is served from the cache
+        dashboard_cache.stats.clear()
+        dashboard_cache.get_or_build(
+            tomorrow, dashboard_cache.user_scopes(self.user.id), dict
+        )
+        self.assertEqual(dashboard_cache.stats["hits"], 1)
+
+    def test_rollover_is_idempotent(self):
+        # Two days later the streak of today's completion is broken
+        day = self.today + timedelta(days=2)
+        habit = Habit.objects.create(name="Read", user=self.user)
+        HabitCheckIn.objects.create(habit=habit, date=self.today)
+        Todo.objects.create(title="Task", user=self.user)
+
+        first = rollover.roll_over(day, workers=1)
+        second = rollover.roll_over(day, workers=1)
+
+        self.assertEqual(first["streaks_broken"], 1)
+        self.assertEqual(first["summaries_created"], 1)
+        self.assertEqual(second["users"], 1)
+        for key in ("streaks_broken", "summaries_created", "sections_warmed"):
+            self.assertEqual(second[key], 0)
+
+    def test_respects_schedules(self):
+        # Due today and three days later: alive until that day is over
+        weekday = self.today.weekday()
+        habit = Habit.objects.create(
+            name="Gym",
+            user=self.user,
+            schedule=schedule.from_weekdays([weekday, (weekday + 3) % 7]),
+        )
+        HabitCheckIn.objects.create(habit=habit, date=self.today)
+
+        rollover.roll_over(self.today + timedelta(days=3), workers=1)
+        self.assertEqual(Streak.objects.get(habit=habit).count, 1)
+
+        rollover.roll_over(self.today + timedelta(days=4), workers=1)
+        self.assertEqual(Streak.objects.get(habit=habit).count, 0)
+
+
+class ParallelRolloverTests(TransactionTestCase):
+    """
+    Rollovers spread over a process pool. The worker processes read
+    the file-backed test database, so the data must be committed.
+    """
+
+    def test_pool_prepares_every_partition(self):
+        today = date.today()
+        day = today + timedelta(days=2)
+        users = [
+            get_user_model().objects.create(username=f"user-{i}") for i in range(5)
+        ]
+        for user in users:
+            habit = Habit.objects.create(name="Read", user=user)
+            HabitCheckIn.objects.create(habit=habit, date=today)
+
+        report = rollover.roll_over(
+            day, user_ids=[user.id for user in users], workers=2, partition_size=2
+        )
+
+        self.assertEqual(report["users"], 5)
+        self.assertEqual(report["streaks_broken"], 5)
+        self.assertEqual(report["summaries_created"], 5)
+        self.assertFalse(Streak.objects.exclude(count=0).exists())
+        self.assertEqual(DailySummary.objects.filter(date=day).count(), 5)
+
+
+class HabitOwnershipTests(TestCase):
+    """
+    Tests for per-user habit ownership.
+    """
+
+    def setUp(self):
+        dashboard_cache.get_cache().clear()
+        User = get_user_model()
+        self.alice = User.objects.create_user("alice", password="secret")
+        self.bob = User.objects.create_user("bob", password="secret")
+        self.mine = Habit.objects.create(name="Alice habit", user=self.alice)
+        self.theirs = Habit.objects.create(name="Bob habit", user=self.bob)
+        self.client.force_login(self.alice)
+
+    def test_dashboard_lists_own_habits_only(self):
+        create_habits(5, [date.today()], user=self.bob)
+
+        response = self.client.get(reverse("dashboard"))
+
+        self.assertContains(response, "Alice habit")
+        self.assertNotContains(response, "Bob habit")
+        self.assertEqual(
+            ids(response.context["habits"]),
+            [self.mine.id],
+        )
+        self.assertEqual(response.context["completed_today"], set())
+
+    def test_anonymous_requests_use_demo_user(self):
+        self.client.logout()
+        demo = Habit.objects.create(name="Demo habit", user=get_demo_user())
+
+        response = self.client.get(reverse("dashboard"))
+
+        self.assertEqual(ids(response.context["habits"]), [demo.id])
+
+    def test_foreign_habits_cannot_be_written(self):
+        for name in ("toggle_habit", "toggle_habit_json", "delete_habit"):
+            response = self.client.post(reverse(name, args=[self.theirs.id]))
+            self.assertEqual(response.status_code, 404)
+
+        response = self.client.post(
+            reverse("bulk_checkins"),
+            data=json.dumps({"checkins": [
+                {"habit_id": self.theirs.id, "date": date.today().isoformat()},
+            ]}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.json()["results"][0]["error"], "unknown habit")
+
+        self.assertTrue(Habit.objects.filter(id=self.theirs.id).exists())
+        self.assertFalse(HabitCheckIn.objects.filter(habit=self.theirs).exists())
+
+    def test_new_habits_belong_to_current_user(self):
+        self.client.post(reverse("add_habit"), {"name": "Stretch"})
+
+        self.assertEqual(Habit.objects.get(name="Stretch").user, self.alice)
+
+    def test_other_users_writes_keep_cache_warm(self):
+        self.client.get(reverse("dashboard"))
+        dashboard_cache.stats.clear()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            HabitCheckIn.objects.create(habit=self.theirs, date=date.today())
+            Habit.objects.create(name="Another Bob habit", user=self.bob)
+        self.client.get(reverse("dashboard"))
+
+        self.assertEqual(dashboard_cache.stats["hits"], 1)
+
+    def test_listing_uses_owner_index(self):
+        queryset = (
+            Habit.objects
+            .filter(user=self.alice)
+            .order_by("created_at", "id")
+        )
+
+        self.assertIn("habit_user_created_idx", queryset.explain())
+
+
+class HeatmapTests(TestCase):
+    """
+    Tests for the run-length encoded heatmap endpoint.
+    """
+
+    def setUp(self):
+        self.habit = Habit.objects.create(name="Piano", user=get_demo_user())
+        self.end = date(2025, 1, 10)
+        self.start = date(2024, 12, 25)
+        self.days = [
+            date(2024, 12, 25), date(2024, 12, 26),
+            date(2024, 12, 31), date(2025, 1, 1), date(2025, 1, 2),
+            date(2025, 1, 10),
+        ]
+        for day in self.days:
+            HabitCheckIn.objects.create(habit=self.habit, date=day)
+
+    def get(self, **headers):
+        return self.client.get(
+            reverse("habit_heatmap"),
+            {"start": self.start.isoformat(), "end": self.end.isoformat()},
+            **headers,
+        )
+
+    def test_runs_span_year_boundary(self):
+        stranger = get_user_model().objects.create_user("stranger")
+        other = Habit.objects.create(name="Foreign", user=stranger)
+        HabitCheckIn.objects.create(habit=other, date=self.end)
+
+        data = self.get().json()
+
+        self.assertEqual(data["start"], "2024-12-25")
+        self.assertEqual(data["habits"], [{
+            "habit_id": self.habit.id,
+            "name": "Piano",
+            "completed": 6,
+            "runs": [[0, 2], [6, 3], [16, 1]],
+        }])
+
+    def test_matching_etag_returns_304_without_reading_history(self):
+        etag = self.get()["ETag"]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(any(
+            "habits_habitcheckin" in query["sql"] or "habits_habityear" in query["sql"]
+            for query in queries.captured_queries
+        ))
+
+    def test_history_changes_update_etag(self):
+        etag = self.get()["ETag"]
+
+        self.client.post(reverse("toggle_habit", args=[self.habit.id]))
+        toggled = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(toggled.status_code, 200)
+        self.assertNotEqual(toggled["ETag"], etag)
+
+        apply_checkins([{"habit_id": self.habit.id, "date": "2025-01-05"}])
+        bulk = self.get(HTTP_IF_NONE_MATCH=toggled["ETag"])
+        self.assertEqual(bulk.status_code, 200)
+        self.assertIn([11, 1], bulk.json()["habits"][0]["runs"])
+
+    def test_bitmap_backfill_updates_etag(self):
+        other = Habit.objects.create(name="Violin", user=self.habit.user)
+        etag = self.get()["ETag"]
+
+        call_command("backfill_habit_years", stdout=StringIO())
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        # Streaks and goal windows are not part of the heatmap
+        for command in ("rebuild_streaks", "recompute_habit_goals"):
+            call_command(command, stdout=StringIO())
+            self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 304, command)
+
+        # Only the selected habits are revalidated
+        versions = dict(Habit.objects.values_list("id", "history_version"))
+        call_command("backfill_habit_years", str(other.id), stdout=StringIO())
+        self.assertEqual(
+            dict(Habit.objects.values_list("id", "history_version")),
+            {**versions, other.id: versions[other.id] + 1},
+        )
+
+    def test_rejects_invalid_ranges(self):
+        for params in (
+            {"start": "2025-02-01", "end": "2025-01-01"},
+            {"start": "2000-01-01", "end": "2025-01-01"},
+            {"end": "tomorrow"},
+            {"habit": "x"},
+        ):
+            response = self.client.get(reverse("habit_heatmap"), params)
+            self.assertEqual(response.status_code, 400)
+
+
+class HabitPurgeTests(TestCase):
+    """
+    Tests for soft deletion and the batched purge job.
+    """
+
+    def setUp(self):
+        self.user = get_demo_user()
+        self.habit = Habit.objects.create(name="Guitar", user=self.user)
+        self.today = date.today()
+        for offset in range(12):
+            HabitCheckIn.objects.create(
+                habit=self.habit, date=self.today - timedelta(days=offset * 2)
+            )
+        self.session = PomodoroSession.objects.create(user=self.user, habit=self.habit)
+
+    def test_delete_view_hides_habit_immediately(self):
+        dashboard_cache.get_cache().clear()
+        self.client.get(reverse("dashboard"))
+
+        with (
+            override_settings(HABIT_PURGE_IN_BACKGROUND=False),
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            response = self.client.post(reverse("delete_habit", args=[self.habit.id]))
+
+        self.assertRedirects(response, reverse("dashboard"))
+        self.assertFalse(Habit.objects.filter(id=self.habit.id).exists())
+        self.assertNotContains(self.client.get(reverse("dashboard")), "Guitar")
+
+        # The data is still there until the purge job runs
+        self.assertTrue(Habit.all_objects.filter(id=self.habit.id).exists())
+        self.assertEqual(HabitCheckIn.objects.filter(habit_id=self.habit.id).count(), 12)
+
+        response = self.client.post(reverse("toggle_habit", args=[self.habit.id]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_purge_removes_dependents_in_batches(self):
+        self.habit.soft_delete()
+
+        steps = list(purge_batches(self.habit.id, batch_size=5))
+
+        self.assertTrue(all(rows <= 5 for _, rows in steps))
+        self.assertEqual(
+            [rows for label, rows in steps if label == "habits.HabitCheckIn"],
+            [5, 5, 2],
+        )
+        self.assertEqual(steps[-1], ("habits.Habit", 1))
+
+        self.assertFalse(Habit.all_objects.filter(id=self.habit.id).exists())
+        for model in (HabitCheckIn, HabitYear, HabitRun, Streak, DailyRollup):
+            self.assertFalse(model.objects.filter(habit_id=self.habit.id).exists())
+        self.session.refresh_from_db()
+        self.assertIsNone(self.session.habit_id)
+
+    def test_purge_ignores_habits_in_use(self):
+        self.assertEqual(purge_habit(self.habit.id), 0)
+        self.assertEqual(HabitCheckIn.objects.filter(habit=self.habit).count(), 12)
+
+    def test_command_drains_pending_purges(self):
+        other = Habit.objects.create(name="Drums", user=self.user)
+        HabitCheckIn.objects.create(habit=other, date=self.today)
+        self.habit.soft_delete()
+        other.soft_delete()
+
+        out = StringIO()
+        call_command("purge_deleted_habits", "--batch-size", "3", stdout=out)
+
+        self.assertIn("Purged 2 deleted habits", out.getvalue())
+        self.assertFalse(Habit.all_objects.exists())
+        self.assertFalse(HabitCheckIn.objects.exists())
+
+
+class FocusCheckInTests(TestCase):
+    """
+    Tests for the automatic check-ins of completed focus sessions.
+    """
+
+    def setUp(self):
+        self.user = get_demo_user()
+        self.other = get_user_model().objects.create(username="other")
+        self.reading, self.writing = create_habits(2, user=self.user)
+        self.now = timezone.now()
+        self.started = self.now - timedelta(hours=1)
+        self.today = timezone.localdate(self.started)
+
+    def running(self, user, habit=None, duration=pomodoro_services.DEFAULT_DURATION):
+        """Helper: a running session that expired before now."""
+        return PomodoroSession.objects.create(
+            user=user, habit=habit, status="running",
+            started_at=self.started, duration_seconds=duration,
+        )
+
+    def completed(self, habit=None, duration=pomodoro_services.DEFAULT_DURATION, user=None):
+        """Helper: a session completed outside the sweeper."""
+        return PomodoroSession.objects.create(
+            user=user or self.user, habit=habit, status="completed",
+            started_at=self.started, ended_at=self.now, duration_seconds=duration,
+        )
+
+    def checkin_inserts(self, ctx):
+        """Helper: the check-in INSERT queries captured by `ctx`."""
+        return [
+            query for query in ctx.captured_queries
+            if query["sql"].startswith("INSERT")
+            and 'INTO "habits_habitcheckin"' in query["sql"]
+        ]
+
+    def checked_in(self):
+        return set(
+            HabitCheckIn.objects.filter(completed=True).values_list("habit_id", "date")
+        )
+
+    def test_sweeper_checks_in_linked_habits(self):
+        other_habit = Habit.objects.create(name="Running", user=self.other)
+        self.running(self.user, self.reading)
+        self.running(self.other, other_habit)
+
+        with CaptureQueriesContext(connection) as ctx:
+            pomodoro_services.complete_expired(self.now)
+        inserts = self.checkin_inserts(ctx)
+
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            self.checked_in(),
+            {(self.reading.id, self.today), (other_habit.id, self.today)},
+        )
+        self.assertEqual(Streak.objects.get(habit=self.reading).count, 1)
+        self.assertFalse(PomodoroSession.objects.pending_checkin().exists())
+
+    def test_batch_groups_sessions_by_habit_and_day(self):
+        for _ in range(3):
+            self.completed(self.reading)
+        self.completed(self.writing)
+        # Too short, no habit, another user's habit
+        self.completed(self.writing, duration=60)
+        self.completed()
+        self.completed(self.writing, user=self.other)
+
+        with CaptureQueriesContext(connection) as ctx:
+            processed, created = focus.apply_focus_checkins()
+        inserts = self.checkin_inserts(ctx)
+
+        self.assertEqual((processed, created), (7, 2))
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            self.checked_in(),
+            {(self.reading.id, self.today), (self.writing.id, self.today)},
+        )
+        self.assertEqual(Streak.objects.get(habit=self.writing).count, 1)
+
+        # Every session is processed once
+        self.assertEqual(focus.apply_focus_checkins(), (0, 0))
+
+    def test_removed_checkin_is_not_restored(self):
+        self.completed(self.reading)
+        focus.apply_focus_checkins()
+        apply_checkins([
+            {"habit_id": self.reading.id, "date": self.today.isoformat(), "completed": False}
+        ])
+
+        self.completed(self.writing)
+        focus.apply_focus_checkins()
+
+        self.assertEqual(self.checked_in(), {(self.writing.id, self.today)})
+
+    def test_minimum_is_configurable(self):
+        self.completed(self.reading, duration=600)
+
+        with override_settings(POMODORO_CHECKIN_MIN_SECONDS=600):
+            self.assertEqual(focus.apply_focus_checkins(), (1, 1))
+
+    def test_deleted_habit_gets_no_checkin(self):
+        self.completed(self.reading)
+        self.reading.soft_delete()
+
+        self.assertEqual(focus.apply_focus_checkins(), (1, 0))
+        self.assertFalse(HabitCheckIn.objects.exists())
+
+    def test_command_processes_in_batches(self):
+        for habit in (self.reading, self.writing, self.reading):
+            self.completed(habit)
+        self.completed(self.writing, duration=600)
+        PomodoroSession.objects.filter(id=self.completed(self.writing).id).update(
+            started_at=self.started - timedelta(days=1)
+        )
+
+        with CaptureQueriesContext(connection) as ctx:
+            out = StringIO()
+            call_command("apply_focus_checkins", "--batch-size", "2", "--minimum", "600", stdout=out)
+        inserts = self.checkin_inserts(ctx)
+
+        # Batches of two: the third holds only the previous day
+        self.assertIn("Processed 5 sessions, 3 new check-ins", out.getvalue())
+        self.assertEqual(len(inserts), 2)
+        self.assertFalse(PomodoroSession.objects.pending_checkin().exists())
+
+    def test_pending_lookup_uses_the_partial_index(self):
+        queryset = PomodoroSession.objects.pending_checkin().filter(user=self.user)
+
+        self.assertIn("pomodoro_pending_checkin_idx", queryset.explain())
+
+
+class CompletionConcurrencyTests(TransactionTestCase):
+    """
+    Stress tests for the completion service.
+
+    Runs many completions in parallel threads against the file-backed
+    test database (every thread has its own connection) and checks
+    that the check-ins and all derived data end up consistent.
+    """
+
+    workers = 8
+
+    def setUp(self):
+        self.habit = Habit.objects.create(name="Swim", user=get_demo_user())
+        self.today = date.today()
+
+    def run_parallel(self, calls):
+        def run(args):
+            try:
+                return record_completion(self.habit, *args)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(run, calls))
+
+    def assert_consistent(self, days):
+        days = sorted(days)
+        self.assertEqual(
+            sorted(HabitCheckIn.objects.filter(habit=self.habit).values_list("date", flat=True)),
+            days,
+        )
+        start = self.today - timedelta(days=365)
+        self.assertEqual(
+            HabitYear.objects.count_completed(self.habit.id, start, self.today),
+            len(days),
+        )
+        rollup = DailyRollup.objects.filter(habit=self.habit).order_by("-date").first()
+        self.assertEqual(rollup.total if rollup else 0, len(days))
+
+        streak = Streak.objects.get(habit=self.habit)
+        self.assertEqual(
+            (streak.count, streak.longest_streak),
+            (len(days), len(days)) if days else (0, 0),
+        )
+
+    def test_parallel_completions_create_one_checkin(self):
+        results = self.run_parallel([(self.today, True)] * 32)
+
+        self.assertEqual(sum(result.changed for result in results), 1)
+        self.assertTrue(all(result.completed for result in results))
+        self.assert_consistent([self.today])
+
+    def test_parallel_toggles_are_serialized(self):
+        results = self.run_parallel([(self.today,)] * 25)
+
+        self.assertTrue(all(result.changed for result in results))
+        self.assertEqual(sum(result.completed for result in results), 13)
+        self.assert_consistent([self.today])
+
+    def test_parallel_days_build_one_streak(self):
+        days = [self.today - timedelta(days=offset) for offset in range(30)]
+        calls = [(day, True) for day in days] * 2
+        random.Random(1).shuffle(calls)
+
+        results = self.run_parallel(calls)
+
+        self.assertEqual(sum(result.changed for result in results), 30)
+        self.assertEqual(
+            list(HabitRun.objects.filter(habit=self.habit).values_list("length", flat=True)),
+            [30],
+        )
+        self.assert_consistent(days)
@@ -5,6 +5,11 @@ from . import views
 urlpatterns = [
     path("", views.dashboard, name="dashboard"),
     path("toggle/<int:habit_id>/", views.toggle_habit, name="toggle_habit"),
+    path("toggle/<int:habit_id>/json/", views.toggle_habit_json, name="toggle_habit_json"),
     path("add/", views.add_habit, name="add_habit"),
+    path("schedule/<int:habit_id>/", views.update_schedule, name="update_schedule"),
+    path("goal/<int:habit_id>/", views.update_goal, name="update_goal"),
     path("delete/<int:habit_id>/", views.delete_habit, name="delete_habit"),
+    path("checkins/bulk/", views.bulk_checkins, name="bulk_checkins"),
+    path("heatmap/", views.habit_heatmap, name="habit_heatmap"),
 ]
@@ -0,0 +1,25 @@
+"""
+Resolve the user whose data a request works on.
+"""
+
+from django.contrib.auth import get_user_model
+
+# Username of the shared account used in no-login mode
+DEMO_USERNAME = "demo"
+
+
+def get_demo_user():
+    """The shared demo user (created on first use)."""
+    demo_user, _ = get_user_model().objects.get_or_create(username=DEMO_USERNAME)
+    return demo_user
+
+
+def get_current_user(request):
+    """
+    The logged-in user, or the shared demo user in no-login mode.
+
+    All habit data is scoped to the returned user.
+    """
+    if request.user.is_authenticated:
+        return request.user
+    return get_demo_user()
@@ -1,14 +1,27 @@
+from django.db import transaction
+from django.db.models import BooleanField, Exists, ExpressionWrapper, F, OuterRef, Q
+from django.http import Http404, HttpResponseBadRequest, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import condition, require_GET, require_POST
 
 from datetime import date, timedelta
 import calendar
-
-from streaks.models import Streak
-from .models import Habit, HabitCheckIn
+import hashlib
+import json
+
+from .models import DailySummary, Habit, HabitCheckIn
+from . import cache as dashboard_cache
+from . import goals
+from .calendar_data import build_bitmap_calendar, build_month_calendar
+from .idempotency import idempotent
+from .purge import schedule_purge
+from .rows import WeeklyRow, book_rows, habit_rows
+from .schedule import EVERY_DAY, WEEKDAY_NAMES, from_weekdays, is_scheduled, weekday_bit
+from .services import MAX_BULK_ENTRIES, apply_checkins, record_completion
+from .users import get_current_user
 
 from books.models import UserBook
-from pomodoro.models import PomodoroSession
+from pomodoro import services as pomodoro_services
 
 
 def dashboard(request):
@@ -17,46 +30,128 @@ def dashboard(request):
 
     Renders the central dashboard page of the application.
     Combines multiple features into a single overview:
-    - habit tracking (open vs. completed today)
+    - habit tracking (open vs. completed today, plus habits whose
+      weekday schedule does not include today)
     - active pomodoro session
     - reading progress preview
     - weekly habit consistency matrix
-    """
-
-    # --------------------------------------------------
-    # Habit data
-    # --------------------------------------------------
+    - summary of the day in the header
 
-    # Fetch all habits
-    habits = Habit.objects.all()
+    All habit and reading data belongs to the current user (the demo
+    user in no-login mode). These sections are served from a versioned
+    per-user cache (see habits.cache) and only recomputed after
+    relevant writes.
+    """
 
     # Today's date
     today = date.today()
+    user = get_current_user(request)
 
     # --------------------------------------------------
     # Pomodoro timer
     # --------------------------------------------------
 
-    # Retrieve the currently running pomodoro session (if any)
+    # Retrieve the running or paused pomodoro session (if any).
+    # Not cached: its remaining time changes every second.
     active_pomodoro = None
     if request.user.is_authenticated:
-        active_pomodoro = (
-            PomodoroSession.objects
-            .filter(user=request.user, status="running")
-            .order_by("-started_at")
-            .first()
-        )
+        active_pomodoro = pomodoro_services.current_session(request.user)
 
     # --------------------------------------------------
-    # Habits completed today
+    # Daily summary
+    # --------------------------------------------------
+
+    # One indexed lookup of a row kept up to date by signal handlers
+    # (see habits.summary), so it is not cached either
+    summary = DailySummary.objects.for_day(user.id, today)
+
+    # --------------------------------------------------
+    # Cached sections
+    # --------------------------------------------------
+
+    sections = dashboard_cache.get_or_build(
+        today,
+        dashboard_cache.user_scopes(user.id),
+        lambda: build_dashboard_sections(today, user),
+    )
+
+    # --------------------------------------------------
+    # Template context
     # --------------------------------------------------
 
-    # Collect IDs of habits that were completed today
-    completed_today = {
-        checkin.habit_id
-        for checkin in HabitCheckIn.objects.filter(date=today)
+    context = {
+        **sections,
+
+        # Pomodoro data
+        "active_pomodoro": active_pomodoro,
+
+        # Header information
+        "today": today,
+        "weekday": calendar.day_name[today.weekday()],
+        "summary": summary,
+
+        # Weekday checkboxes of the add form
+        "weekday_choices": list(enumerate(WEEKDAY_NAMES)),
     }
 
+    return render(
+        request,
+        "habits/dashboard.html",
+        context,
+    )
+
+
+def build_dashboard_sections(today, user):
+    """
+    Compute the cacheable dashboard sections of a user for the given day.
+
+    Returns a dict of template context entries. All querysets are
+    evaluated here, so the result can be stored in the cache.
+    """
+
+    # --------------------------------------------------
+    # Habit data
+    # --------------------------------------------------
+
+    # Fetch the columns the dashboard shows of the user's habits,
+    # together with their streak (if any), as lightweight rows (see
+    # habits.rows). The streak is joined in the same query.
+    # The (user, created_at) index serves filter and order.
+    # Every habit is annotated with whether it is due today (its
+    # schedule has today's weekday bit) and whether it is done today.
+    habit_qs = (
+        Habit.objects
+        .filter(user=user)
+        .alias(today_bit=F("schedule").bitand(weekday_bit(today)))
+        .annotate(
+            due_today=ExpressionWrapper(
+                Q(today_bit__gt=0), output_field=BooleanField()
+            ),
+            done_today=Exists(
+                HabitCheckIn.objects.filter(
+                    habit=OuterRef("pk"), date=today, completed=True
+                )
+            ),
+        )
+        .order_by("created_at", "id")
+    )
+
+    # The Open/Completed split is filtered in the database: Open holds
+    # the habits due today (bitwise test of today's weekday bit) that
+    # are not done yet. Habits off schedule today are listed apart;
+    # completing them on such a day is still allowed.
+    # Progress towards frequency goals comes from the sliding window
+    # stored on every habit row, so it costs no query at all.
+    open_habits = habit_rows(habit_qs.filter(due_today=True, done_today=False), today)
+    completed_habits = habit_rows(habit_qs.filter(done_today=True), today)
+    resting_habits = habit_rows(habit_qs.filter(due_today=False, done_today=False), today)
+
+    # All habits in creation order, for the weekly matrix
+    habits = sorted(
+        open_habits + completed_habits + resting_habits,
+        key=lambda habit: (habit.created_at, habit.id),
+    )
+
     # --------------------------------------------------
     # Monthly calendar data (currently not rendered in UI)
     # --------------------------------------------------
@@ -66,26 +161,19 @@ def dashboard(request):
     month = today.month
     days_in_month = calendar.monthrange(year, month)[1]
 
-    # Build a mapping: habit_id -> set of completed days in the month
-    habit_calendar = {}
-    for habit in habits:
-        checkins = HabitCheckIn.objects.filter(
-            habit=habit,
-            date__year=year,
-            date__month=month,
-        )
-        habit_calendar[habit.id] = {
-            checkin.date.day for checkin in checkins
-        }
+    # Per-habit day bitmasks for the whole month,
+    # fetched for all habits with a single query
+    habit_calendar = build_month_calendar(habit_qs, year, month)
 
     # --------------------------------------------------
     # Reading overview (books)
     # --------------------------------------------------
 
-    # Fetch the three most recently saved books
-    user_books = (
+    # Fetch the user's three most recently saved books (title and
+    # progress only, not the whole book)
+    user_books = book_rows(
         UserBook.objects
-        .select_related("book")
+        .filter(user=user)
         .order_by("-saved_at")[:3]
     )
 
@@ -98,84 +186,136 @@ def dashboard(request):
         today - timedelta(days=i)
         for i in range(6, -1, -1)
     ]
+    day_index = {day: i for i, day in enumerate(week_days)}
 
-    # Fetch all check-ins for the selected week
-    weekly_checkins = HabitCheckIn.objects.filter(
-        date__in=week_days
+    # One status list per habit: statuses[habit_id][i] is True
+    # if the habit was completed on week_days[i]
+    statuses = {habit.id: [False] * len(week_days) for habit in habits}
+
+    # Single pass over the user's check-ins of the week
+    weekly_checkins = (
+        HabitCheckIn.objects
+        .filter(habit__user=user, date__in=week_days, completed=True)
+        .values_list("habit_id", "date")
     )
+    for habit_id, day in weekly_checkins:
+        if habit_id in statuses:
+            statuses[habit_id][day_index[day]] = True
 
-    # Create a lookup dictionary for fast template access
-    # Key: (habit_id, date) -> True
-    weekly_checkin_map = {
-        (checkin.habit_id, checkin.date): True
-        for checkin in weekly_checkins
-    }
+    # Ready-made matrix rows: the template only iterates
+    weekly_rows = [WeeklyRow(habit, statuses[habit.id]) for habit in habits]
 
     # --------------------------------------------------
-    # Template context
+    # Habits completed today
     # --------------------------------------------------
 
-    context = {
+    # IDs of the habits completed today
+    completed_today = {habit.id for habit in completed_habits}
+
+    return {
         # Habit data
         "habits": habits,
+        "open_habits": open_habits,
+        "completed_habits": completed_habits,
+        "resting_habits": resting_habits,
         "completed_today": completed_today,
 
-        # Pomodoro data
-        "active_pomodoro": active_pomodoro,
-
         # Reading preview
         "user_books": user_books,
 
-        # Header information
-        "today": today,
-        "weekday": calendar.day_name[today.weekday()],
-
         # Calendar data
         "days_in_month": range(1, days_in_month + 1),
         "habit_calendar": habit_calendar,
 
         # Weekly matrix data
         "week_days": week_days,
-        "weekly_checkin_map": weekly_checkin_map,
+        "weekly_rows": weekly_rows,
     }
 
-    return render(
-        request,
-        "habits/dashboard.html",
-        context,
-    )
 
+def _requested_state(request):
+    """
+    Explicit target state from the `completed` field of a toggle
+    request: True/False, or None to flip the current state.
+    """
+    value = request.POST.get("completed", "").lower()
+    if not value:
+        return None
+    if value in ("true", "1", "on"):
+        return True
+    if value in ("false", "0", "off"):
+        return False
+    raise ValueError("completed must be true or false")
 
+
+@idempotent
 def toggle_habit(request, habit_id):
     """
     Action view: toggle today's completion state of a habit.
 
     If a check-in for today already exists, it is removed.
-    Otherwise, a new check-in is created and the habit's
-    streak is updated accordingly.
+    Otherwise, a new check-in is created. In both cases the
+    habit's streak is updated accordingly.
+
+    With a `completed` field (true/false) the state is set instead
+    of flipped, so a repeated submit does not undo itself. Requests
+    may carry an idempotency key (see habits.idempotency).
     """
 
-    habit = get_object_or_404(Habit, id=habit_id)
-    today = date.today()
+    habit = get_object_or_404(Habit, id=habit_id, user=get_current_user(request))
+    try:
+        completed = _requested_state(request)
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+
+    try:
+        record_completion(habit, date.today(), completed)
+    except Habit.DoesNotExist:
+        # Deleted since it was looked up
+        raise Http404("habit was deleted")
 
-    # Check whether the habit was already completed today
-    checkin = HabitCheckIn.objects.filter(
-        habit=habit,
-        date=today,
-    ).first()
+    return redirect("dashboard")
 
-    if checkin:
-        # Undo completion for today
-        checkin.delete()
-    else:
-        # Mark habit as completed today
-        HabitCheckIn.objects.create(habit=habit, date=today)
 
-        # Ensure streak exists and update it
-        streak, _ = Streak.objects.get_or_create(habit=habit)
-        streak.update_streak()
+@require_POST
+@idempotent
+def toggle_habit_json(request, habit_id):
+    """
+    JSON variant of toggle_habit used by the dashboard script.
+
+    Instead of redirecting to the dashboard (which re-runs all of
+    its queries), it only returns the delta the page needs to patch
+    itself: the new completion state, the updated streak numbers and
+    today's cell of the weekly matrix. Accepts the same `completed`
+    field and idempotency key as toggle_habit; `changed` tells
+    whether anything was written.
+    """
 
-    return redirect("dashboard")
+    habit = get_object_or_404(Habit, id=habit_id, user=get_current_user(request))
+    today = date.today()
+    try:
+        completed = _requested_state(request)
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    try:
+        result = record_completion(habit, today, completed)
+    except Habit.DoesNotExist:
+        # Deleted since it was looked up
+        return JsonResponse({"error": "habit was deleted"}, status=404)
+
+    return JsonResponse({
+        "habit_id": habit.id,
+        "completed": result.completed,
+        "changed": result.changed,
+        "due_today": is_scheduled(habit.schedule, today),
+        "streak": result.streak,
+        "goal": result.goal,
+        "week_cell": {
+            "date": today.isoformat(),
+            "completed": result.completed,
+        },
+    })
 
 
 @require_POST
@@ -184,12 +324,103 @@ def add_habit(request):
     Action view: create a new habit.
 
     Reads the habit name from POST data and creates
-    a new Habit object. Redirects back to the dashboard.
+    a new Habit object owned by the current user.
+    Optional `weekdays` values (0 = Monday ... 6 = Sunday) restrict
+    the days the habit is due on; without any it is due every day.
+    An optional `goal_count` and `goal_days` (7 or 30) set a frequency
+    goal. Redirects back to the dashboard.
     """
 
     name = request.POST.get("name")
+    try:
+        schedule = _requested_schedule(request)
+        goal_count, goal_days = _requested_goal(request)
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+
     if name:
-        Habit.objects.create(name=name)
+        Habit.objects.create(
+            name=name,
+            user=get_current_user(request),
+            schedule=schedule or EVERY_DAY,
+            goal_count=goal_count,
+            goal_days=goal_days,
+        )
+
+    return redirect("dashboard")
+
+
+def _requested_schedule(request):
+    """
+    Weekday schedule from the `weekdays` values of a form post
+    (0 if none were sent). Raises ValueError.
+    """
+    try:
+        return from_weekdays(request.POST.getlist("weekdays"))
+    except (TypeError, ValueError):
+        raise ValueError("weekdays must be numbers from 0 (Monday) to 6 (Sunday)")
+
+
+def _requested_goal(request):
+    """
+    Frequency goal from the `goal_count` and `goal_days` fields of a
+    form post: (count or None, days). Raises ValueError.
+    """
+    try:
+        goal_days = int(request.POST.get("goal_days") or goals.GOAL_WINDOWS[0])
+        goal_count = request.POST.get("goal_count")
+        goal_count = int(goal_count) if goal_count else None
+    except ValueError:
+        raise ValueError("goal_count and goal_days must be numbers")
+
+    if goal_days not in goals.GOAL_WINDOWS:
+        raise ValueError(f"goal_days must be one of {goals.GOAL_WINDOWS}")
+    if goal_count is not None and not 1 <= goal_count <= goal_days:
+        raise ValueError(f"goal_count must be between 1 and {goal_days}")
+    return goal_count, goal_days
+
+
+@require_POST
+def update_goal(request, habit_id):
+    """
+    Action view: set or remove the frequency goal of a habit.
+
+    Expects `goal_count` (empty to remove the goal) and `goal_days`
+    (7 or 30). Progress is available at once, since the sliding
+    window is kept for every habit. Redirects back to the dashboard.
+    """
+
+    habit = get_object_or_404(Habit, id=habit_id, user=get_current_user(request))
+    try:
+        habit.goal_count, habit.goal_days = _requested_goal(request)
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+    habit.save(update_fields=["goal_count", "goal_days"])
+
+    return redirect("dashboard")
+
+
+@require_POST
+def update_schedule(request, habit_id):
+    """
+    Action view: change the weekdays a habit is due on.
+
+    Expects one or more `weekdays` values (0 = Monday ... 6 = Sunday).
+    Saving the habit resyncs its streak for the new schedule (see
+    habits.signals.schedule_changed). Redirects back to the dashboard.
+    """
+
+    habit = get_object_or_404(Habit, id=habit_id, user=get_current_user(request))
+    try:
+        schedule = _requested_schedule(request)
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+    if not schedule:
+        return HttpResponseBadRequest("at least one weekday is required")
+
+    with transaction.atomic():
+        habit.schedule = schedule
+        habit.save(update_fields=["schedule"])
 
     return redirect("dashboard")
 
@@ -199,11 +430,144 @@ def delete_habit(request, habit_id):
     """
     Action view: delete a habit.
 
-    Removes the habit and all related data such as
-    check-ins and streaks. Redirects back to the dashboard.
+    Hides the habit immediately; its related data such as check-ins
+    and streaks is removed afterwards in small batches by the purge
+    job (see habits.purge). Redirects back to the dashboard.
     """
 
-    habit = get_object_or_404(Habit, id=habit_id)
-    habit.delete()
+    habit = get_object_or_404(Habit, id=habit_id, user=get_current_user(request))
+    habit.soft_delete()
+    schedule_purge(habit.id)
 
     return redirect("dashboard")
+
+
+@require_POST
+def bulk_checkins(request):
+    """
+    JSON endpoint: apply many check-in changes in one request.
+
+    Expects a JSON body like:
+    {"checkins": [{"habit_id": 1, "date": "2025-01-31", "completed": true}, ...]}
+
+    All entries are written in a single transaction with bulk
+    inserts/deletes, and streaks are updated once per affected habit.
+    Returns one result per entry, in request order. Habits of other
+    users are rejected like unknown habits.
+    """
+
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"error": "invalid JSON"}, status=400)
+
+    entries = payload.get("checkins") if isinstance(payload, dict) else None
+    if not isinstance(entries, list):
+        return JsonResponse({"error": "expected a 'checkins' list"}, status=400)
+
+    if len(entries) > MAX_BULK_ENTRIES:
+        return JsonResponse(
+            {"error": f"at most {MAX_BULK_ENTRIES} entries per request"},
+            status=400,
+        )
+
+    results = apply_checkins(entries, user=get_current_user(request))
+
+    return JsonResponse({
+        "results": [result.as_dict() for result in results],
+    })
+
+
+# Longest date range a single heatmap request may cover
+MAX_HEATMAP_DAYS = 10 * 366
+
+
+def _heatmap_params(request):
+    """
+    Parse and validate the query parameters of the heatmap endpoint.
+
+    Returns (habits, start, end), where `habits` is a queryset of the
+    requested habits of the current user. Raises ValueError.
+    """
+    try:
+        end = date.fromisoformat(request.GET.get("end") or date.today().isoformat())
+        start = date.fromisoformat(
+            request.GET.get("start") or (end - timedelta(days=364)).isoformat()
+        )
+    except ValueError:
+        raise ValueError("start and end must be ISO dates (YYYY-MM-DD)")
+
+    if start > end:
+        raise ValueError("start must not be after end")
+    if (end - start).days + 1 > MAX_HEATMAP_DAYS:
+        raise ValueError(f"at most {MAX_HEATMAP_DAYS} days per request")
+
+    try:
+        habit_ids = [int(value) for value in request.GET.getlist("habit")]
+    except ValueError:
+        raise ValueError("habit must be an integer")
+
+    habits = Habit.objects.filter(user=get_current_user(request)).order_by("id")
+    if habit_ids:
+        habits = habits.filter(id__in=habit_ids)
+    return habits, start, end
+
+
+def heatmap_etag(request):
+    """
+    ETag of a heatmap response.
+
+    Derived from the requested range and the history versions of the
+    requested habits, which the check-in signals bump on every change.
+    Computing it reads the habit rows only, never check-ins.
+    """
+    try:
+        habits, start, end = _heatmap_params(request)
+    except ValueError:
+        return None
+
+    versions = ",".join(
+        f"{habit_id}.{version}"
+        for habit_id, version in habits.values_list("id", "history_version")
+    )
+    key = f"{start}:{end}:{versions}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+@require_GET
+@condition(etag_func=heatmap_etag)
+def habit_heatmap(request):
+    """
+    JSON endpoint: year heatmap data for many habits.
+
+    Query parameters (all optional):
+    - start, end: date range (ISO dates, default: the last 365 days)
+    - habit: habit id, may be repeated (default: all habits)
+
+    Completed days are run-length encoded per habit as a list of
+    [offset, length] pairs relative to `start`. The data comes from
+    the year bitmaps (one row per habit and year), and repeat
+    requests with a matching If-None-Match header get a 304.
+    """
+
+    try:
+        habits, start, end = _heatmap_params(request)
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    habits = list(habits.values_list("id", "name"))
+    heatmap = build_bitmap_calendar([habit_id for habit_id, _ in habits], start, end)
+
+    return JsonResponse({
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "habits": [
+            {
+                "habit_id": habit_id,
+                "name": name,
+                "completed": heatmap.count(habit_id),
+                "runs": heatmap.runs(habit_id),
+            }
+            for habit_id, name in habits
+        ],
+    })
@@ -0,0 +1,59 @@
+"""
+Process pools of the batch jobs (day rollover, streak rebuild).
+
+Workers that are spawned instead of forked (e.g. forkserver, the
+Linux default from Python 3.14) unpickle their entry point before
+Django is set up. Entry points therefore live in modules that do not
+import any models at module level, like this one and
+streaks.workers, and import the job itself when they run.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.db import connections
+
+
+def partitions(ids, size):
+    """Split sorted ids into contiguous partitions of `size` ids."""
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def init_worker(database_name):
+    """
+    Process pool initializer: set up Django in a fresh worker.
+
+    Workers use the database of the parent process (which differs
+    from the configured one e.g. under tests).
+    """
+    django.setup()
+    connections["default"].settings_dict["NAME"] = database_name
+
+
+def process_pool(workers):
+    """A pool of `workers` processes on the database of this process."""
+    database_name = connections["default"].settings_dict["NAME"]
+
+    # Forked workers must not share the parent's open connections
+    connections.close_all()
+
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_worker,
+        initargs=(database_name,),
+    )
+
+
+def roll_over_partition(user_ids, day):
+    """
+    Process pool entry point: prepare one partition of users
+    (see habits.rollover).
+    """
+    from .rollover import roll_over_users
+
+    try:
+        return roll_over_users(user_ids, day)
+    finally:
+        # Do not leak one connection per finished task
+        connections.close_all()
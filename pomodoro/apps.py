@@ -10,3 +10,9 @@ from django.apps import AppConfig
 
 class PomodoroConfig(AppConfig):
     name = 'pomodoro' # The name of the Django app as referenced in INSTALLED_APPS
+
+    def ready(self):
+        """
+        Connect the publishers of live timer state.
+        """
+        from . import events  # noqa: F401
@@ -0,0 +1,158 @@
+"""
+Live timer state for all open clients of a user.
+
+Every open dashboard of a logged-in user holds one Server-Sent Events
+stream (see pomodoro.views.stream) and shows the timer state the
+server sends, so all tabs and devices agree on it. Streams are fed by
+the in-process `broker`: once a session write commits, the new state
+of the user's timer is published to every stream of that user, and no
+stream ever polls PomodoroSession.
+
+The broker lives in the memory of one process, so streams only see
+the changes written by the same process. Serve the app from a single
+ASGI process (e.g. `uvicorn config.asgi:application`). Completions
+need no event from the expiry sweeper: a stream knows when the
+running session it last sent is over (see `views.stream`).
+"""
+
+import asyncio
+import json
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import services
+from .models import PomodoroSession
+from .signals import sessions_completed
+
+
+class Broker:
+    """
+    Fan-out of events to the subscribers of a user.
+
+    Subscribers are callables; `publish` calls every subscriber of the
+    user with the event, in the publishing thread. Request threads
+    publish while streams subscribe from the event loop, so the
+    subscriber map is guarded by a lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, user_id, callback):
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(callback)
+
+    def unsubscribe(self, user_id, callback):
+        with self._lock:
+            callbacks = self._subscribers.get(user_id)
+            if callbacks is None:
+                return
+            callbacks.discard(callback)
+            if not callbacks:
+                del self._subscribers[user_id]
+
+    def publish(self, user_id, event):
+        """
+        Send `event` to the user's subscribers.
+
+        Returns the number of subscribers reached.
+        """
+        with self._lock:
+            callbacks = list(self._subscribers.get(user_id, ()))
+        for callback in callbacks:
+            callback(event)
+        return len(callbacks)
+
+    def __len__(self):
+        """Number of open subscriptions."""
+        with self._lock:
+            return sum(len(callbacks) for callbacks in self._subscribers.values())
+
+
+broker = Broker()
+
+
+class Subscription:
+    """
+    The subscription of one stream, used as an async context manager.
+
+    Events are full timer states, so only the latest one matters: a
+    slow client skips the states it missed instead of queueing them.
+    Events published from any thread are handed to the stream's event
+    loop.
+    """
+
+    def __init__(self, user_id, broker=broker):
+        self.user_id = user_id
+        self.broker = broker
+        self.loop = asyncio.get_running_loop()
+        self.latest = None
+        self.changed = asyncio.Event()
+
+    async def __aenter__(self):
+        self.broker.subscribe(self.user_id, self.deliver)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.broker.unsubscribe(self.user_id, self.deliver)
+
+    def deliver(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._set, event)
+        except RuntimeError:
+            # The stream's loop is closed, it unsubscribes right away
+            pass
+
+    def _set(self, event):
+        self.latest = event
+        self.changed.set()
+
+    async def next(self, timeout):
+        """
+        The next published state, or None after `timeout` seconds.
+        """
+        try:
+            await asyncio.wait_for(self.changed.wait(), timeout)
+        except TimeoutError:
+            return None
+        self.changed.clear()
+        return self.latest
+
+
+def encode(state):
+    """A timer state as a Server-Sent Events message."""
+    return f"data: {json.dumps(state)}\n\n"
+
+
+def publish_on_commit(user_id, session=None):
+    """
+    Publish the user's timer state once the transaction commits.
+    """
+    transaction.on_commit(
+        lambda: broker.publish(user_id, services.timer_state(session, timezone.now()))
+    )
+
+
+# --------------------------------------------------
+# Publishers
+# --------------------------------------------------
+
+
+@receiver(post_save, sender=PomodoroSession)
+def publish_session(sender, instance, **kwargs):
+    """Started, paused, resumed and stopped sessions."""
+    publish_on_commit(instance.user_id, instance)
+
+
+@receiver(sessions_completed)
+def publish_completed(sender, user_ids, **kwargs):
+    """Sessions completed by the expiry sweeper in this process."""
+    for user_id in user_ids:
+        transaction.on_commit(
+            lambda user_id=user_id: broker.publish(user_id, services.COMPLETED)
+        )
@@ -0,0 +1,172 @@
+import asyncio
+from contextlib import contextmanager
+from importlib import import_module
+import time
+import tracemalloc
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections
+from django.urls import reverse
+
+from habits.benchmark import rolled_back
+from pomodoro import events
+
+
+@contextmanager
+def keep_connection():
+    """
+    Keep the database connection open across requests (like the test
+    client does), so the requests see the rolled back benchmark data.
+    """
+    request_started.disconnect(close_old_connections)
+    request_finished.disconnect(close_old_connections)
+    try:
+        yield
+    finally:
+        request_started.connect(close_old_connections)
+        request_finished.connect(close_old_connections)
+
+
+class StreamClient:
+    """
+    One simulated browser tab holding a timer stream open.
+    """
+
+    def __init__(self, path, session_key):
+        self.scope = {
+            "type": "http",
+            "method": "GET",
+            "path": path,
+            "query_string": b"",
+            "headers": [
+                (b"host", b"localhost"),
+                (b"cookie", f"{settings.SESSION_COOKIE_NAME}={session_key}".encode()),
+            ],
+        }
+        self.requested = False
+        self.disconnected = asyncio.Event()
+        self.states = 0
+        self.received = asyncio.Event()
+
+    async def receive(self):
+        if not self.requested:
+            self.requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self.disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        if message.get("body", b"").startswith(b"data: "):
+            self.states += 1
+            self.received.set()
+
+
+class Command(BaseCommand):
+    """
+    Load test: concurrent timer streams held by one process.
+
+    Opens `--streams` event streams, spread over `--users` users (one
+    user has several tabs open), against the ASGI handler in this
+    process, with the database sessions of real logins. Reports the
+    time to open them and the memory held per open stream, then
+    publishes one state change per user and measures until every
+    stream has received it, and finally disconnects all clients and
+    checks that no subscription is left behind. All data is rolled
+    back afterwards.
+
+    Usage:
+    python manage.py bench_pomodoro_streams --streams 5000 --users 500
+    """
+
+    help = "Hold many concurrent pomodoro timer streams on one process."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--streams", type=int, default=5000)
+        parser.add_argument("--users", type=int, default=500)
+
+    def handle(self, *args, **options):
+        with rolled_back(), keep_connection():
+            session_keys = self.log_in(options["users"])
+            # Thread sensitive database calls of the requests run in
+            # this thread, inside the benchmark transaction
+            async_to_sync(self.run)(session_keys, options["streams"])
+
+    def log_in(self, count):
+        """Create users with a login session each; {user_id: session_key}."""
+        SessionStore = import_module(settings.SESSION_ENGINE).SessionStore
+        users = get_user_model().objects.bulk_create(
+            get_user_model()(username=f"bench-stream-{i}") for i in range(count)
+        )
+        session_keys = {}
+        for user in users:
+            store = SessionStore()
+            store[SESSION_KEY] = str(user.pk)
+            store[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+            store[HASH_SESSION_KEY] = user.get_session_auth_hash()
+            store.save()
+            session_keys[user.pk] = store.session_key
+        return session_keys
+
+    async def run(self, session_keys, count):
+        handler = ASGIHandler()
+        path = reverse("pomodoro_stream")
+        user_ids = list(session_keys)
+        owners = [user_ids[i % len(user_ids)] for i in range(count)]
+        clients = [StreamClient(path, session_keys[user_id]) for user_id in owners]
+
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+
+        start = time.perf_counter()
+        tasks = [
+            asyncio.create_task(handler(client.scope, client.receive, client.send))
+            for client in clients
+        ]
+        await asyncio.gather(*(client.received.wait() for client in clients))
+        opened = time.perf_counter() - start
+
+        held = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+
+        self.stdout.write(
+            f"opened {count} streams for {len(user_ids)} users in {opened:.2f} s "
+            f"({count / opened:.0f} streams/s), "
+            f"{len(events.broker)} subscriptions, "
+            f"{held / count / 1024:.1f} KiB per stream"
+        )
+
+        # One state change per user, published from a request thread
+        for client in clients:
+            client.received.clear()
+        state = {"status": "running", "seconds": 1500}
+
+        def publish():
+            return sum(events.broker.publish(user_id, state) for user_id in user_ids)
+
+        start = time.perf_counter()
+        reached = await sync_to_async(publish)()
+        published = time.perf_counter() - start
+        await asyncio.gather(*(client.received.wait() for client in clients))
+        delivered = time.perf_counter() - start
+
+        self.stdout.write(
+            f"published {len(user_ids)} changes to {reached} streams in "
+            f"{published * 1000:.1f} ms, all delivered after {delivered * 1000:.1f} ms"
+        )
+
+        start = time.perf_counter()
+        for client in clients:
+            client.disconnected.set()
+        await asyncio.gather(*tasks)
+        closed = time.perf_counter() - start
+
+        self.stdout.write(
+            f"closed {count} streams in {closed:.2f} s, "
+            f"{len(events.broker)} subscriptions left"
+        )
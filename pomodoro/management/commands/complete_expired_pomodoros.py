@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from pomodoro.services import complete_expired
+
+
+class Command(BaseCommand):
+    """
+    Management command: complete all Pomodoro sessions that are over.
+
+    A running session ends when its time is up, but nothing writes
+    that to the database by itself. Scheduled every minute (e.g. cron
+    `* * * * *`), this command marks all expired running sessions as
+    completed with a single bulk UPDATE, instead of every request
+    checking and finalizing sessions one by one.
+
+    Usage:
+    python manage.py complete_expired_pomodoros
+    """
+
+    help = "Mark expired running Pomodoro sessions as completed."
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        completed = complete_expired()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Completed {completed} expired sessions in {elapsed:.2f}s."
+        ))
@@ -0,0 +1,74 @@
+# Generated by Django 6.0 on 2026-10-18 23:05
+#
+# This migration turns the session status into a state machine
+# (running, paused, completed, stopped) with stored elapsed time.
+#
+# Sessions the old views ended with the undeclared "finished" status
+# are stopped sessions. Running sessions get their scheduled end, so
+# the expiry sweeper (`python manage.py complete_expired_pomodoros`)
+# can complete the ones that are already over.
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def fill_state(apps, schema_editor):
+    """
+    Map legacy statuses and schedule the end of running sessions.
+    """
+    PomodoroSession = apps.get_model("pomodoro", "PomodoroSession")
+
+    PomodoroSession.objects.filter(status="finished").update(status="stopped")
+
+    running = PomodoroSession.objects.filter(status="running", ends_at__isnull=True)
+    for session in running.iterator():
+        session.ends_at = session.started_at + timedelta(seconds=session.duration_seconds)
+        session.save(update_fields=["ends_at"])
+
+
+class Migration(migrations.Migration):
+    """
+    Migration to add the Pomodoro state machine fields.
+
+    `elapsed_seconds` and `ends_at` let the remaining time be computed
+    from the row alone; the (status, ends_at) index serves the sweeper.
+    """
+
+    dependencies = [
+        ("pomodoro", "0002_remove_pomodorosession_duration_minutes_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="pomodorosession",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("running", "Running"),
+                    ("paused", "Paused"),
+                    ("completed", "Completed"),
+                    ("stopped", "Stopped"),
+                ],
+                default="running",
+                max_length=20,
+            ),
+        ),
+        migrations.AddField(
+            model_name="pomodorosession",
+            name="elapsed_seconds",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="pomodorosession",
+            name="ends_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="pomodorosession",
+            index=models.Index(
+                fields=["status", "ends_at"], name="pomodoro_expiry_idx"
+            ),
+        ),
+        migrations.RunPython(fill_state, migrations.RunPython.noop),
+    ]
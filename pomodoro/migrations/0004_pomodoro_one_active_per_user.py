@@ -0,0 +1,61 @@
+# Generated by Django 6.0 on 2026-10-18 23:40
+#
+# This migration allows at most one running or paused session per
+# user, enforced by a partial unique index on (user).
+#
+# Concurrent starts used to leave several running sessions behind.
+# Before the constraint is added, all but the most recently started
+# active session of every user are stopped.
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def stop_duplicates(apps, schema_editor):
+    """
+    Keep only the latest active session of every user.
+    """
+    PomodoroSession = apps.get_model("pomodoro", "PomodoroSession")
+
+    active = (
+        PomodoroSession.objects
+        .filter(status__in=["paused", "running"])
+        .order_by("user_id", "-started_at", "-id")
+        .values_list("id", "user_id")
+    )
+    seen = set()
+    duplicates = []
+    for session_id, user_id in active:
+        if user_id in seen:
+            duplicates.append(session_id)
+        seen.add(user_id)
+
+    PomodoroSession.objects.filter(id__in=duplicates).update(
+        status="stopped",
+        ends_at=None,
+        ended_at=timezone.now(),
+    )
+
+
+class Migration(migrations.Migration):
+    """
+    Migration to add the one-active-session-per-user constraint.
+    """
+
+    dependencies = [
+        ("pomodoro", "0003_pomodoro_state_machine"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(stop_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="pomodorosession",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(status__in=["paused", "running"]),
+                fields=("user",),
+                name="pomodoro_one_active_per_user",
+            ),
+        ),
+    ]
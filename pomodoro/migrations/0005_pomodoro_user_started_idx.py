@@ -0,0 +1,43 @@
+# Generated by Django 6.0 on 2026-10-18 23:55
+#
+# This migration adds an index on (user, started_at) for the focus
+# time history of a user. Its trailing columns (status, habit,
+# duration) make it covering for the focus time queries.
+#
+# The index leads with the user, so the plain index on the user
+# foreign key is redundant and dropped (after the new one exists).
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Migration to index the sessions of a user by start time.
+    """
+
+    dependencies = [
+        ("habits", "0010_dailysummary"),
+        ("pomodoro", "0004_pomodoro_one_active_per_user"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="pomodorosession",
+            index=models.Index(
+                fields=["user", "started_at", "status", "habit", "duration_seconds"],
+                name="pomodoro_user_started_idx",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="pomodorosession",
+            name="user",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2 on 2026-10-19 00:40
+#
+# This migration adds the `checkin_processed` flag: completed sessions
+# linked to a habit now check the habit in automatically (see
+# habits.focus), and the flag marks the sessions already handled.
+#
+# Sessions completed before this migration are marked as processed,
+# so old history does not produce check-ins after the fact.
+
+from django.db import migrations, models
+
+
+def mark_completed(apps, schema_editor):
+    """
+    Mark all sessions completed so far as processed.
+    """
+    PomodoroSession = apps.get_model("pomodoro", "PomodoroSession")
+    PomodoroSession.objects.filter(status="completed").update(checkin_processed=True)
+
+
+class Migration(migrations.Migration):
+    """
+    Migration to track the automatic check-ins of completed sessions.
+    """
+
+    dependencies = [
+        ("pomodoro", "0005_pomodoro_user_started_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pomodorosession",
+            name="checkin_processed",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_completed, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="pomodorosession",
+            index=models.Index(
+                condition=models.Q(("checkin_processed", False), ("status", "completed")),
+                fields=["status", "user"],
+                name="pomodoro_pending_checkin_idx",
+            ),
+        ),
+    ]
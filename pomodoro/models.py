@@ -1,7 +1,91 @@
+from datetime import datetime, time, timedelta
+import math
+
 from django.conf import settings
-from django.db import models
+from django.db import connection, models
+from django.db.models.expressions import RawSQL
 from django.utils import timezone
 
+# Statuses of a session that is not over yet; a user has at most one
+# session in these (see PomodoroSession.Meta)
+ACTIVE_STATUSES = ["paused", "running"]
+
+
+class PomodoroSessionQuerySet(models.QuerySet):
+    """
+    Queries on the state of Pomodoro sessions.
+    """
+
+    def active(self, now=None):
+        """
+        Sessions that are paused, or running and not yet over.
+
+        Running sessions whose end has passed count as finished even
+        before the sweeper marks them completed.
+
+        The status filter is the condition of the one-active-session
+        index, written with literal values: SQLite only considers a
+        partial index when the query repeats its condition, and a
+        bound parameter does not. A lookup by user is then a seek on
+        that index.
+        """
+        now = now or timezone.now()
+        statuses = ", ".join(f"'{status}'" for status in ACTIVE_STATUSES)
+        return (
+            self._literal(f'{{table}}."status" IN ({statuses})')
+            .exclude(status="running", ends_at__lte=now)
+        )
+
+    def pending_checkin(self):
+        """
+        Completed sessions not yet considered for a habit check-in.
+
+        Repeats the condition of the partial pending check-in index
+        with literal values (see `active`). The tests check that both
+        lookups still use their index.
+        """
+        return self._literal(
+            """NOT {table}."checkin_processed" AND {table}."status" = 'completed'"""
+        )
+
+    def _literal(self, condition):
+        """Filter by a literal SQL condition; {table} is this table."""
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        return self.filter(RawSQL(
+            condition.format(table=table), [], output_field=models.BooleanField(),
+        ))
+
+    def expired(self, now=None):
+        """Running sessions whose end has passed."""
+        return self.filter(status="running", ends_at__lte=now or timezone.now())
+
+    def started_on(self, days):
+        """
+        Sessions started on the given local days.
+
+        Filters `started_at` by ranges (one per run of consecutive
+        days) instead of its local date, so the lookup stays a range
+        scan on the (user, started_at) index.
+        """
+        ranges = models.Q()
+        days = sorted(set(days))
+        while days:
+            first = last = days.pop(0)
+            while days and days[0] == last + timedelta(days=1):
+                last = days.pop(0)
+            ranges |= models.Q(
+                started_at__gte=_local_midnight(first),
+                started_at__lt=_local_midnight(last + timedelta(days=1)),
+            )
+        if not ranges:
+            return self.none()
+        return self.filter(ranges)
+
+
+def _local_midnight(day):
+    """The start of a day in the current time zone."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
 
 class PomodoroSession(models.Model):
     """
@@ -9,6 +93,16 @@ class PomodoroSession(models.Model):
 
     A PomodoroSession belongs to a user and optionally to a habit.
     It stores timing information and the current status of the session.
+
+    Sessions follow a small state machine (see TRANSITIONS):
+    running <-> paused, and both end as stopped (by the user) or
+    completed (the full duration was spent, see
+    pomodoro.services.complete_expired).
+
+    Time spent is stored, not counted on every read: `elapsed_seconds`
+    holds the focus time of all finished running periods, and while
+    running `ends_at` is when the session will be over. Remaining time
+    is therefore computed from the row alone (see `remaining_seconds`).
     """
 
     # --------------------------------------------------
@@ -16,18 +110,29 @@ class PomodoroSession(models.Model):
     # --------------------------------------------------
     STATUS_CHOICES = [
         ("running", "Running"),
+        ("paused", "Paused"),
         ("completed", "Completed"),
         ("stopped", "Stopped"),
     ]
 
+    # Allowed status changes; completed and stopped are final
+    TRANSITIONS = {
+        "running": {"paused", "completed", "stopped"},
+        "paused": {"running", "stopped"},
+        "completed": set(),
+        "stopped": set(),
+    }
+
     # --------------------------------------------------
     # Relationships
     # --------------------------------------------------
 
     # The user who started the Pomodoro session
+    # Lookups by user are served by the (user, started_at) index
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False,
     )
 
     # Optional link to a habit
@@ -54,6 +159,16 @@ class PomodoroSession(models.Model):
     # Timestamp when the session ended (null if still running)
     ended_at = models.DateTimeField(null=True, blank=True)
 
+    # Focus time accumulated before the current running period
+    elapsed_seconds = models.PositiveIntegerField(default=0)
+
+    # When a running session will be over (null unless running)
+    ends_at = models.DateTimeField(null=True, blank=True)
+
+    # Whether a completed session was considered for an automatic
+    # check-in of its habit (see habits.focus)
+    checkin_processed = models.BooleanField(default=False)
+
     # --------------------------------------------------
     # Session state & metadata
     # --------------------------------------------------
@@ -68,6 +183,120 @@ class PomodoroSession(models.Model):
     # Timestamp when the record was created
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = PomodoroSessionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Sweeper: running sessions by end time
+            models.Index(fields=["status", "ends_at"], name="pomodoro_expiry_idx"),
+            # History of a user by start time. The trailing columns
+            # make it covering for focus time queries (see
+            # analytics.models.FocusRollup), which then never read
+            # the table itself.
+            models.Index(
+                fields=["user", "started_at", "status", "habit", "duration_seconds"],
+                name="pomodoro_user_started_idx",
+            ),
+            # Completed sessions waiting for their automatic check-in
+            # (see PomodoroSessionQuerySet.pending_checkin). The status
+            # is constant here, but as a key column it lets SQLite
+            # prefer this index over the expiry index.
+            models.Index(
+                fields=["status", "user"],
+                condition=models.Q(checkin_processed=False, status="completed"),
+                name="pomodoro_pending_checkin_idx",
+            ),
+        ]
+        constraints = [
+            # One running or paused session per user. The partial
+            # unique index also serves the timer lookup of a user
+            # (see PomodoroSessionQuerySet.active).
+            models.UniqueConstraint(
+                fields=["user"],
+                condition=models.Q(status__in=ACTIVE_STATUSES),
+                name="pomodoro_one_active_per_user",
+            ),
+        ]
+
+    # --------------------------------------------------
+    # Computed time
+    # --------------------------------------------------
+
+    def remaining_at(self, now):
+        """Seconds left at `now` (rounded up, never negative)."""
+        if self.status == "running":
+            left = (self.ends_at - now).total_seconds()
+            # `now` may predate the running period (a request that
+            # waited for a lock), which cannot give back time
+            left = min(left, self.duration_seconds - self.elapsed_seconds)
+            return max(0, math.ceil(left))
+        if self.status == "paused":
+            return max(0, self.duration_seconds - self.elapsed_seconds)
+        return 0
+
+    def elapsed_at(self, now):
+        """Focus seconds spent at `now`."""
+        return self.duration_seconds - self.remaining_at(now)
+
+    @property
+    def remaining_seconds(self):
+        """Seconds left right now (what the timer shows)."""
+        return self.remaining_at(timezone.now())
+
+    # --------------------------------------------------
+    # State machine
+    # --------------------------------------------------
+
+    def save(self, *args, **kwargs):
+        # A running session created directly (admin, shell) ends after
+        # its duration
+        if self.status == "running" and self.ends_at is None:
+            self.ends_at = self.started_at + timedelta(
+                seconds=self.duration_seconds - self.elapsed_seconds
+            )
+        super().save(*args, **kwargs)
+
+    def can_transition(self, status):
+        return status in self.TRANSITIONS[self.status]
+
+    def _transition(self, status, now):
+        """
+        Validate and apply a status change in memory.
+
+        Raises ValueError for changes the state machine does not allow,
+        and for pausing or stopping a running session that is already
+        over (it is completed, see pomodoro.services.complete_expired).
+        """
+        if not self.can_transition(status):
+            raise ValueError(f"cannot change a {self.status} session to {status}")
+        if self.status == "running" and status != "completed" and self.ends_at <= now:
+            raise ValueError("the session is already over")
+
+        self.elapsed_seconds = self.elapsed_at(now)
+        self.status = status
+        self.ends_at = None
+        if status == "running":
+            self.ends_at = now + timedelta(
+                seconds=self.duration_seconds - self.elapsed_seconds
+            )
+        elif status in ("completed", "stopped"):
+            self.ended_at = now
+
+    def pause(self, now=None):
+        """Pause a running session, keeping the time spent so far."""
+        self._transition("paused", now or timezone.now())
+        self.save(update_fields=["status", "elapsed_seconds", "ends_at"])
+
+    def resume(self, now=None):
+        """Continue a paused session for the time that was left."""
+        self._transition("running", now or timezone.now())
+        self.save(update_fields=["status", "elapsed_seconds", "ends_at"])
+
+    def stop(self, now=None):
+        """End a session early."""
+        self._transition("stopped", now or timezone.now())
+        self.save(update_fields=["status", "elapsed_seconds", "ends_at", "ended_at"])
+
     def __str__(self):
         """
         Human-readable representation of the Pomodoro session.
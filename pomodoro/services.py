@@ -0,0 +1,172 @@
+"""
+Write services for Pomodoro sessions.
+
+Views call into these functions instead of changing sessions
+themselves, so every write path follows the state machine of
+PomodoroSession in the same way.
+"""
+
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import PomodoroSession
+from .signals import sessions_completed
+
+# Length of a new session (25 minutes)
+DEFAULT_DURATION = 25 * 60
+
+# Timer state of a session that ran its full duration
+COMPLETED = {"status": "completed", "seconds": 0}
+
+
+def timer_state(session, now):
+    """
+    The timer as the dashboard shows it, for responses and events.
+
+    No session (or a stopped one) is a ready timer for a new session.
+    """
+    if session is None or session.status == "stopped":
+        return {"status": "ready", "seconds": DEFAULT_DURATION}
+    return {"status": session.status, "seconds": session.remaining_at(now)}
+
+
+def current_session(user, now=None):
+    """
+    The user's paused or still running session, if any.
+
+    There is at most one (see PomodoroSession.Meta), found with a seek
+    on the one-active-session index.
+    """
+    return PomodoroSession.objects.filter(user=user).active(now).first()
+
+
+def stop_active(user, now=None):
+    """
+    Stop the user's active sessions. Sessions that are already over
+    are completed first.
+
+    Returns the number of stopped sessions.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        complete_expired(now, user=user)
+        sessions = list(
+            PomodoroSession.objects
+            .select_for_update()
+            .filter(user=user)
+            .active(now)
+        )
+        for session in sessions:
+            session.stop(now)
+    return len(sessions)
+
+
+def start_session(user, duration=DEFAULT_DURATION, now=None):
+    """
+    Start a new running session, stopping the user's current one.
+
+    The database allows one active session per user. If a concurrent
+    request started a session between stopping the current one and
+    inserting the new one, the insert fails and the session of that
+    request is returned instead: both requests meant to start a timer
+    now, and only one of them can.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        stop_active(user, now)
+        try:
+            with transaction.atomic():
+                return PomodoroSession.objects.create(
+                    user=user,
+                    status="running",
+                    duration_seconds=duration,
+                    started_at=now,
+                    ends_at=now + timedelta(seconds=duration),
+                )
+        except IntegrityError:
+            session = current_session(user, now)
+            if session is None:
+                raise
+            return session
+
+
+def pause_session(user, now=None):
+    """
+    Pause the user's running session.
+
+    Returns the session, or None if nothing is running.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        session = (
+            PomodoroSession.objects
+            .select_for_update()
+            .filter(user=user, status="running", ends_at__gt=now)
+            .first()
+        )
+        if session is not None:
+            session.pause(now)
+    return session
+
+
+def resume_session(user, now=None):
+    """
+    Resume the user's paused session.
+
+    Returns the session, or None if nothing is paused.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        session = (
+            PomodoroSession.objects
+            .select_for_update()
+            .filter(user=user, status="paused")
+            .first()
+        )
+        if session is not None:
+            session.resume(now)
+    return session
+
+
+def complete_expired(now=None, user=None):
+    """
+    Mark all running sessions whose end has passed as completed.
+
+    One query locks the expired sessions and reads their (user, start
+    day) pairs for derived data, one bulk UPDATE finalizes them all:
+    the time spent is the full duration and they ended at their
+    scheduled end. Derived data is resynced once through
+    `sessions_completed`.
+
+    Returns the number of completed sessions.
+    """
+    now = now or timezone.now()
+    expired = PomodoroSession.objects.expired(now)
+    if user is not None:
+        expired = expired.filter(user=user)
+
+    with transaction.atomic():
+        pairs = set(
+            expired
+            .select_for_update()
+            .values_list("user_id", "started_at")
+        )
+        if not pairs:
+            return 0
+
+        completed = expired.update(
+            status="completed",
+            elapsed_seconds=F("duration_seconds"),
+            ended_at=F("ends_at"),
+            ends_at=None,
+        )
+
+        sessions_completed.send(
+            sender=PomodoroSession,
+            user_ids=sorted({user_id for user_id, _ in pairs}),
+            days=sorted({timezone.localdate(started) for _, started in pairs}),
+        )
+    return completed
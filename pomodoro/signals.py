@@ -0,0 +1,14 @@
+"""
+Signals of the pomodoro app.
+
+Single session writes go through `save()` and send the usual model
+signals. The expiry sweeper completes many sessions with one bulk
+UPDATE, which sends none; it finishes with a single
+`sessions_completed(user_ids, days)` event instead, so derived data
+(e.g. the daily summary's focus time) is resynced once.
+"""
+
+from django.dispatch import Signal
+
+# Sent with `user_ids` and `days` (local start dates) keyword arguments
+sessions_completed = Signal()
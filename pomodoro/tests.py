@@ -1,3 +1,386 @@
-from django.test import TestCase
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+import json
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from habits.models import DailySummary
+from . import events, services
+from .models import PomodoroSession
+
+# Test configuration for the pomodoro app.
+
+
+class PomodoroStateTests(TestCase):
+    """
+    Tests for the session state machine and its computed time.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username="focus")
+        self.now = timezone.now()
+
+    def at(self, seconds):
+        return self.now + timedelta(seconds=seconds)
+
+    def test_remaining_time_survives_pauses(self):
+        session = services.start_session(self.user, now=self.now)
+        self.assertEqual(session.remaining_at(self.at(60)), 1440)
+
+        session.pause(self.at(60))
+        self.assertEqual(session.elapsed_seconds, 60)
+        # Paused time does not count
+        self.assertEqual(session.remaining_at(self.at(3600)), 1440)
+
+        session.resume(self.at(600))
+        self.assertEqual(session.ends_at, self.at(600 + 1440))
+        self.assertEqual(session.remaining_at(self.at(700)), 1340)
+
+        session.refresh_from_db()
+        with self.assertNumQueries(0):
+            self.assertEqual(session.remaining_at(self.at(700)), 1340)
+            self.assertEqual(session.elapsed_at(self.at(700)), 160)
+
+    def test_invalid_transitions_are_rejected(self):
+        session = services.start_session(self.user, now=self.now)
+        with self.assertRaises(ValueError):
+            session.resume(self.at(10))
+
+        session.stop(self.at(10))
+        self.assertEqual(session.status, "stopped")
+        self.assertEqual(session.ended_at, self.at(10))
+        with self.assertRaises(ValueError):
+            session.pause(self.at(20))
+
+        # A running session that is over can only be completed
+        late = services.start_session(self.user, now=self.now)
+        with self.assertRaises(ValueError):
+            late.pause(self.at(2000))
+
+    def test_starting_stops_the_current_session(self):
+        first = services.start_session(self.user, now=self.now)
+        first.pause(self.at(30))
+        second = services.start_session(self.user, now=self.at(60))
+
+        first.refresh_from_db()
+        self.assertEqual(first.status, "stopped")
+        self.assertEqual(first.elapsed_seconds, 30)
+        self.assertEqual(services.current_session(self.user, self.at(61)), second)
+
+    def test_one_active_session_per_user(self):
+        services.start_session(self.user, now=self.now)
+        for status in ("running", "paused"):
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                PomodoroSession.objects.create(user=self.user, status=status)
+
+        # Finished sessions are not limited
+        for status in ("completed", "stopped"):
+            PomodoroSession.objects.create(user=self.user, status=status)
+
+    def test_timer_lookup_uses_the_active_index(self):
+        queryset = PomodoroSession.objects.filter(user=self.user).active(self.now)
+
+        self.assertIn("pomodoro_one_active_per_user", queryset.explain())
+
+    def test_pending_lookups_use_the_partial_index(self):
+        # Fails if the literal condition drifts from the index condition
+        pending = PomodoroSession.objects.pending_checkin()
+        for queryset in (
+            pending.order_by("id"),
+            pending.filter(user=self.user),
+            pending.filter(user_id__in=[self.user.id]).order_by("id"),
+        ):
+            self.assertIn("pomodoro_pending_checkin_idx", queryset.explain())
+
+
+class ExpirySweeperTests(TestCase):
+    """
+    Tests for completing expired sessions in bulk.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username="focus")
+        self.other = get_user_model().objects.create(username="other")
+        self.now = timezone.now()
+
+    def test_expired_sessions_are_completed_in_one_update(self):
+        expired = [
+            services.start_session(user, now=self.now - timedelta(hours=1))
+            for user in (self.user, self.other)
+        ]
+        running = services.start_session(
+            get_user_model().objects.create(username="busy"), now=self.now
+        )
+        paused = services.start_session(
+            get_user_model().objects.create(username="break"),
+            now=self.now - timedelta(hours=1),
+        )
+        paused.pause(self.now - timedelta(minutes=50))
+
+        with CaptureQueriesContext(connection) as ctx:
+            completed = services.complete_expired(self.now)
+        # (The focus check-ins mark the sessions processed afterwards)
+        updates = [
+            query for query in ctx.captured_queries
+            if query["sql"].startswith('UPDATE "pomodoro_pomodorosession" SET "status"')
+        ]
+
+        self.assertEqual(completed, 2)
+        self.assertEqual(len(updates), 1)
+        for session in expired:
+            session.refresh_from_db()
+            self.assertEqual(session.status, "completed")
+            self.assertEqual(session.elapsed_seconds, session.duration_seconds)
+            self.assertEqual(
+                session.ended_at,
+                session.started_at + timedelta(seconds=session.duration_seconds),
+            )
+            self.assertIsNone(session.ends_at)
+        running.refresh_from_db()
+        paused.refresh_from_db()
+        self.assertEqual((running.status, paused.status), ("running", "paused"))
+
+        # Nothing left to do
+        self.assertEqual(services.complete_expired(self.now), 0)
+
+    def test_completed_focus_time_reaches_the_daily_summary(self):
+        started = timezone.now() - timedelta(hours=1)
+        services.start_session(self.user, now=started)
+
+        call_command("complete_expired_pomodoros", stdout=StringIO())
+
+        row = DailySummary.objects.for_day(self.user.id, timezone.localdate(started))
+        self.assertEqual(row.focus_seconds, services.DEFAULT_DURATION)
+
+
+class StartConcurrencyTests(TransactionTestCase):
+    """
+    Parallel starts against the file-backed test database (every
+    thread has its own connection).
+    """
+
+    workers = 8
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username="focus")
+
+    def test_parallel_starts_leave_one_active_session(self):
+        def start(_):
+            try:
+                return services.start_session(self.user).id
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            started = set(pool.map(start, range(32)))
+
+        active = PomodoroSession.objects.filter(user=self.user).active()
+        self.assertEqual(active.count(), 1)
+        self.assertIn(active.get().id, started)
+        self.assertEqual(
+            PomodoroSession.objects.filter(user=self.user, status="stopped").count(),
+            PomodoroSession.objects.count() - 1,
+        )
+
+    def test_losing_insert_returns_the_winning_session(self):
+        winner = services.start_session(self.user)
+        # Simulate a request that checked before the winner was inserted
+        stop_active = services.stop_active
+        services.stop_active = lambda user, now=None: 0
+        try:
+            session = services.start_session(self.user)
+        finally:
+            services.stop_active = stop_active
+
+        self.assertEqual(session, winner)
+        self.assertEqual(PomodoroSession.objects.count(), 1)
+
+
+class PomodoroViewTests(TestCase):
+    """
+    Tests for the timer endpoints.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username="focus")
+        self.client.force_login(self.user)
+
+    def test_start_pause_resume_reset(self):
+        response = self.client.post(reverse("pomodoro_start"))
+        self.assertEqual(response.json(), {"status": "running", "seconds": 1500})
+
+        response = self.client.post(reverse("pomodoro_pause"), {"paused": "true"})
+        self.assertEqual(response.json()["status"], "paused")
+        dashboard = self.client.get(reverse("dashboard"))
+        self.assertContains(dashboard, 'data-status="paused"')
+
+        response = self.client.post(reverse("pomodoro_pause"), {"paused": "false"})
+        self.assertEqual(response.json()["status"], "running")
+
+        response = self.client.post(reverse("pomodoro_reset"))
+        self.assertEqual(response.json(), {"status": "ready", "seconds": 1500})
+        self.assertEqual(
+            list(PomodoroSession.objects.values_list("status", flat=True)),
+            ["stopped"],
+        )
+
+    def test_repeated_pause_keeps_the_session_paused(self):
+        self.client.post(reverse("pomodoro_start"))
+
+        for _ in range(2):
+            response = self.client.post(reverse("pomodoro_pause"), {"paused": "true"})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["status"], "paused")
+
+        self.assertEqual(PomodoroSession.objects.get().status, "paused")
+
+    def test_pause_without_session(self):
+        response = self.client.post(reverse("pomodoro_pause"), {"paused": "true"})
+        self.assertEqual(response.status_code, 409)
+        response = self.client.post(reverse("pomodoro_pause"), {"paused": "false"})
+        self.assertEqual(response.status_code, 409)
+
+    def test_pause_rejects_invalid_state(self):
+        response = self.client.post(reverse("pomodoro_pause"), {"paused": "maybe"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_guests_keep_their_timer_in_the_browser(self):
+        self.client.logout()
+        response = self.client.post(reverse("pomodoro_start"))
+        self.assertEqual(response.json(), {"status": "running", "seconds": 1500})
+        response = self.client.post(reverse("pomodoro_pause"), {"paused": "true"})
+        self.assertEqual(response.json(), {"status": "paused"})
+        self.assertFalse(PomodoroSession.objects.exists())
+
+
+class TimerEventTests(TestCase):
+    """
+    Tests for publishing timer state to the user's streams.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username="focus")
+        self.other = get_user_model().objects.create(username="other")
+        self.now = timezone.now()
+        self.received = []
+        self.other_received = []
+        events.broker.subscribe(self.user.id, self.received.append)
+        events.broker.subscribe(self.other.id, self.other_received.append)
+        self.addCleanup(events.broker.unsubscribe, self.user.id, self.received.append)
+        self.addCleanup(events.broker.unsubscribe, self.other.id, self.other_received.append)
+
+    def test_changes_are_published_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            session = services.start_session(self.user, now=self.now)
+            session.pause(self.now)
+        self.assertEqual(self.received, [])
+
+        for callback in callbacks:
+            callback()
+        with self.captureOnCommitCallbacks(execute=True):
+            services.stop_active(self.user)
+
+        self.assertEqual(
+            [state["status"] for state in self.received],
+            ["paused", "paused", "ready"],
+        )
+        self.assertEqual(self.other_received, [])
+
+    def test_sweeper_publishes_completions(self):
+        services.start_session(self.user, now=self.now - timedelta(hours=1))
+        with self.captureOnCommitCallbacks(execute=True):
+            services.complete_expired(self.now)
+
+        self.assertEqual(self.received, [services.COMPLETED])
+
+    def test_stream_needs_asgi_and_a_user(self):
+        # The test client is a WSGI client
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse("pomodoro_stream")).status_code, 204)
+
+
+class StreamClient:
+    """
+    A client holding a timer stream open against the ASGI handler.
+    """
+
+    def __init__(self, session_key):
+        self.scope = {
+            "type": "http",
+            "method": "GET",
+            "path": reverse("pomodoro_stream"),
+            "query_string": b"",
+            "headers": [
+                (b"host", b"testserver"),
+                (b"cookie", f"{settings.SESSION_COOKIE_NAME}={session_key}".encode()),
+            ],
+        }
+        self.requested = False
+        self.disconnected = asyncio.Event()
+        self.messages = asyncio.Queue()
+
+    async def receive(self):
+        if not self.requested:
+            self.requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self.disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        await self.messages.put(message)
+
+    async def next_state(self):
+        while True:
+            message = await asyncio.wait_for(self.messages.get(), 5)
+            body = message.get("body", b"")
+            if body.startswith(b"data: "):
+                return json.loads(body[len(b"data: "):])
+
+
+class TimerStreamTests(TransactionTestCase):
+    """
+    Tests for the event stream served by the ASGI handler.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username="focus")
+        self.client.force_login(self.user)
+        self.session_key = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+
+    async def test_stream_follows_the_timer(self):
+        await sync_to_async(services.start_session)(self.user, duration=1)
+
+        client = StreamClient(self.session_key)
+        handler = asyncio.create_task(
+            ASGIHandler()(client.scope, client.receive, client.send)
+        )
+        start = await asyncio.wait_for(client.messages.get(), 5)
+        self.assertEqual(start["status"], 200)
+        self.assertIn((b"Content-Type", b"text/event-stream"), start["headers"])
+
+        # The stream completes the running session at its end by itself
+        self.assertEqual(await client.next_state(), {"status": "running", "seconds": 1})
+        self.assertEqual(await client.next_state(), services.COMPLETED)
+
+        # ... and so does the sweeper, once the session is stored as completed
+        await sync_to_async(services.complete_expired)()
+        self.assertEqual(await client.next_state(), services.COMPLETED)
+
+        await sync_to_async(services.start_session)(self.user)
+        self.assertEqual(await client.next_state(), {"status": "running", "seconds": 1500})
+        self.assertEqual(len(events.broker), 1)
+
+        client.disconnected.set()
+        await asyncio.wait_for(handler, 5)
+        self.assertEqual(len(events.broker), 0)
@@ -6,6 +6,11 @@ from . import views
 urlpatterns = [
     # Starts a new Pomodoro session for the current user
     path("start/", views.start, name="pomodoro_start"),
+    # Pauses the running Pomodoro session or resumes the paused one
+    # (`paused=true/false`)
+    path("pause/", views.pause, name="pomodoro_pause"),
     # Resets the current Pomodoro session
     path("reset/", views.reset, name="pomodoro_reset"),
+    # Streams the timer state to the open dashboards of the user
+    path("stream/", views.stream, name="pomodoro_stream"),
 ]
\ No newline at end of file
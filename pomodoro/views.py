@@ -1,8 +1,15 @@
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET, require_POST
 from django.utils import timezone
 
-from .models import PomodoroSession
+from . import events, services
+
+# Seconds between keep-alive comments on an idle stream
+KEEPALIVE_SECONDS = 15
 
 
 @require_POST
@@ -13,29 +20,67 @@ def start(request):
     if not request.user.is_authenticated:
         return JsonResponse({
             "status": "running",
-            "seconds": 25 * 60,
+            "seconds": services.DEFAULT_DURATION,
         })
 
     # --------------------------------------------------
     # Logged-in user → DB-backed pomodoro
     # --------------------------------------------------
-    PomodoroSession.objects.filter(
-        user=request.user,
-        status="running"
-    ).update(status="finished")
-
-    # Create a new running Pomodoro session (25 minutes)
-    session = PomodoroSession.objects.create(
-        user=request.user,
-        status="running",
-        duration_seconds=25 * 60,
-        started_at=timezone.now(),
-    )
 
-    return JsonResponse({
-        "status": "running",
-        "seconds": session.duration_seconds,
-    })
+    # Stops the current session and starts a new 25 minute one
+    now = timezone.now()
+    session = services.start_session(request.user, now=now)
+
+    return JsonResponse(services.timer_state(session, now))
+
+
+def _requested_pause(request):
+    """
+    Target state from the `paused` field of a pause request: True
+    (the default) to pause, False to resume.
+    """
+    value = request.POST.get("paused", "true").lower()
+    if value in ("true", "1", "on"):
+        return True
+    if value in ("false", "0", "off"):
+        return False
+    raise ValueError("paused must be true or false")
+
+
+@require_POST
+def pause(request):
+    """
+    Action view: pause the running session (`paused=true`) or resume
+    the paused one (`paused=false`).
+
+    The state is set instead of flipped, so a retried request or a
+    second tab does not undo it: a timer already in the requested
+    state is returned unchanged. Without a session that can reach the
+    requested state the response is 409. Guests keep their timer in
+    the browser only, so they just get the requested state back.
+    """
+    try:
+        paused = _requested_pause(request)
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    if not request.user.is_authenticated:
+        return JsonResponse({"status": "paused" if paused else "running"})
+
+    now = timezone.now()
+    if paused:
+        session = services.pause_session(request.user, now=now)
+    else:
+        session = services.resume_session(request.user, now=now)
+
+    if session is None:
+        session = services.current_session(request.user, now)
+        wanted = "paused" if paused else "running"
+        if session is None or session.status != wanted:
+            needed = "running" if paused else "paused"
+            return JsonResponse({"error": f"no {needed} session"}, status=409)
+
+    return JsonResponse(services.timer_state(session, now))
 
 
 @require_POST
@@ -44,20 +89,69 @@ def reset(request):
     # Guest → just reset frontend state
     # --------------------------------------------------
     if not request.user.is_authenticated:
-        return JsonResponse({
-            "status": "ready",
-            "seconds": 25 * 60,
-        })
+        return JsonResponse(services.timer_state(None, None))
 
     # --------------------------------------------------
     # Logged-in user → DB reset
     # --------------------------------------------------
-    PomodoroSession.objects.filter(
-        user=request.user,
-        status__in=["running", "paused"]
-    ).update(status="finished")
 
-    return JsonResponse({
-        "status": "ready",
-        "seconds": 25 * 60,
-    })
\ No newline at end of file
+    # Running and paused sessions are stopped
+    services.stop_active(request.user)
+
+    return JsonResponse(services.timer_state(None, None))
+
+
+@require_GET
+async def stream(request):
+    """
+    Event stream view: the user's timer state, now and on every change.
+
+    Sends the current state first, then every state published for the
+    user (see pomodoro.events). Only served under ASGI, where an open
+    stream costs no thread; WSGI servers and guests (whose timer lives
+    in the browser) get 204, which tells EventSource not to reconnect.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=204)
+
+    response = StreamingHttpResponse(
+        _stream_events(user.id), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    # Do not let proxies buffer the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+async def _stream_events(user_id):
+    loop = asyncio.get_running_loop()
+
+    # Subscribe before reading the state, so no change is missed
+    async with events.Subscription(user_id) as subscription:
+        session = await sync_to_async(services.current_session)(user_id)
+        state = services.timer_state(session, timezone.now())
+
+        while True:
+            yield events.encode(state)
+
+            # A running session is over at a known time, which needs
+            # no event (the sweeper may run in another process)
+            ends = None
+            if state["status"] == "running":
+                ends = loop.time() + state["seconds"]
+
+            while True:
+                timeout = KEEPALIVE_SECONDS
+                if ends is not None:
+                    timeout = min(timeout, max(0, ends - loop.time()))
+                published = await subscription.next(timeout)
+                if published is not None:
+                    state = published
+                    break
+                if ends is not None and loop.time() >= ends:
+                    state = services.COMPLETED
+                    break
+                yield ": keep-alive\n\n"
@@ -12,3 +12,10 @@ class StreaksConfig(AppConfig):
 
     # The name of the application as referenced in INSTALLED_APPS
     name = "streaks"
+
+    def ready(self):
+        """
+        Connect the signal handlers that maintain the run index
+        whenever the completion history of a habit changes.
+        """
+        from . import signals  # noqa: F401
@@ -0,0 +1,146 @@
+# Generated by Django 6.0 on 2026-10-18 17:10
+#
+# This migration introduces the HabitRun model, an index of
+# maximal runs of consecutive completed days per habit.
+# Existing histories are indexed here, and the streaks of all
+# habits are rebuilt from them, since streaks are served from
+# the run index from now on (see streaks.rebuild).
+
+from datetime import date, timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Run rows inserted per query
+BATCH_SIZE = 2000
+
+
+def index_runs(apps, schema_editor):
+    """
+    Build the run index and the streaks of every habit from its
+    completed check-ins (habits have no schedule yet: every day
+    counts).
+    """
+    Habit = apps.get_model("habits", "Habit")
+    HabitCheckIn = apps.get_model("habits", "HabitCheckIn")
+    HabitRun = apps.get_model("streaks", "HabitRun")
+    Streak = apps.get_model("streaks", "Streak")
+
+    yesterday = date.today() - timedelta(days=1)
+    # {habit_id: [start, end, length, longest]} of the open run
+    states = {habit_id: None for habit_id in Habit.objects.values_list("id", flat=True)}
+    runs = []
+
+    def close(habit_id, state):
+        runs.append(HabitRun(habit_id=habit_id, start=state[0], end=state[1], length=state[2]))
+        if len(runs) >= BATCH_SIZE:
+            HabitRun.objects.bulk_create(runs)
+            runs.clear()
+
+    checkins = (
+        HabitCheckIn.objects
+        .filter(completed=True)
+        .order_by("habit_id", "date")
+        .values_list("habit_id", "date")
+    )
+    for habit_id, day in checkins.iterator(chunk_size=BATCH_SIZE):
+        state = states.get(habit_id)
+        if state is not None and day == state[1] + timedelta(days=1):
+            state[1] = day
+            state[2] += 1
+            state[3] = max(state[3], state[2])
+        else:
+            if state is not None:
+                close(habit_id, state)
+            states[habit_id] = [day, day, 1, max(state[3] if state else 0, 1)]
+
+    for habit_id, state in states.items():
+        if state is not None:
+            close(habit_id, state)
+    HabitRun.objects.bulk_create(runs)
+
+    Streak.objects.all().delete()
+    Streak.objects.bulk_create(
+        (
+            Streak(
+                habit_id=habit_id,
+                count=state[2] if state and state[1] >= yesterday else 0,
+                longest_streak=state[3] if state else 0,
+                last_completed=state[1] if state else None,
+            )
+            for habit_id, state in states.items()
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+    """
+    Migration to create the HabitRun model.
+
+    Streaks are served from this table: the current streak is the
+    most recent run, the longest streak is the longest run.
+    """
+
+    dependencies = [
+        ("habits", "0004_habityear"),
+        ("streaks", "0002_streak_longest_streak"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HabitRun",
+            fields=[
+                # Primary key automatically created by Django
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+
+                # First and last completed day of the run
+                ("start", models.DateField()),
+                ("end", models.DateField()),
+
+                # Number of days in the run
+                ("length", models.PositiveIntegerField()),
+
+                # Habit the run belongs to
+                (
+                    "habit",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="runs",
+                        to="habits.habit",
+                    ),
+                ),
+            ],
+            options={
+                # Longest streak lookup
+                "indexes": [
+                    models.Index(
+                        fields=["habit", "-length"],
+                        name="habitrun_longest_idx",
+                    ),
+                ],
+
+                # Runs of a habit never share a start or end day;
+                # the unique indexes also serve the neighbour lookups
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("habit", "start"),
+                        name="habitrun_unique_start",
+                    ),
+                    models.UniqueConstraint(
+                        fields=("habit", "end"),
+                        name="habitrun_unique_end",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(index_runs, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,12 @@
-from django.db import models
+from django.db import models, transaction
 from habits.models import Habit
+from habits.schedule import (
+    EVERY_DAY,
+    is_scheduled,
+    next_scheduled,
+    previous_scheduled,
+    scheduled_days,
+)
 from datetime import date
 
 
@@ -7,9 +14,9 @@ class Streak(models.Model):
     """
     Represents the streak state of a habit.
 
-    A streak tracks how many consecutive days a habit has been completed,
-    when it was last completed, and what the longest streak ever achieved was.
-    Each habit is associated with exactly one streak.
+    A streak tracks how many consecutive scheduled days a habit has been
+    completed, when it was last completed, and what the longest streak
+    ever achieved was. Each habit is associated with exactly one streak.
     """
 
     # --------------------------------------------------
@@ -27,44 +34,40 @@ class Streak(models.Model):
     # Streak state
     # --------------------------------------------------
 
-    # Current number of consecutive completed days
+    # Current number of consecutive completed scheduled days
     count = models.PositiveIntegerField(default=0)
 
     # Maximum streak length ever achieved for this habit
     longest_streak = models.PositiveIntegerField(default=0)
 
-    # Date on which the habit was last marked as completed
+    # Last scheduled day on which the habit was completed
     last_completed = models.DateField(null=True, blank=True)
 
-    def update_streak(self):
+    def update_streak(self, today=None, schedule=None):
         """
-        Update the streak based on today's date.
+        Refresh the streak from the habit's run index.
 
         Logic:
-        - If the habit was already completed today, do nothing.
-        - If the habit was completed yesterday, increment the streak.
-        - Otherwise, reset the streak to 1.
-        - Update the longest streak if the current streak exceeds it.
+        - The most recent run decides the last completion date.
+        - It only counts as the current streak while it is alive,
+          i.e. no scheduled day between its end and today was
+          missed; otherwise the count is 0.
+        - The longest run is the longest streak ever achieved.
+
+        Both values are index lookups on HabitRun, independent of
+        how long the habit's history is. Pass the habit's `schedule`
+        if it is already known to skip loading the habit.
         """
-        today = date.today()
-
-        # Prevent double-counting on the same day
-        if self.last_completed == today:
-            return
-
-        # Continue streak if habit was completed yesterday
-        if self.last_completed == today.replace(day=today.day - 1):
-            self.count += 1
-        else:
-            # Break in streak: start over
-            self.count = 1
-
-        # Keep track of the longest streak achieved
-        if self.count > self.longest_streak:
-            self.longest_streak = self.count
-
-        # Update last completion date and persist changes
-        self.last_completed = today
+        today = today or date.today()
+        if schedule is None:
+            schedule = self.habit.schedule
+
+        count, longest, last = HabitRun.objects.streak_state(
+            self.habit_id, today, schedule
+        )
+        self.count = count
+        self.longest_streak = longest
+        self.last_completed = last
         self.save()
 
     def __str__(self):
@@ -72,3 +75,174 @@ class Streak(models.Model):
         Human-readable representation of the streak.
         """
         return f"Streak for {self.habit.name}: {self.count}"
+
+
+class HabitRunManager(models.Manager):
+    """
+    Split/merge maintenance of the run index.
+
+    Adding or removing a single day touches at most two runs, so
+    keeping the index up to date costs a constant number of queries
+    no matter where in the history the day lies.
+
+    All methods take the habit's weekday `schedule` (see
+    habits.schedule): neighbouring runs are those ending on the
+    previous or starting on the next *scheduled* day, and days
+    outside the schedule are ignored.
+    """
+
+    def containing(self, habit_id, day):
+        """
+        Return the run covering the given day, or None.
+
+        Runs never overlap, so the first run ending on or after the
+        day is the only candidate: a single index seek on (habit, end).
+        """
+        run = (
+            self.select_for_update()
+            .filter(habit_id=habit_id, end__gte=day)
+            .order_by("end")
+            .first()
+        )
+        if run is not None and run.start <= day:
+            return run
+        return None
+
+    def add_day(self, habit_id, day, schedule=EVERY_DAY):
+        """
+        Mark a day as completed.
+
+        Extends the neighbouring run(s) or creates a new one-day run.
+        If the day closes a gap, the run before and the run after are
+        merged into a single run.
+        """
+        if not is_scheduled(schedule, day):
+            return
+        runs = self.select_for_update().filter(habit_id=habit_id)
+
+        with transaction.atomic():
+            if self.containing(habit_id, day) is not None:
+                return
+
+            before = runs.filter(end=previous_scheduled(schedule, day)).first()
+            after = runs.filter(start=next_scheduled(schedule, day)).first()
+
+            if before and after:
+                # Merge: before + day + after
+                before.end = after.end
+                before.length += 1 + after.length
+                after.delete()
+                before.save(update_fields=["end", "length"])
+            elif before:
+                before.end = day
+                before.length += 1
+                before.save(update_fields=["end", "length"])
+            elif after:
+                after.start = day
+                after.length += 1
+                after.save(update_fields=["start", "length"])
+            else:
+                self.create(habit_id=habit_id, start=day, end=day, length=1)
+
+    def remove_day(self, habit_id, day, schedule=EVERY_DAY):
+        """
+        Mark a day as no longer completed.
+
+        Shrinks the run containing the day, deletes it if it only
+        covered that day, or splits it in two if the day lies inside.
+        """
+        # Runs may span unscheduled days, those are not part of them
+        if not is_scheduled(schedule, day):
+            return
+
+        with transaction.atomic():
+            run = self.containing(habit_id, day)
+            if run is None:
+                return
+
+            if run.start == run.end:
+                run.delete()
+            elif day == run.start:
+                run.start = next_scheduled(schedule, day)
+                run.length -= 1
+                run.save(update_fields=["start", "length"])
+            elif day == run.end:
+                run.end = previous_scheduled(schedule, day)
+                run.length -= 1
+                run.save(update_fields=["end", "length"])
+            else:
+                # Split around the day: every scheduled day of a run is
+                # completed, so the head length is a plain count
+                tail_end = run.end
+                tail_length = run.length
+                run.end = previous_scheduled(schedule, day)
+                run.length = scheduled_days(schedule, run.start, run.end)
+                run.save(update_fields=["end", "length"])
+                self.create(
+                    habit_id=habit_id,
+                    start=next_scheduled(schedule, day),
+                    end=tail_end,
+                    length=tail_length - run.length - 1,
+                )
+
+    def streak_state(self, habit_id, today, schedule=EVERY_DAY):
+        """
+        Return (count, longest_streak, last_completed) of a habit.
+        """
+        runs = self.filter(habit_id=habit_id)
+
+        latest = runs.order_by("-end").values_list("end", "length").first()
+        if latest is None:
+            return 0, 0, None
+
+        last, length = latest
+        longest = runs.order_by("-length").values_list("length", flat=True).first()
+        # Alive while the next scheduled day after the run is not over
+        count = length if next_scheduled(schedule, last) >= today else 0
+        return count, longest, last
+
+
+class HabitRun(models.Model):
+    """
+    A maximal run of consecutive completed scheduled days of a habit.
+
+    The run index is derived from HabitCheckIn: every completed
+    scheduled day belongs to exactly one run, and two runs of the same
+    habit are always separated by at least one missed scheduled day.
+    Completions on unscheduled days are not part of any run. The
+    current streak is the most recent run (if it is still alive), the
+    longest streak is the longest run.
+    """
+
+    # The habit this run belongs to
+    habit = models.ForeignKey(
+        Habit,
+        on_delete=models.CASCADE,
+        related_name="runs",
+    )
+
+    # First and last completed day of the run (both inclusive)
+    start = models.DateField()
+    end = models.DateField()
+
+    # Number of scheduled days in the run (end - start + 1 for daily habits)
+    length = models.PositiveIntegerField()
+
+    objects = HabitRunManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["habit", "start"], name="habitrun_unique_start"
+            ),
+            models.UniqueConstraint(
+                fields=["habit", "end"], name="habitrun_unique_end"
+            ),
+        ]
+        indexes = [
+            # Longest streak lookup
+            models.Index(fields=["habit", "-length"], name="habitrun_longest_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.habit_id}: {self.start} - {self.end} ({self.length})"
@@ -0,0 +1,210 @@
+"""
+Batch streak rebuild engine.
+
+Derives the streak state of habits (current count, longest streak,
+last completion) and their run index from the full HabitCheckIn
+history. Use it to initialise the run index and to repair drift.
+Check-ins are streamed from the database ordered by habit and date,
+so every habit is folded in a single sorted pass and memory stays
+bounded by the chunk size, no matter how many check-ins exist. Only
+days on the habit's weekday schedule count (see habits.schedule).
+
+Large rebuilds are partitioned by habit id and spread across a
+process pool.
+"""
+
+from datetime import date
+import os
+
+from django.db import transaction
+
+from habits import cache as dashboard_cache
+from habits.models import Habit, HabitCheckIn
+from habits.schedule import EVERY_DAY, is_scheduled, next_scheduled
+from .models import HabitRun, Streak
+from habits.workers import partitions, process_pool
+from .workers import rebuild_partition
+
+# Number of check-in rows fetched per round trip
+CHUNK_SIZE = 2000
+
+
+class StreakState:
+    """
+    Running streak state of one habit while folding its check-ins.
+
+    Every finished run of consecutive scheduled days is handed to
+    `emit`, which lets the engine rebuild the run index in the same
+    pass. Completions on unscheduled days are skipped.
+    """
+
+    __slots__ = ("habit_id", "schedule", "count", "longest", "last", "run_start", "emit")
+
+    def __init__(self, habit_id, emit=None, schedule=EVERY_DAY):
+        self.habit_id = habit_id
+        self.schedule = schedule
+        self.count = 0
+        self.longest = 0
+        self.last = None
+        self.run_start = None
+        self.emit = emit
+
+    def add(self, day):
+        """Fold the next (ascending) completed day into the state."""
+        if day == self.last or not is_scheduled(self.schedule, day):
+            return
+        if self.last is not None and day == next_scheduled(self.schedule, self.last):
+            self.count += 1
+        else:
+            self.close_run()
+            self.run_start = day
+            self.count = 1
+        self.longest = max(self.longest, self.count)
+        self.last = day
+
+    def close_run(self):
+        """Emit the current run (if any)."""
+        if self.emit is not None and self.last is not None:
+            self.emit(HabitRun(
+                habit_id=self.habit_id,
+                start=self.run_start,
+                end=self.last,
+                length=self.count,
+            ))
+
+    def to_streak(self, today):
+        """
+        Build the Streak row for this state.
+
+        The current count only survives while the streak is still
+        alive, i.e. no scheduled day between the last completion and
+        today was missed.
+        """
+        alive = (
+            self.last is not None
+            and next_scheduled(self.schedule, self.last) >= today
+        )
+        return Streak(
+            habit_id=self.habit_id,
+            count=self.count if alive else 0,
+            longest_streak=self.longest,
+            last_completed=self.last,
+        )
+
+
+def compute_streak(days, today=None, schedule=EVERY_DAY):
+    """
+    Compute (count, longest_streak, last_completed) from sorted dates.
+
+    Pure helper used by the engine and handy for tests.
+    """
+    state = StreakState(None, schedule=schedule)
+    for day in days:
+        state.add(day)
+    streak = state.to_streak(today or date.today())
+    return streak.count, streak.longest_streak, streak.last_completed
+
+
+def save_streaks(streaks):
+    """
+    Insert or update the given Streak rows with one bulk upsert.
+    """
+    Streak.objects.bulk_create(
+        streaks,
+        update_conflicts=True,
+        unique_fields=["habit"],
+        update_fields=["count", "longest_streak", "last_completed"],
+    )
+
+
+def rebuild_habits(habit_ids, today=None):
+    """
+    Rebuild the streaks and run index of the given habits
+    in the current process. Ids of habits that do not exist
+    are ignored.
+
+    Returns the number of habits that were written.
+    """
+    today = today or date.today()
+
+    schedules = dict(
+        Habit.all_objects
+        .filter(id__in=list(habit_ids))
+        .values_list("id", "schedule")
+    )
+    habit_ids = list(schedules)
+
+    rows = (
+        HabitCheckIn.objects
+        .filter(habit_id__in=habit_ids, completed=True)
+        .order_by("habit_id", "date")
+        .values_list("habit_id", "date")
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+    runs = []
+
+    def emit(run):
+        runs.append(run)
+        if len(runs) >= CHUNK_SIZE:
+            HabitRun.objects.bulk_create(runs)
+            runs.clear()
+
+    # Habits without any check-in are reset to an empty streak
+    states = {
+        habit_id: StreakState(habit_id, emit, schedule)
+        for habit_id, schedule in schedules.items()
+    }
+
+    with transaction.atomic():
+        HabitRun.objects.filter(habit_id__in=habit_ids).delete()
+
+        for habit_id, day in rows:
+            states[habit_id].add(day)
+
+        for state in states.values():
+            state.close_run()
+        HabitRun.objects.bulk_create(runs)
+
+        save_streaks([state.to_streak(today) for state in states.values()])
+    return len(states)
+
+
+def rebuild_streaks(habit_ids=None, workers=None, partition_size=500, today=None):
+    """
+    Rebuild the streaks of all (or the given) habits that exist and
+    are not deleted.
+
+    With `workers` > 1 the habits are partitioned by id and the
+    partitions are processed by a pool of worker processes. With a
+    single worker everything runs in the current process (this is
+    also what tests use, since in-memory databases are not shared
+    between processes).
+
+    Returns the number of habits that were rebuilt.
+    """
+    today = today or date.today()
+    # Deleted habits are left alone, they are purged anyway
+    owners = Habit.objects.all()
+    if habit_ids is not None:
+        owners = owners.filter(id__in=habit_ids)
+    habit_ids = sorted(owners.values_list("id", flat=True))
+
+    workers = workers or os.cpu_count() or 1
+    chunks = list(partitions(habit_ids, partition_size))
+
+    if workers <= 1 or len(chunks) <= 1:
+        rebuilt = sum(rebuild_habits(chunk, today) for chunk in chunks)
+    else:
+        with process_pool(workers) as pool:
+            rebuilt = sum(
+                pool.map(rebuild_partition, chunks, [today] * len(chunks))
+            )
+
+    # Bulk upserts do not send signals, invalidate cached dashboards
+    user_ids = owners.values_list("user_id", flat=True).distinct()
+    dashboard_cache.bump(*(
+        dashboard_cache.user_scope(dashboard_cache.HABITS, user_id)
+        for user_id in user_ids
+    ))
+    return rebuilt
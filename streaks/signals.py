@@ -0,0 +1,59 @@
+"""
+Signal handlers for the streaks app.
+
+Keep the run index and the denormalized Streak row in sync with the
+habit's completion history (see habits.signals).
+"""
+
+from django.dispatch import receiver
+
+from habits.models import Habit
+from habits.schedule import EVERY_DAY
+from habits.signals import day_cleared, day_completed, history_changed, schedule_changed
+from .models import HabitRun, Streak
+from .rebuild import rebuild_habits
+
+
+def habit_schedule(habit_id):
+    """The weekday schedule of a habit (every day if it is gone)."""
+    schedule = (
+        Habit.all_objects
+        .filter(id=habit_id)
+        .values_list("schedule", flat=True)
+        .first()
+    )
+    return EVERY_DAY if schedule is None else schedule
+
+
+def sync_streak(habit_id, schedule):
+    """
+    Refresh the Streak row of a habit from its runs.
+    """
+    streak, _ = Streak.objects.get_or_create(habit_id=habit_id)
+    streak.update_streak(schedule=schedule)
+
+
+@receiver(day_completed)
+def add_run_day(sender, habit_id, day, **kwargs):
+    """Extend or merge runs after a day was completed."""
+    schedule = habit_schedule(habit_id)
+    HabitRun.objects.add_day(habit_id, day, schedule)
+    sync_streak(habit_id, schedule)
+
+
+@receiver(day_cleared)
+def remove_run_day(sender, habit_id, day, **kwargs):
+    """Shrink or split runs after a day was cleared."""
+    schedule = habit_schedule(habit_id)
+    HabitRun.objects.remove_day(habit_id, day, schedule)
+    sync_streak(habit_id, schedule)
+
+
+@receiver(history_changed)
+@receiver(schedule_changed)
+def rebuild_runs(sender, habit_ids, **kwargs):
+    """
+    Rebuild runs and streaks of habits changed by a bulk write,
+    or whose schedule changed (runs depend on it).
+    """
+    rebuild_habits(habit_ids)
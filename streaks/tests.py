@@ -1,3 +1,431 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from io import StringIO
+import random
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from habits.models import Habit, HabitCheckIn
+from habits.schedule import EVERY_DAY
+from habits.users import get_demo_user
+from .models import HabitRun, Streak
+from .rebuild import compute_streak, rebuild_habits, rebuild_streaks
 
 # Test configuration for the streaks app.
+
+
+def naive_streak(days, today):
+    """
+    Reference implementation: walk backwards day by day.
+    """
+    days = set(days)
+    if not days:
+        return 0, 0, None
+
+    longest = 0
+    for day in days:
+        length = 0
+        while day - timedelta(days=length) in days:
+            length += 1
+        longest = max(longest, length)
+
+    last = max(days)
+    count = 0
+    if today - last <= timedelta(days=1):
+        while last - timedelta(days=count) in days:
+            count += 1
+    return count, longest, last
+
+
+def naive_scheduled_streak(days, today, schedule):
+    """
+    Reference implementation for weekday schedules: walk the calendar
+    day by day and only look at scheduled days.
+    """
+    due = {day for day in days if schedule >> day.weekday() & 1}
+    if not due:
+        return 0, 0, None
+
+    longest = length = 0
+    day = min(due)
+    while day <= max(due):
+        if schedule >> day.weekday() & 1:
+            length = length + 1 if day in due else 0
+            longest = max(longest, length)
+        day += timedelta(days=1)
+
+    # Today may still be completed, so walking back starts yesterday
+    # unless today is done already
+    count = 0
+    day = today if today in due else today - timedelta(days=1)
+    while day >= min(due):
+        if schedule >> day.weekday() & 1:
+            if day not in due:
+                break
+            count += 1
+        day -= timedelta(days=1)
+    return count, longest, max(due)
+
+
+def naive_scheduled_runs(days, schedule):
+    """
+    Reference implementation: runs of completed scheduled days,
+    closed by every missed scheduled day.
+    """
+    due = {day for day in days if schedule >> day.weekday() & 1}
+    runs = []
+    current = None
+    day = min(due, default=None)
+    while due and day <= max(due):
+        if schedule >> day.weekday() & 1:
+            if day in due:
+                if current is None:
+                    current = [day, day, 0]
+                    runs.append(current)
+                current[1] = day
+                current[2] += 1
+            else:
+                current = None
+        day += timedelta(days=1)
+    return [tuple(run) for run in runs]
+
+
+class StreakRebuildTests(TestCase):
+    """
+    Tests for the batch streak rebuild engine.
+    """
+
+    def test_compute_streak_matches_reference(self):
+        rng = random.Random(4)
+        today = date(2025, 3, 1)
+        for _ in range(200):
+            days = sorted({
+                today - timedelta(days=rng.randrange(60))
+                for _ in range(rng.randrange(40))
+            })
+            self.assertEqual(
+                compute_streak(days, today),
+                naive_streak(days, today),
+            )
+
+    def test_compute_scheduled_streak_matches_reference(self):
+        rng = random.Random(8)
+        today = date(2025, 3, 1)
+        for _ in range(300):
+            schedule = rng.randrange(1, EVERY_DAY + 1)
+            days = sorted({
+                today - timedelta(days=rng.randrange(60))
+                for _ in range(rng.randrange(40))
+            })
+            self.assertEqual(
+                compute_streak(days, today, schedule),
+                naive_scheduled_streak(days, today, schedule),
+            )
+
+    def test_daily_reference_agrees_with_scheduled_reference(self):
+        rng = random.Random(3)
+        today = date(2025, 3, 1)
+        for _ in range(50):
+            days = {today - timedelta(days=rng.randrange(30)) for _ in range(20)}
+            self.assertEqual(
+                naive_scheduled_streak(days, today, EVERY_DAY),
+                naive_streak(days, today),
+            )
+
+    def test_unscheduled_days_do_not_break_streak(self):
+        # Mon, Wed, Fri habit completed on three scheduled days in a row
+        habit = Habit.objects.create(name="Gym", user=get_demo_user(), schedule=0b10101)
+        for day in (date(2025, 3, 3), date(2025, 3, 5), date(2025, 3, 7)):
+            HabitCheckIn.objects.create(habit=habit, date=day)
+        # A bonus Sunday session neither counts nor breaks anything
+        HabitCheckIn.objects.create(habit=habit, date=date(2025, 3, 9))
+
+        # Monday 10th: nothing missed yet
+        rebuild_streaks(workers=1, today=date(2025, 3, 10))
+        self.assertEqual(
+            Streak.objects.filter(habit=habit)
+            .values_list("count", "longest_streak", "last_completed").get(),
+            (3, 3, date(2025, 3, 7)),
+        )
+
+        # Tuesday 11th: Monday was missed
+        rebuild_streaks(workers=1, today=date(2025, 3, 11))
+        self.assertEqual(Streak.objects.get(habit=habit).count, 0)
+
+    def test_schedule_change_rebuilds_streak(self):
+        habit = Habit.objects.create(name="Swim", user=get_demo_user())
+        today = date.today()
+        # Every other day: daily streak of 1
+        for offset in (0, 2, 4):
+            HabitCheckIn.objects.create(habit=habit, date=today - timedelta(days=offset))
+        self.assertEqual(Streak.objects.get(habit=habit).count, 1)
+
+        # Only due on the completed weekdays
+        habit.schedule = sum(
+            1 << (today - timedelta(days=offset)).weekday() for offset in (0, 2, 4)
+        )
+        habit.save()
+
+        streak = Streak.objects.get(habit=habit)
+        self.assertEqual((streak.count, streak.longest_streak), (3, 3))
+
+    def test_rebuild_across_month_boundary(self):
+        habit = Habit.objects.create(name="Walk", user=get_demo_user())
+        for day in (date(2025, 2, 27), date(2025, 2, 28), date(2025, 3, 1)):
+            HabitCheckIn.objects.create(habit=habit, date=day)
+
+        rebuild_streaks(workers=1, today=date(2025, 3, 1))
+
+        streak = Streak.objects.get(habit=habit)
+        self.assertEqual(streak.count, 3)
+        self.assertEqual(streak.longest_streak, 3)
+        self.assertEqual(streak.last_completed, date(2025, 3, 1))
+
+    def test_rebuild_resets_broken_and_empty_streaks(self):
+        broken = Habit.objects.create(name="Broken", user=get_demo_user())
+        empty = Habit.objects.create(name="Empty", user=get_demo_user())
+        HabitCheckIn.objects.create(habit=broken, date=date(2025, 1, 1))
+        HabitCheckIn.objects.create(habit=broken, date=date(2025, 1, 2))
+        Streak.objects.create(habit=empty, count=7, longest_streak=7)
+
+        rebuild_streaks(workers=1, today=date(2025, 2, 1))
+
+        self.assertEqual(
+            Streak.objects.filter(habit=broken)
+            .values_list("count", "longest_streak").get(),
+            (0, 2),
+        )
+        self.assertEqual(
+            Streak.objects.filter(habit=empty)
+            .values_list("count", "longest_streak").get(),
+            (0, 0),
+        )
+
+    def test_command_rebuilds_subset(self):
+        first = Habit.objects.create(name="First", user=get_demo_user())
+        second = Habit.objects.create(name="Second", user=get_demo_user())
+        # Bulk inserts bypass the signals, so no streaks exist yet
+        HabitCheckIn.objects.bulk_create([
+            HabitCheckIn(habit=first, date=date.today()),
+            HabitCheckIn(habit=second, date=date.today()),
+        ])
+
+        call_command("rebuild_streaks", first.id, workers=1, stdout=StringIO())
+
+        self.assertTrue(Streak.objects.filter(habit=first, count=1).exists())
+        self.assertFalse(Streak.objects.filter(habit=second).exists())
+
+    def test_rebuild_ignores_unknown_habits(self):
+        habit = Habit.objects.create(name="Known", user=get_demo_user())
+        HabitCheckIn.objects.bulk_create([HabitCheckIn(habit=habit, date=date.today())])
+
+        rebuilt = rebuild_streaks(habit_ids=[habit.id, 999999], workers=1)
+
+        self.assertEqual(rebuilt, 1)
+        self.assertEqual(rebuild_habits([999999]), 0)
+        self.assertEqual(
+            list(Streak.objects.values_list("habit_id", "count")), [(habit.id, 1)]
+        )
+
+    def test_rebuild_skips_deleted_habits(self):
+        habit = Habit.objects.create(name="Gone", user=get_demo_user())
+        HabitCheckIn.objects.bulk_create([HabitCheckIn(habit=habit, date=date.today())])
+        habit.soft_delete()
+
+        # The same result with and without explicit ids
+        self.assertEqual(rebuild_streaks(habit_ids=[habit.id], workers=1), 0)
+        self.assertEqual(rebuild_streaks(workers=1), 0)
+        self.assertFalse(Streak.objects.filter(habit=habit).exists())
+
+    def test_incremental_streak_across_month_boundary(self):
+        habit = Habit.objects.create(name="Read", user=get_demo_user())
+        HabitCheckIn.objects.create(habit=habit, date=date(2025, 2, 28))
+        HabitCheckIn.objects.create(habit=habit, date=date(2025, 3, 1))
+
+        self.assertEqual(
+            HabitRun.objects.streak_state(habit.id, date(2025, 3, 1)),
+            (2, 2, date(2025, 3, 1)),
+        )
+
+    def test_undo_rolls_streak_back(self):
+        habit = Habit.objects.create(name="Stretch", user=get_demo_user())
+        today = date.today()
+        HabitCheckIn.objects.create(habit=habit, date=today - timedelta(days=1))
+        url = reverse("toggle_habit", args=[habit.id])
+
+        self.client.post(url)
+        self.assertEqual(Streak.objects.get(habit=habit).count, 2)
+
+        self.client.post(url)
+        streak = Streak.objects.get(habit=habit)
+        self.assertEqual(streak.count, 1)
+        self.assertEqual(streak.longest_streak, 1)
+        self.assertEqual(streak.last_completed, today - timedelta(days=1))
+
+
+def naive_runs(days):
+    """
+    Reference implementation: split sorted days into maximal runs.
+    """
+    runs = []
+    for day in sorted(days):
+        if runs and day - runs[-1][1] == timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return [(start, end, (end - start).days + 1) for start, end in runs]
+
+
+class HabitRunTests(TestCase):
+    """
+    Tests for the run-length segment index.
+    """
+
+    def setUp(self):
+        self.habit = Habit.objects.create(name="Journal", user=get_demo_user())
+        self.today = date.today()
+
+    def stored_runs(self):
+        return list(
+            HabitRun.objects.filter(habit=self.habit)
+            .order_by("start")
+            .values_list("start", "end", "length")
+        )
+
+    def test_random_operations_match_brute_force(self):
+        """
+        Property: after any sequence of inserts, deletes and date edits,
+        the run index and the streak equal a full recomputation.
+        """
+        rng = random.Random(7)
+        days = set()
+
+        for _ in range(300):
+            day = self.today - timedelta(days=rng.randrange(30))
+            action = rng.random()
+
+            if day in days and action < 0.15:
+                # Admin-style edit: move the check-in to another day
+                target = self.today - timedelta(days=rng.randrange(30))
+                if target in days:
+                    continue
+                checkin = HabitCheckIn.objects.get(habit=self.habit, date=day)
+                checkin.date = target
+                checkin.save()
+                days.discard(day)
+                days.add(target)
+            elif day in days:
+                HabitCheckIn.objects.filter(habit=self.habit, date=day).delete()
+                days.discard(day)
+            else:
+                HabitCheckIn.objects.create(habit=self.habit, date=day)
+                days.add(day)
+
+            self.assertEqual(self.stored_runs(), naive_runs(days))
+
+            streak = Streak.objects.get(habit=self.habit)
+            self.assertEqual(
+                (streak.count, streak.longest_streak, streak.last_completed),
+                naive_streak(days, self.today),
+            )
+
+    def test_scheduled_operations_match_brute_force(self):
+        """
+        Property: the run index and streak of a habit with a weekday
+        schedule equal a full recomputation after any sequence of
+        inserts and deletes, including unscheduled days.
+        """
+        rng = random.Random(13)
+        # Mon, Tue, Thu, Sat
+        schedule = 0b0101011
+        self.habit.schedule = schedule
+        self.habit.save()
+        days = set()
+
+        for _ in range(200):
+            day = self.today - timedelta(days=rng.randrange(30))
+            if day in days:
+                HabitCheckIn.objects.filter(habit=self.habit, date=day).delete()
+                days.discard(day)
+            else:
+                HabitCheckIn.objects.create(habit=self.habit, date=day)
+                days.add(day)
+
+            self.assertEqual(self.stored_runs(), naive_scheduled_runs(days, schedule))
+
+            streak = Streak.objects.get(habit=self.habit)
+            self.assertEqual(
+                (streak.count, streak.longest_streak, streak.last_completed),
+                naive_scheduled_streak(days, self.today, schedule),
+            )
+
+        incremental = self.stored_runs()
+        rebuild_streaks(workers=1)
+        self.assertEqual(self.stored_runs(), incremental)
+
+    def test_lookups_do_not_scan_history(self):
+        HabitCheckIn.objects.bulk_create(
+            HabitCheckIn(habit=self.habit, date=self.today - timedelta(days=i))
+            for i in range(1, 400)
+            if i % 5
+        )
+        rebuild_streaks(workers=1)
+
+        with self.assertNumQueries(2):
+            state = HabitRun.objects.streak_state(self.habit.id, self.today)
+        self.assertEqual(state, (4, 4, self.today - timedelta(days=1)))
+
+    def test_rebuild_matches_incremental_index(self):
+        rng = random.Random(11)
+        days = {self.today - timedelta(days=rng.randrange(90)) for _ in range(50)}
+        for day in days:
+            HabitCheckIn.objects.create(habit=self.habit, date=day)
+        incremental = self.stored_runs()
+
+        rebuild_streaks(workers=1)
+
+        self.assertEqual(self.stored_runs(), incremental)
+        self.assertEqual(incremental, naive_runs(days))
+
+
+class ParallelRebuildTests(TransactionTestCase):
+    """
+    Rebuilds spread over a process pool. The worker processes read
+    the file-backed test database, so the data must be committed.
+    """
+
+    def test_pool_matches_single_process_rebuild(self):
+        rng = random.Random(7)
+        user = get_demo_user()
+        habits = Habit.objects.bulk_create(
+            Habit(name=f"Habit {i}", user=user, schedule=rng.choice([EVERY_DAY, 0b0011111]))
+            for i in range(7)
+        )
+        HabitCheckIn.objects.bulk_create(
+            HabitCheckIn(habit=habit, date=date(2025, 3, 1) + timedelta(days=offset))
+            for habit in habits
+            for offset in range(40)
+            if rng.random() < 0.7
+        )
+        today = date(2025, 4, 10)
+
+        def snapshot():
+            return (
+                list(Streak.objects.order_by("habit_id").values_list(
+                    "habit_id", "count", "longest_streak", "last_completed"
+                )),
+                list(HabitRun.objects.order_by("habit_id", "start").values_list(
+                    "habit_id", "start", "end", "length"
+                )),
+            )
+
+        rebuild_streaks(workers=1, today=today)
+        expected = snapshot()
+        Streak.objects.all().delete()
+        HabitRun.objects.all().delete()
+
+        rebuilt = rebuild_streaks(workers=2, partition_size=2, today=today)
+
+        self.assertEqual(rebuilt, len(habits))
+        self.assertEqual(snapshot(), expected)
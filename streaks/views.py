@@ -1,31 +1,41 @@
 from django.shortcuts import render
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse
 
+from datetime import date
+
+from habits.idempotency import idempotent
 from habits.models import Habit
-from .models import Streak
+from habits.services import record_completion
+from habits.users import get_current_user
 
 
+@idempotent
 def complete_habit(request, habit_id):
     """
     Action view: mark a habit as completed for today.
 
-    This view retrieves the specified habit, ensures that a corresponding
-    streak object exists, and updates the streak based on today's date.
+    This view retrieves the specified habit and records today's
+    check-in, which updates the habit's streak.
     It returns a simple HTTP response confirming the completion and
-    showing the current streak length.
+    showing the current streak length. Requests may carry an
+    idempotency key (see habits.idempotency).
     """
     # Fetch the habit or return 404 if the ID does not exist
-    habit = get_object_or_404(Habit, id=habit_id)
-
-    # Ensure a streak object exists for this habit
-    # If none exists yet, it will be created automatically
-    streak, created = Streak.objects.get_or_create(habit=habit)
+    # or the habit belongs to another user
+    habit = get_object_or_404(Habit, id=habit_id, user=get_current_user(request))
 
-    # Update the streak according to completion logic
-    streak.update_streak()
+    # Record today's check-in through the shared completion service:
+    # check-in and streak are written in one transaction, so double
+    # clicks cannot create duplicates or lose streak updates
+    try:
+        result = record_completion(habit, date.today(), completed=True)
+    except Habit.DoesNotExist:
+        # Deleted since it was looked up
+        raise Http404("habit was deleted")
+    count = result.streak["count"] if result.streak else 0
 
     # Return a simple confirmation response
     return HttpResponse(
-        f"Habit '{habit.name}' completed. Current streak: {streak.count}"
+        f"Habit '{habit.name}' completed. Current streak: {count}"
     )
@@ -0,0 +1,22 @@
+"""
+Process pool entry point of the streak rebuild (see streaks.rebuild
+and habits.workers).
+
+Workers that are spawned instead of forked import it before Django
+is set up, so this module must not import any models at module level.
+"""
+
+from django.db import connections
+
+
+def rebuild_partition(habit_ids, today):
+    """
+    Process pool entry point: rebuild one partition of habits.
+    """
+    from .rebuild import rebuild_habits
+
+    try:
+        return rebuild_habits(habit_ids, today)
+    finally:
+        # Do not leak one connection per finished task
+        connections.close_all()
@@ -0,0 +1,75 @@
+# Generated by Django 6.0 on 2026-10-18 22:05
+#
+# This migration makes to-do items user-owned.
+# Existing items are assigned to the shared "demo" user,
+# which the application uses in no-login mode.
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def assign_demo_user(apps, schema_editor):
+    """
+    Assign every existing to-do item to the demo user
+    (created on the fly if it does not exist yet).
+    """
+    Todo = apps.get_model("todos", "Todo")
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+
+    if not Todo.objects.filter(user__isnull=True).exists():
+        return
+
+    demo_user, _ = User.objects.get_or_create(username="demo")
+    Todo.objects.filter(user__isnull=True).update(user=demo_user)
+
+
+class Migration(migrations.Migration):
+    """
+    Migration to add the owner of a to-do item.
+
+    The field is added as nullable first, filled with the demo user
+    and then made required. A composite index leading on the user
+    serves the per-user list and the open count.
+    """
+
+    dependencies = [
+        ("todos", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Step 1: nullable owner column
+        migrations.AddField(
+            model_name="todo",
+            name="user",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="todos",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+
+        # Step 2: existing items belong to the demo user
+        migrations.RunPython(assign_demo_user, migrations.RunPython.noop),
+
+        # Step 3: every item must have an owner from now on
+        migrations.AlterField(
+            model_name="todo",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="todos",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+
+        migrations.AddIndex(
+            model_name="todo",
+            index=models.Index(
+                fields=["user", "is_done"],
+                name="todo_user_done_idx",
+            ),
+        ),
+    ]
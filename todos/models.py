@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 from django.utils.timezone import now
 
@@ -19,6 +20,13 @@ class Todo(models.Model):
     and serves as the core data structure for the to-do feature.
     """
 
+    # Owner of the to-do item; every to-do query is scoped to one user
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="todos",
+    )
+
     # Short text describing the task
     title = models.CharField(max_length=200)
 
@@ -29,6 +37,12 @@ class Todo(models.Model):
     # Uses the current timezone-aware time as default
     created_at = models.DateTimeField(default=now)
 
+    class Meta:
+        indexes = [
+            # To-do list and open count of one user
+            models.Index(fields=["user", "is_done"], name="todo_user_done_idx"),
+        ]
+
     def __str__(self):
         """
         Human-readable representation of the to-do item.
@@ -1,6 +1,8 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.decorators.http import require_POST
 
+from habits.users import get_current_user
+
 from .models import Todo
 
 
@@ -8,11 +10,15 @@ def todo_list(request):
     """
     To-do list page.
 
-    Retrieves all to-do items from the database and displays them
+    Retrieves the current user's to-do items and displays them
     in a single list. Incomplete tasks are shown first, followed
     by completed tasks. Newer tasks appear before older ones.
     """
-    todos = Todo.objects.order_by("is_done", "-created_at")
+    todos = (
+        Todo.objects
+        .filter(user=get_current_user(request))
+        .order_by("is_done", "-created_at")
+    )
     return render(request, "todos/todo_list.html", {"todos": todos})
 
 
@@ -27,7 +33,7 @@ def add_todo(request):
     """
     title = request.POST.get("title")
     if title:
-        Todo.objects.create(title=title)
+        Todo.objects.create(title=title, user=get_current_user(request))
     return redirect("todo_list")
 
 
@@ -40,7 +46,7 @@ def toggle_todo(request, todo_id):
     This allows the same action to mark a task as completed or
     revert it back to an active state.
     """
-    todo = get_object_or_404(Todo, id=todo_id)
+    todo = get_object_or_404(Todo, id=todo_id, user=get_current_user(request))
     todo.is_done = not todo.is_done
     todo.save()
     return redirect("todo_list")
@@ -54,6 +60,6 @@ def delete_todo(request, todo_id):
     Permanently removes the specified task from the database.
     After deletion, redirects back to the to-do list page.
     """
-    todo = get_object_or_404(Todo, id=todo_id)
+    todo = get_object_or_404(Todo, id=todo_id, user=get_current_user(request))
     todo.delete()
     return redirect("todo_list")